@@ -1,22 +1,213 @@
-import numpy as np
+"""
+Written by Zain Kamal (zain.eris.kamal@rutgers.edu).
+https://github.com/Humboldt-Penguin/redplanet
+
+Build `Mars_HRSC_MOLA_BlendDEM_Global_200mp_v2.zarr.zip` (a chunked, compressed Zarr ZipStore) from the original USGS GeoTIFF. This replaces the interactive notebook 'docs/.development/public/Crust/generate_DEM-200m_zarr-zipstore.ipynb'.
+
+Output is written to 'data/final/', and the raw GeoTIFF is cached in 'data/raw/' (see `make clean-raw`).
+
+Layout of the output (this is what `redplanet.Crust.get_dem_region` relies on):
+    - Single data variable `Mars_HRSC_MOLA_BlendDEM_Global_200mp_v2`, dims ('lat', 'lon'), int16 meters (same as the source), with the source nodata value as `_FillValue`.
+    - Latitudes ascending, longitudes in [-180, 180] ascending -- both are uniformly spaced pixel centers.
+    - Square chunks of `dem_chunk` x `dem_chunk` pixels (~8 MB uncompressed at int16), compressed with blosc/zstd, so a regional query only reads/decompresses the few chunks under it rather than the full ~11 GB raster.
+    - Overview levels in groups 'overviews/x2', 'overviews/x4', ... (same variable name, dtype, fill value and chunking), where each pixel is the mean of the valid pixels in a `factor` x `factor` block of the full-resolution DEM. Map rendering and coarse sweeps read these instead of decimating the full raster.
+"""
+
 from pathlib import Path
+import zipfile
+
+import pooch
+
+import numpy as np
+import xarray as xr
+import rioxarray
+import zarr
+import numcodecs
+import dask
+
+
+
+''' ———————————————————————————————— settings ——————————————————————————————— '''
+
+data_dir      = Path('data')
+dirpath_raw   = data_dir / 'raw'
+dirpath_final = data_dir / 'final'
+
+dem_name  = 'Mars_HRSC_MOLA_BlendDEM_Global_200mp_v2'
+dem_chunk = 2048
+
+overview_factors = (2, 4, 8, 16, 32, 64)     # coarsest is ~13 km, i.e. ~1700x850 pixels globally
+
+compressor = numcodecs.Blosc(cname='zstd', clevel=5, shuffle=numcodecs.Blosc.SHUFFLE)
+
+fpath_dem_zarrzip = dirpath_final / f'{dem_name}.zarr.zip'
+
+
+
+readme_text = f'''README for `{dem_name}.zarr.zip`
+
+Created for the Python package `redplanet` (https://github.com/Humboldt-Penguin/redplanet). Feel free to contact zain.eris.kamal@rutgers.edu with questions.
+
+NOTE: YOU DO NOT NEED TO UNZIP A `.zarr.zip` FILE TO ACCESS THE DATA — the zipped file is perfectly usable on its own, and unzipping will just take up more space on your computer. The zip container itself is uncompressed (like a '.tar'), but each chunk inside it is compressed with blosc/zstd.
+
+Original data source: https://astrogeology.usgs.gov/search/map/Mars/Topography/HRSC_MOLA_Blend/{dem_name}
+
+See 'datasets/step1_generate-local/crust/topo/Mars_DEM_200m_MOLA-HRSC.zarr/' in the `redplanet` repo for the code used to generate this dataset.
+
+We don't modify the data values (int16 meters, same nodata value). We only flip latitudes to ascending order, and split the raster into {dem_chunk}x{dem_chunk} chunks so that any small region can be read without loading the full raster.
+
+Groups 'overviews/x2', 'overviews/x4', ..., 'overviews/x{overview_factors[-1]}' hold block-averaged copies of the DEM (each pixel is the mean of the valid pixels in a factor x factor block, rounded to int16), for plotting/sampling at coarse resolution without reading the full raster.
+
+
+To load this dataset, use the following code:
+
+    ```python
+
+    import xarray as xr
+
+    dat_dem_xr = xr.open_zarr('{dem_name}.zarr.zip')['{dem_name}']  ## specify path as necessary
+
+    dat_dem_x8_xr = xr.open_zarr('{dem_name}.zarr.zip', group='overviews/x8')['{dem_name}']  ## 8x coarser (~1.6 km)
+
+    ```
+
+Or, from `redplanet`, call `Crust.get_dem_region(lon_bounds=..., lat_bounds=...)`, which only reads the chunks overlapping the region.
+'''
+
+
+
+
+
+
+
+''' ——————————————————————————— download source TIF ——————————————————————————— '''
+
+fpath_dem_tif = pooch.retrieve(
+    fname      = f'{dem_name}.tif',
+    url        = f'https://planetarymaps.usgs.gov/mosaic/Mars/HRSC_MOLA_Blend/{dem_name}.tif',
+    known_hash = 'sha256:e8bfe4c3b9dee9d5fdb8c4d49798869654e552e7b154712c9e12d6d117464419',
+    path       = dirpath_raw,
+)
+
+
+
+
+
+
+
+''' ————————————————————— load DEM (chunked with dask) ————————————————————— '''
+
+dat_dem_xr = rioxarray.open_rasterio(
+    filename       = fpath_dem_tif,
+    chunks         = {'x': dem_chunk, 'y': dem_chunk},
+    mask_and_scale = False,     # keep int16, nodata is recorded as `_FillValue` below
+)
+
+nodata = dat_dem_xr.rio.nodata
+
+dat_dem_xr = (
+    dat_dem_xr
+    .sel(band=1).drop_vars(['band'])
+    .rename({'x': 'lon', 'y': 'lat'})
+    .sortby('lat', ascending=True)
+    .chunk({'lat': dem_chunk, 'lon': dem_chunk})    # `sortby` leaves a short chunk at the start, realign so chunk `i` always starts at row `i * dem_chunk`
+    .rename(dem_name)
+)
+
+## the source is already in geographic coordinates (GCS Mars 2000 Sphere), so 'x'/'y' are degrees
+if not ((dat_dem_xr.lon.values[0] > -180) and (dat_dem_xr.lon.values[-1] < 180)):
+    raise ValueError(f'Unexpected longitude range [{dat_dem_xr.lon.values[0]}, {dat_dem_xr.lon.values[-1]}], expected pixel centers within (-180, 180).')
+
+dat_dem_xr.attrs = {
+    'units'    : 'm',
+    'metadata' : {
+        'source_data' : f'https://astrogeology.usgs.gov/search/map/Mars/Topography/HRSC_MOLA_Blend/{dem_name}',
+        'source_code' : 'https://github.com/Humboldt-Penguin/redplanet/tree/main/datasets/step1_generate-local/crust/topo/Mars_DEM_200m_MOLA-HRSC.zarr',
+        'description' : f"For description of modifications and source code, see the source code or '{dem_name}.zarr.zip/_README.txt' (you can open the file without unzipping everything).",
+    },
+}
+
+print(f'xarray.DataArray string repr:\n{dat_dem_xr}\n')
+
+
+
+
+
+
+
+''' ———————————————————— write Zarr ZipStore and README ———————————————————— '''
+
+dirpath_final.mkdir(parents=True, exist_ok=True)
+fpath_dem_zarrzip.unlink(missing_ok=True)    # zip entries can't be overwritten
+
+encoding = {
+    dem_name: {
+        'chunks'     : (dem_chunk, dem_chunk),
+        'compressor' : compressor,
+        '_FillValue' : nodata,
+    },
+}
+
+def make_overview(dat, factor):
+    """Mean of the valid pixels in each `factor` x `factor` block (partial blocks at the edges are dropped), in the same int16/nodata encoding as the source."""
+    overview = (
+        dat
+        .where(dat != nodata)
+        .coarsen(lat=factor, lon=factor, boundary='trim')
+        .mean()     # skips nodata
+        .round()
+        .fillna(nodata)
+        .astype(dat.dtype)
+        .chunk({'lat': dem_chunk, 'lon': dem_chunk})
+    )
+    overview.attrs = dict(dat.attrs, overview_factor=factor)
+    return overview
+
+
+
+## each dask task writes exactly one zarr chunk, and `ZipStore` serializes the writes with its own lock
+with dask.config.set(scheduler='threads'):
+    with zarr.ZipStore(fpath_dem_zarrzip, mode='w') as zipstore:
+        dat_dem_xr.to_zarr(store=zipstore, encoding=encoding, consolidated=False)
+
+        ## every level is averaged straight from the full-resolution DEM (not from the previous level), so each one is an exact block mean
+        for factor in overview_factors:
+            print(f'Writing {factor}x overview...')
+            make_overview(dat_dem_xr, factor).to_zarr(store=zipstore, group=f'overviews/x{factor}', encoding=encoding, consolidated=False)
+
+        ## consolidate once at the end -- zip entries can't be overwritten, so consolidating after every write would leave duplicate '.zmetadata' entries
+        zarr.consolidate_metadata(zipstore)
+
+with zipfile.ZipFile(fpath_dem_zarrzip, 'a') as zipf:
+    zipf.writestr('_README.txt', readme_text)
+
+
+
+
+
+
+
+''' ——————————————————————————————— verify ——————————————————————————————— '''
+
+with zarr.ZipStore(fpath_dem_zarrzip, mode='r') as zipstore:
+    check = xr.open_zarr(zipstore, mask_and_scale=False)[dem_name]
+    if check.shape != dat_dem_xr.shape:
+        raise ValueError(f'Written shape {check.shape} does not match source shape {dat_dem_xr.shape}.')
+    window = dict(lat=slice(7, 14), lon=slice(20, 27))
+    if not np.array_equal(check.sel(**window).values, dat_dem_xr.sel(**window).values):
+        raise ValueError('Written data does not match the source in the test window.')
+    for factor in overview_factors:
+        check = xr.open_zarr(zipstore, group=f'overviews/x{factor}', mask_and_scale=False)[dem_name]
+        if check.shape != (dat_dem_xr.shape[0] // factor, dat_dem_xr.shape[1] // factor):
+            raise ValueError(f'Unexpected shape {check.shape} for {factor}x overview.')
+
+
 
-numpy_version = np.__version__
 
-data_dir = Path('data')
-data_file = data_dir / 'numpy_version.txt'
 
-# Check if the directory exists, if not create it
-data_dir.mkdir(parents=True, exist_ok=True)
 
-# Check if the file exists and print the appropriate message
-if data_file.exists():
-    print(f"The file {data_file} already exists.")
-else:
-    print(f"The file {data_file} does not exist. It will be created now.")
 
-# Write the numpy version to the file
-with data_file.open('w') as file:
-    file.write(numpy_version)
+''' ——————————————————————————— hashes for pooch ——————————————————————————— '''
 
-print(f"Numpy version {numpy_version} has been written to {data_file}")
+print(f'{fpath_dem_zarrzip} ({fpath_dem_zarrzip.stat().st_size / 1024**3:.2f} GB)')
+print(f"sha256:{pooch.file_hash(fpath_dem_zarrzip, alg='sha256')}")
@@ -0,0 +1,74 @@
+"""
+Written by Zain Kamal (zain.eris.kamal@rutgers.edu).
+https://github.com/Humboldt-Penguin/redplanet
+
+------------
+
+Benchmark for converting grids from the pyshtools layout (lats 90->-90, lons 0->360 inclusive) to the redplanet layout (lats -90->90, lons -180->180 with a wraparound column), comparing:
+    - "old": the previous xarray pipeline (`sel` out lon 360 -> `apply_ufunc` lon conversion -> `sortby('lon')` -> `sortby('lat')` -> `concat` wraparound column), which makes a full copy of the grid at almost every step.
+    - "new": `redplanet.utils.fix_pyshtools_coords`, which fills a single preallocated array (see `redplanet.utils.reorder_pyshtools_grid`).
+
+Both are run on the 0.1 degree grid (lmax=899, ~50 MB) and the finest 0.0346 degree grid (lmax=2600, ~430 MB). We report wall time and peak memory allocated during the conversion (via `tracemalloc`, which numpy reports its buffers to), and check the outputs are identical.
+
+The grids are filled with random numbers rather than expanded from spherical harmonics, since only the layout matters here. Note the 0.0346 degree case needs a few GB of free RAM for the old pipeline.
+
+Usage:
+    `python benchmark_fix_coords.py`
+"""
+
+import time
+import tracemalloc
+
+import numpy as np
+import xarray as xr
+
+from redplanet import utils
+
+
+
+def old_fix_coords(dataarray):
+    dataarray = dataarray.sel(lon=slice(0,359.99999))
+    dataarray = dataarray.assign_coords(lon=xr.apply_ufunc(utils.plon2slon, dataarray.lon))
+    dataarray = dataarray.sortby('lon', ascending=True)
+    dataarray = dataarray.sortby('lat', ascending=True)
+    dataarray = xr.concat([dataarray, dataarray.sel(lon=-180).assign_coords(lon=180)], dim='lon')
+    return dataarray
+
+
+
+def make_pyshtools_grid(lmax):
+    n = 2*lmax + 2
+    lats = np.linspace(90, -90, n+1)
+    lons = np.linspace(0, 360, 2*n+1)
+    lons[n] = 180    # at lmax=2600 this comes out as 180.00000000000003 (same as pyshtools), which makes the old pipeline fail outright
+    dat = np.random.default_rng(0).standard_normal((lats.size, lons.size))
+    return xr.DataArray(dat, coords={'lat': lats, 'lon': lons}, dims=('lat', 'lon'))
+
+
+
+def measure(func, da):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = func(da)
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, dt, peak
+
+
+
+if __name__ == '__main__':
+    for grid_spacing, lmax in ((0.1, 899), (0.0346, 2600)):
+        da = make_pyshtools_grid(lmax)
+        print(f'grid spacing {grid_spacing} deg (lmax={lmax}), {da.nbytes/1e6:.0f} MB:')
+
+        out_old, dt_old, peak_old = measure(old_fix_coords, da)
+        del out_old
+        out_new, dt_new, peak_new = measure(utils.fix_pyshtools_coords, da)
+
+        print(f'    old: {dt_old:7.3f} s, peak {peak_old/1e6:7.0f} MB ({peak_old/da.nbytes:.1f}x grid)')
+        print(f'    new: {dt_new:7.3f} s, peak {peak_new/1e6:7.0f} MB ({peak_new/da.nbytes:.1f}x grid)')
+
+        out_old = old_fix_coords(da)
+        assert out_old.identical(out_new)
+        del da, out_old, out_new
@@ -0,0 +1,109 @@
+"""
+Written by Zain Kamal (zain.eris.kamal@rutgers.edu).
+https://github.com/Humboldt-Penguin/redplanet
+
+------------
+
+Benchmark for converting Cartesian positions/magnetic field vectors to spherical coordinates, comparing:
+    - "old": what `maven_reducer_1_altitude.py` did -- compute lon/lat with `arctan2`, take their sin/cos, build the (3,3,N) rotation matrix `D` with `np.array`, and apply it with `np.einsum`.
+    - "new": `redplanet.Mag.maven.cart2sph`, which never builds `D` (its entries are ratios of the position components) and works through the data in cache-sized chunks with reused buffers.
+
+Samples are converted in batches of `batch_size` (roughly a few days of raw data at 32 Hz), since the old method needs ~20 float64s of temporaries per sample and can't convert 10^8 samples at once on most machines. We report total wall time, throughput, the peak extra memory for a single batch (from `tracemalloc`, which tracks numpy allocations), and the largest difference between the two methods.
+
+Usage:
+    `python benchmark_cart2sph.py [n_samples] [batch_size]`
+    (defaults: 10^8 samples in batches of 10^7)
+"""
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from redplanet.Mag import maven
+
+
+
+def cart2sph_einsum(pos, B):
+    """Conversion from `maven_reducer_1_altitude.py`, returns Nx6 (lon, lat, r, and the three rotated components)."""
+    out = np.empty((pos.shape[0], 6))
+    xy2 = pos[:,0]**2 + pos[:,1]**2
+
+    theta = np.arctan2(pos[:,1], pos[:,0])
+    phi   = np.arctan2(pos[:,2], np.sqrt(xy2))
+
+    sin_theta = np.sin(theta)
+    sin_phi   = np.sin(phi)
+    cos_theta = np.cos(theta)
+    cos_phi   = np.cos(phi)
+
+    D = np.array([
+        [  cos_theta * cos_phi ,      sin_theta * cos_phi ,     sin_phi              ],
+        [ -sin_theta           ,      cos_theta           ,     np.zeros_like(theta) ],
+        [ -cos_theta * sin_phi ,     -sin_theta * sin_phi ,     cos_phi              ]
+    ])
+
+    out[:,3:] = np.einsum('ijk,kj->ki', D, B)
+    out[:,0] = np.degrees(theta)
+    out[:,1] = np.degrees(phi)
+    out[:,2] = np.sqrt(xy2 + pos[:,2]**2)
+    return out
+
+
+
+def make_batch(n, seed):
+    """Random positions between 80 and 5000 km altitude, and field vectors of tens of nT (as columns of one Nx6 array, like raw data)."""
+    rng = np.random.default_rng(seed)
+    dat = np.empty((n, 6))
+    dat[:,0:3] = rng.normal(size=(n, 3))
+    dat[:,0:3] *= (rng.uniform(maven.R_mars + 80, maven.R_mars + 5000, n) / np.linalg.norm(dat[:,0:3], axis=1))[:,None]
+    dat[:,3:6] = rng.normal(0, 30, (n, 3))
+    return dat
+
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+
+if __name__ == '__main__':
+
+    n_samples  = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10**8
+    batch_size = int(float(sys.argv[2])) if len(sys.argv) > 2 else 10**7
+
+    t_old, t_new = 0, 0
+    max_diff_deg, max_diff_km, max_diff_nT = 0, 0, 0
+
+    for i_batch, i in enumerate(range(0, n_samples, batch_size)):
+        dat = make_batch(min(batch_size, n_samples - i), seed=i_batch)
+        out = np.empty_like(dat)
+
+        start = time.perf_counter()
+        out_old = cart2sph_einsum(dat[:,0:3], dat[:,3:6])
+        t_old += time.perf_counter() - start
+
+        start = time.perf_counter()
+        maven.cart2sph(dat[:,0:3], dat[:,3:6], out=out)
+        t_new += time.perf_counter() - start
+
+        max_diff_deg = max(max_diff_deg, np.max(np.abs(out[:,0:2] - out_old[:,0:2])))
+        max_diff_km  = max(max_diff_km,  np.max(np.abs(out[:,2]   - out_old[:,2])))
+        max_diff_nT  = max(max_diff_nT,  np.max(np.abs(out[:,3:]  - out_old[:,3:])))
+        print(f'{i + dat.shape[0]:>12} / {n_samples} samples', end='\r')
+        del out_old
+
+    mem_old = peak_memory(cart2sph_einsum, dat[:,0:3], dat[:,3:6])
+    mem_new = peak_memory(maven.cart2sph, dat[:,0:3], dat[:,3:6], out)
+
+    print(f'\n\nConverted {n_samples:.2e} samples in batches of {batch_size:.0e}\n')
+    print(f'{"":>6} {"time [s]":>10} {"Msamples/s":>11} {"peak extra memory per batch [MB]":>34}')
+    print(f'{"old":>6} {t_old:>10.2f} {n_samples/t_old/1e6:>11.1f} {mem_old/1024**2:>34.1f}')
+    print(f'{"new":>6} {t_new:>10.2f} {n_samples/t_new/1e6:>11.1f} {mem_new/1024**2:>34.1f}')
+    print(f'\nspeedup: {t_old/t_new:.1f}x')
+    print(f'max difference: {max_diff_deg:.1e} deg, {max_diff_km:.1e} km, {max_diff_nT:.1e} nT')
@@ -0,0 +1,165 @@
+"""
+Written by Zain Kamal (zain.eris.kamal@rutgers.edu).
+https://github.com/Humboldt-Penguin/redplanet
+
+------------
+
+Benchmark for reading MAVEN magnetometer `.sts` files straight out of a zip archive, comparing:
+    - "old": `redplanet.Mag.maven.read_sts_loadtxt`, i.e. what `maven_reducer_1_altitude.py` did -- decode the member to text with `io.TextIOWrapper`, scan lines in Python for the '0  0' header sentinel, then `np.loadtxt`.
+    - "new": `redplanet.Mag.maven.read_sts`, which finds the data with a byte search and parses the fixed-width columns with numpy straight from the raw bytes.
+    - "new, <200 km": `read_sts(..., max_radius=R_mars+200)`, which is what `redplanet.Mag.maven.reduce_altitude` uses -- only the position columns are parsed for points above the altitude cut.
+    - "pandas C": same byte search as `read_sts`, then `pd.read_csv(..., sep=r'\s+', engine='c')` straight on the undecoded stream.
+    - "np.fromstring": same byte search, then `np.fromstring(..., sep=' ')` on blocks of whole lines (a split-and-convert of every column).
+
+All read the same member of the same (compressed) zip, so decompression time is included in all of them (run "unzip" alone to see the floor). We report the fastest of `repeat` runs, throughput in uncompressed MB/s, and check the outputs are identical (for the altitude cut, against the "old" output filtered the same way).
+
+Measured on the default synthetic archive (390 MB member, 2.76M lines; Python 3.11, numpy 1.26, pandas 2.2.3, one core):
+
+                   time [s]     MB/s  speedup   identical to "old"
+             unzip     2.40    162.7    2.83x
+               old     6.78     57.6    1.00x   True (2764800 rows)
+               new     6.18     63.1    1.10x   True (2764800 rows)
+      new, <200 km     5.16     75.6    1.31x   True (131183 rows)
+          pandas C     8.53     45.8    0.80x   True (2764800 rows)
+     np.fromstring    10.67     36.6    0.64x   True (2764800 rows)
+
+i.e. once decompression (which no parser can avoid) is taken out, parsing goes from 4.4 s ("old") to 3.8 s ("new") and 2.8 s with the altitude cut, while both general-purpose vectorized parsers are slower than `np.loadtxt` -- they convert all 17 columns, whereas `np.loadtxt` and "new" only convert the 8 that are kept. This is why `read_sts` uses its own fixed-width parser rather than pandas.
+
+By default a synthetic archive is generated with one day of data at 32 Hz (~2.8M lines, ~390 MB of text, same column layout as the real files). To benchmark on real data, pass a path to a zipped MAVEN archive (and optionally the name of the member to read, otherwise the first '.sts' member is used).
+
+Usage:
+    `python benchmark_read_sts.py`
+    `python benchmark_read_sts.py path/to/maven.mag.calibrated-pc-highres__2016.zip [member]`
+"""
+
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from redplanet.Mag import maven
+
+
+repeat = 3
+
+
+
+def make_synthetic_zip(fpath, n=86400*32, seed=0):
+    """One day of fake data in the `.sts` column layout: year, doy, hour, min, sec, msec, decimal day, BX, BY, BZ, range flag, X, Y, Z, dBX, dBY, dBZ."""
+    rng = np.random.default_rng(seed)
+    header = ''.join(f'  OBJECT = RECORD_{i}\n    NAME = FIELD_{i}\n  END_OBJECT = RECORD_{i}\n' for i in range(60))
+
+    t = np.arange(n) / 32 + 0.105
+    cols = np.column_stack([
+        np.full(n, 2016), np.full(n, 60), t // 3600, (t % 3600) // 60, t % 60 // 1, (t % 1) * 1000 // 1,
+        60 + t / 86400,
+        rng.normal(0, 30, (n, 3)),
+        np.ones(n),
+        rng.uniform(-8000, 8000, (n, 3)),
+        rng.uniform(0, 1, (n, 3)),
+    ])
+    fmt = '%6d%4d%3d%3d%3d%4d%14.8f%11.4f%11.4f%11.4f%5d%15.4f%15.4f%15.4f%9.4f%9.4f%9.4f'
+
+    member = 'mvn_mag_l2_2016060pc_20160229_v01_r01.sts'
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fpath_txt = Path(tmpdir) / member
+        with open(fpath_txt, 'w') as f:
+            f.write(header)
+            np.savetxt(f, cols, fmt=fmt)
+        with zipfile.ZipFile(fpath, 'w', zipfile.ZIP_DEFLATED) as z:
+            z.write(fpath_txt, member)
+    return member
+
+
+
+def run(reader, magzip, member):
+    """Fastest of `repeat` reads (output of the last one, and time [s])."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with magzip.open(member) as fin:
+            dat = reader(fin)
+        times.append(time.perf_counter() - start)
+    return dat, min(times)
+
+
+
+def unzip(fin):
+    while fin.read(1024**2):
+        pass
+
+
+
+def read_sts_pandas(fin):
+    """Byte search for the data (same as `read_sts`), then pandas' C parser straight on the undecoded stream."""
+    stream, _ = maven._sts_data_stream(fin)
+    if stream is None:
+        return np.empty((0, len(maven._sts_usecols)))
+    return pd.read_csv(stream, sep=r'\s+', header=None, usecols=list(maven._sts_usecols), engine='c', dtype=np.float64).to_numpy()
+
+
+
+def read_sts_fromstring(fin):
+    """Byte search for the data (same as `read_sts`), then `np.fromstring(..., sep=' ')` on blocks of whole lines, keeping `maven._sts_usecols`."""
+    stream, first_line = maven._sts_data_stream(fin)
+    if stream is None:
+        return np.empty((0, len(maven._sts_usecols)))
+    n_cols = len(first_line.split())
+
+    chunks = []
+    rest = b''
+    while True:
+        block = stream.read(maven._sts_block_size)
+        if not block:
+            break
+        buf = rest + block
+        i = buf.rfind(b'\n') + 1
+        buf, rest = buf[:i], buf[i:]
+        chunks.append(np.fromstring(buf, sep=' ').reshape(-1, n_cols)[:, maven._sts_usecols])
+    if rest.strip():
+        chunks.append(np.fromstring(rest, sep=' ').reshape(-1, n_cols)[:, maven._sts_usecols])
+    return np.concatenate(chunks)
+
+
+
+if __name__ == '__main__':
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+
+        if len(sys.argv) > 1:
+            fpath_zip = Path(sys.argv[1])
+            member = sys.argv[2] if len(sys.argv) > 2 else None
+        else:
+            fpath_zip = Path(tmpdir) / 'synthetic.zip'
+            print('Generating synthetic archive...')
+            member = make_synthetic_zip(fpath_zip)
+
+        with zipfile.ZipFile(fpath_zip) as magzip:
+            if member is None:
+                member = next(name for name in sorted(magzip.namelist()) if name.endswith('.sts'))
+            size_mb = magzip.getinfo(member).file_size / 1024**2
+            print(f'Reading "{member}" ({size_mb:.0f} MB uncompressed), fastest of {repeat} runs each\n')
+
+            max_radius = maven.R_mars + 200
+            readers = {
+                'unzip'        : unzip,
+                'old'          : maven.read_sts_loadtxt,
+                'new'          : maven.read_sts,
+                'new, <200 km' : lambda fin: maven.read_sts(fin, max_radius=max_radius),
+                'pandas C'     : read_sts_pandas,
+                'np.fromstring': read_sts_fromstring,
+            }
+            results = {name: run(reader, magzip, member) for name, reader in readers.items()}
+
+    dat_old, t_old = results['old']
+    expected = {name: dat_old for name in readers if name != 'unzip'}
+    expected['new, <200 km'] = dat_old[(dat_old[:,5]**2 + dat_old[:,6]**2 + dat_old[:,7]**2) < max_radius**2]
+
+    print(f'{"":>14} {"time [s]":>10} {"MB/s":>8} {"speedup":>8}   identical to "old"')
+    for name, (dat, t) in results.items():
+        identical = f'{np.array_equal(dat, expected[name])} ({dat.shape[0]} rows)' if name in expected else ''
+        print(f'{name:>14} {t:>10.2f} {size_mb/t:>8.1f} {t_old/t:>7.2f}x   {identical}')
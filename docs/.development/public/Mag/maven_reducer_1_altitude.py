@@ -4,6 +4,8 @@ https://github.com/Humboldt-Penguin/redplanet
 
 ------------
 
+NOTE: This script has been packaged as `redplanet.Mag.maven.reduce_altitude`, which processes files in parallel and can resume an interrupted run. This script is kept for reference.
+
 This script allows you to reduce the size of the MAVEN magnetometer dataset by filtering out data above a certain altitude. This leads to significant reductions in file sizes and read/processing time (>95% of data point are removed when max altitude is set to 200 km, and file size + read time are further improved by the .npy file type). 
 
 
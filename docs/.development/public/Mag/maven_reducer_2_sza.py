@@ -4,6 +4,8 @@ https://github.com/Humboldt-Penguin/redplanet
 
 ------------
 
+NOTE: This script has been packaged as `redplanet.Mag.maven.reduce_altitude(..., min_sza=..., fpath_insituzip=...)`, which applies the altitude and solar zenith angle filters in a single pass over the raw data, with a vectorized night mask (`redplanet.Mag.maven.night_mask`). This script is kept for reference.
+
 This script allows you to remove nighttime data from the MAVEN magnetometer dataset as measured by solar zenith angle. Note that this is the second part of a series of scripts that reduces MAVEN data -- see `maven_reducer_1_altitude.py` for part 1.
 
 
@@ -0,0 +1,83 @@
+"""
+Written by Zain Kamal (zain.eris.kamal@rutgers.edu).
+https://github.com/Humboldt-Penguin/redplanet
+
+------------
+
+Benchmark for the import time of each redplanet submodule, i.e. what a short script/CLI job or a fresh worker process pays before doing anything. Heavy dependencies (`pyshtools`, `matplotlib`, `gdown`, `xarray`, `pandas`, and `dask.array` which imports the latter two) are deferred with `redplanet.utils.lazy_import`, so they're only imported the first time they're actually used.
+
+Each submodule is imported in a fresh interpreter with `python -X importtime` (several times, keeping the fastest run), and we report:
+    - cumulative import time of the submodule (including all of its dependencies that aren't already imported by the interpreter at startup),
+    - which of the deferred dependencies were imported anyway (there should be none).
+
+This is tracked as a regression target: the script exits with status 1 if any submodule fails to import, exceeds its budget in `budgets`, or imports a deferred dependency. Budgets are ~2x the times measured on a laptop when deferring was introduced (before, `pyshtools` alone took ~1.7 s, and `redplanet.Crust` ~2 s). Pass `--no-check` to only print the table.
+
+Usage:
+    `python benchmark_import_time.py`
+    `python benchmark_import_time.py --repeat 10 --no-check`
+"""
+
+import argparse
+import subprocess
+import sys
+
+
+
+budgets = {     # seconds
+    'redplanet'          : 0.05,
+    'redplanet.utils'    : 0.5,
+    'redplanet.GRS'      : 0.5,
+    'redplanet.Craters'  : 0.5,
+    'redplanet.Mag'      : 0.6,
+    'redplanet.Mag.maven': 0.6,
+    'redplanet.Crust'    : 1.0,
+    'redplanet.Heat'     : 1.0,
+}
+
+deferred = ('pyshtools', 'matplotlib', 'gdown', 'xarray', 'pandas', 'dask.array')
+
+
+
+def import_time(module):
+    """Returns (cumulative import time [s], names of all modules imported) for one fresh import of `module`, or raises `RuntimeError` with the traceback if it fails."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    ## lines look like "import time:       self [us] |  cumulative | <indent>name"
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1e6
+    return times[module], set(times)
+
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5, help='imports per submodule, the fastest is reported')
+    parser.add_argument('--no-check', action='store_true', help="don't exit with status 1 on regressions")
+    args = parser.parse_args()
+
+    failed = False
+    print(f'{"":>20} {"time [s]":>9} {"budget":>7}   deferred dependencies imported')
+
+    for module, budget in budgets.items():
+        try:
+            runs = [import_time(module) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f'{module:>20} {"FAILED":>9} {budget:>7.2f}   {e}')
+            failed = True
+            continue
+
+        t = min(t for t, _ in runs)
+        imported = sorted(name for name in deferred if any(name in names for _, names in runs))
+        flag = '' if (t <= budget and not imported) else '  <-- REGRESSION'
+        failed |= bool(flag)
+        print(f'{module:>20} {t:>9.3f} {budget:>7.2f}   {", ".join(imported) or "-"}{flag}')
+
+    if failed and not args.no_check:
+        sys.exit(1)
@@ -15,8 +15,7 @@ from redplanet import utils
 
 import pooch
 
-import pandas as pd
-import matplotlib.pyplot as plt
+pd = utils.lazy_import('pandas')
 
 
 
@@ -26,7 +25,7 @@ import matplotlib.pyplot as plt
 
 
 
-__datapath = utils.getPath(pooch.os_cache('redplanet'), 'Craters')
+__datapath = pooch.os_cache('redplanet') / 'Craters'
 '''
 Path where pooch downloads/caches data.
 '''
@@ -34,7 +33,7 @@ Path where pooch downloads/caches data.
 
 
 
-__database: pd.core.frame.DataFrame
+__database: 'pd.DataFrame'
 '''
 Pandas dataframe containing information for all craters. Keys are:
     - 'ID'
@@ -84,6 +83,8 @@ def get_database(minDiam=0, maxDiam=9999, dict=False):
             - We actually use a database uploaded to Kaggle in 2021 (https://www.kaggle.com/datasets/codebreaker619/mars-crater-study-dataset?resource=download). There is no associated citation, but it is attributed to Stuart Robbins. The database is nearly identical for craters >10km, with a few minor discrepencies and less columns (which are not used in this module anyway). We take the csv and remove all craters <10km to reduce size, then upload to Google Drive: https://drive.google.com/file/d/1s7I529s9J7E8e3iMTX1s-wXJQnw5nwlm/view?usp=sharing.
 
     """
+    _initialize()
+
     dat = __database[(minDiam <= __database['diameter_km']) & (__database['diameter_km'] <= maxDiam)]
     if dict:
         dat = list(dat.to_dict('index').values())
@@ -93,10 +94,35 @@ def get_database(minDiam=0, maxDiam=9999, dict=False):
 
 
 ############################################################################################################################################
-""" initialize (run upon import, last line of file) """
+""" initialize (lazily, upon first use) """
+
+
+
+_has_been_initialized = False
+'''
+See `_initialize()`.
+'''
+
 
 
-def __init():
+def ensure_loaded():
+    """
+    DESCRIPTION:
+    ------------
+        Download (or load from cache) the crater database now. Importing `Craters` doesn't load anything -- the database is otherwise read the first time it's needed (e.g. `get` or `get_database`), so processes that never look up a crater don't pay for it.
+
+    """
+    _initialize()
+
+
+
+def _initialize():
+
+    '''lazy initialization uwu'''
+    global _has_been_initialized
+    if _has_been_initialized:
+        return
+
 
     logger = pooch.get_logger()
     logger.disabled = True
@@ -134,6 +160,10 @@ def __init():
     logger.disabled = False
 
 
+    '''lazy loadinggg'''
+    _has_been_initialized = True
+
+
 
 
 
@@ -158,6 +188,7 @@ def get(string):
 
 
     """
+    _initialize()
     
     crater = __database[ __database['name'].str.lower() == string.lower() ]
     if not crater.empty:
@@ -169,10 +200,3 @@ def get(string):
     
     raise ValueError(f'No crater found with name or ID "{string}".')
     # return False
-
-
-
-
-
-############################################################################################################################################
-__init()
\ No newline at end of file
@@ -17,13 +17,23 @@ TODO:
 from redplanet import utils
 
 from pathlib import Path
+from collections import OrderedDict
+import concurrent.futures
+import itertools
 import json
+import os
+import threading
 
 import pooch
 import numpy as np
-import pandas as pd
-import xarray as xr
-import pyshtools as pysh
+import scipy.sparse
+import dask
+import zarr
+
+pd         = utils.lazy_import('pandas')
+xr         = utils.lazy_import('xarray')
+pysh       = utils.lazy_import('pyshtools')
+dask_array = utils.lazy_import('dask.array')    # `dask.array` imports xarray and pandas itself, so it's deferred too
 
 
 
@@ -42,11 +52,57 @@ dat_crust_dict = None
 
 dat_dichotomy_coords = None
 
+## uint8 raster on the topography grid, 1 where north of the dichotomy and 0 where south. only set once requested, see `load_dichotomy_mask`.
+dat_dichotomy_mask = None
+_dichotomy_mask_version = 1             # bump whenever the dichotomy coordinates or their interpolation change
+
+## rows per latitude band of lazily expanded (dask-backed) grids, see `_lazy_shcoeffs_grid`. at lmax=2600 a band is ~10 MB.
+_lazy_band_rows = 128
+
+## LRU of lazily expanded bands that have already been computed, so repeated queries over the same area don't redo the expansion.
+_lazy_band_cache = OrderedDict()    # (grid token, first row) -> np.ndarray
+_lazy_band_cache_max_bytes = 512 * 1024**2
+_lazy_band_cache_lock = threading.Lock()    # dask computes bands from several threads
+_lazy_grid_tokens = itertools.count()
+
+## block-averaged overviews of the topography/moho grids, for coarse `get_region(..., overview=True)` queries, see `_get_overview`.
+_overview_factors = (2, 4, 8, 16, 32, 64)
+_overviews = OrderedDict()    # (grid name, factor) -> xr.DataArray
+_overviews_max_bytes = 256 * 1024**2
+
+## version of the saved topography grids (in their final layout), see `_load_topo_grid`. Bump whenever `_fix_xarray_coords` changes.
+_topo_grid_version = 1
+
+## on-disk cache of expanded moho grids, see `_load_cached_moho_grid`.
+_moho_grid_cache_dirpath = _datapath / 'moho' / 'grids'
+_moho_grid_cache_version = 1             # bump whenever the moho expansion / `_fix_xarray_coords` pipeline changes, so stale grids are never reused
+_moho_grid_cache_max_bytes = 4 * 1024**3
+
+## in-memory LRU of moho models that have been loaded at the current topography resolution, see `_register_moho_model`. The topography grid is shared by all of them.
+_moho_models = OrderedDict()    # model name -> {'moho': xr.DataArray, 'info': dict}
+_moho_models_max_bytes = 2 * 1024**3
+
+## order of the fields in a moho model name, see `load_model`.
+_model_name_fields = ('RIM', 'insight_thickness', 'rho_south', 'rho_north')
+
+## per-process state of `sweep_models` workers, set once by `_init_sweep_worker`.
+_sweep_worker_state = {}
+
+## 200m MOLA/HRSC DEM (zarr zipstore), only opened once requested, see `load_dem`.
+_dem_name = 'Mars_HRSC_MOLA_BlendDEM_Global_200mp_v2'
+dat_dem = None          # dict with the fill value/units, and for each level (1 = full resolution, then the overviews) the zarr array and its coordinates/axis descriptors
+_dem_store = None
+
+## LRU of decompressed DEM chunks, see `get_dem_region`.
+_dem_chunk_cache = OrderedDict()    # (level, chunk row, chunk col) -> np.ndarray
+_dem_chunk_cache_max_bytes = 256 * 1024**2
+_dem_chunk_cache_lock = threading.Lock()
+
 
 
 def get_rawdata(how=None):
     """
-    `format` options: ['xarray', 'dict', 'dichotomy']
+    `format` options: ['xarray', 'dict', 'dichotomy', 'dichotomy_mask']
 
     Note: when viewing/exploring dictionaries, it may help to call:
         ```
@@ -55,7 +111,7 @@ def get_rawdata(how=None):
         ```
     """
     if how is None:
-        raise ValueError('Options are ["xarray", "dict", "dichotomy"].')
+        raise ValueError('Options are ["xarray", "dict", "dichotomy", "dichotomy_mask"].')
 
     _initialize()
     match how:
@@ -65,12 +121,19 @@ def get_rawdata(how=None):
             return dat_crust_dict
         case 'dichotomy':
             return dat_dichotomy_coords
+        case 'dichotomy_mask':
+            return dat_dichotomy_mask
         case _:
-            raise ValueError('Options are ["xarray", "dict", "dichotomy"].')
+            raise ValueError('Options are ["xarray", "dict", "dichotomy", "dichotomy_mask"].')
 
 
 
-def get_model_info():
+def get_model_info(model=None):
+    """
+    Parameters of the active moho model, or of any loaded model if `model` (a name from `get_loaded_models()`) is given.
+    """
+    if model is not None:
+        return dict(_get_model(model)['info'])
     return {
         'name': dat_crust_xrds.attrs.get('moho_model_name'), 
         'RIM': dat_crust_xrds.attrs.get('moho_model_RIM'), 
@@ -81,6 +144,14 @@ def get_model_info():
 
 
 
+def get_loaded_models():
+    """
+    Names of all moho models currently held in memory, from least to most recently used. Any of these can be passed as `model=...` to `get_pt`/`get_points`/`get_region` without reloading.
+    """
+    return list(_moho_models.keys())
+
+
+
 
 
 
@@ -152,15 +223,91 @@ def _initialize():
 
 
 def is_above_dichotomy(lon, lat):
+    """
+    True if (lon, lat) is north of the dichotomy boundary. Accepts scalars or arrays (which are broadcast against each other). Longitudes must be signed, i.e. in range [-180, 180].
+    """
+    return lat >= get_dichotomy_boundary(lon)
+
+
+
+def get_dichotomy_boundary(lon):
+    """
+    Latitude of the dichotomy boundary at each longitude in `lon` (scalar or array, signed longitudes), linearly interpolated between the points of the boundary polyline.
+
+    This doubles as a per-longitude lookup table: for a grid with axes `lons`/`lats`, `lats[:,None] >= get_dichotomy_boundary(lons)[None,:]` classifies every cell with a single broadcast comparison. The table for the current topography grid is kept in `dat_crust_dict['dichotomy_lats']`.
+    """
 
     _initialize()
 
     i_lon = np.searchsorted(dat_dichotomy_coords[:,0], lon, side='right') - 1
-    llon, llat = dat_dichotomy_coords[i_lon]
-    rlon, rlat = dat_dichotomy_coords[i_lon+1]
+    llon, llat = dat_dichotomy_coords[i_lon  ].T
+    rlon, rlat = dat_dichotomy_coords[i_lon+1].T
 
     tlat = llat + (rlat-llat)*( (lon-llon)/(rlon-llon) )
-    return lat >= tlat
+    return tlat
+
+
+
+def load_dichotomy_mask():
+    """
+    Build (or load from cache) a uint8 raster on the same lat/lon axes as `dat_crust_xrds`, which is 1 north of the dichotomy and 0 south of it. This is 1 byte per grid point (~6 MB at 0.1 degrees), and it's cached on disk next to the dichotomy coordinates so later loads are a memory-map.
+
+    This is only used by `get_rho_raster` for whole-grid density -- point/region lookups (`get_pt`/`get_points`/`get_region` with 'rho') always compare against the dichotomy polyline at the exact coordinates, so their results never depend on whether the raster happens to be loaded. It's loaded by `load_model(..., rho_raster=True)` (or on the first `get_rho_raster` call), and dropped by `load_topo` since it depends on the grid.
+    """
+
+    _initialize()
+
+    global dat_dichotomy_mask
+
+    lats = dat_crust_dict['lats']
+    lons = dat_crust_dict['lons']
+    lmax = dat_crust_xrds.lmax
+
+    fpath = _datapath / 'dichotomy' / f'dichotomy_mask__lmax={lmax}__v{_dichotomy_mask_version}.npy'
+
+    mask = None
+    if fpath.is_file():
+        try:
+            mask = np.load(fpath, mmap_mode='r')
+        except (ValueError, OSError):
+            mask = None
+        if (mask is not None) and (mask.shape != (lats.size, lons.size)):
+            mask = None
+
+    if mask is None:
+        mask = (lats[:,None] >= dat_crust_dict['dichotomy_lats'][None,:]).astype(np.uint8)
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        utils.save_npy_atomic(fpath, mask)
+
+    dat_dichotomy_mask = xr.DataArray(mask, coords={'lat': lats, 'lon': lons}, dims=('lat', 'lon'))
+    return dat_dichotomy_mask
+
+
+
+def get_rho_raster(model=None) -> 'xr.DataArray':
+    """
+    Crustal density [kg/m^3] on the full topography grid for the active moho model (or any loaded model, see `get_loaded_models()`), derived from `load_dichotomy_mask`. Handy for whole-array math, e.g. density-weighted quantities alongside `get_rawdata('xarray')`.
+    """
+    mask = dat_dichotomy_mask if dat_dichotomy_mask is not None else load_dichotomy_mask()
+    info = get_model_info(model)
+    return xr.DataArray(
+        np.where(mask.values, info['rho_north'], info['rho_south']),
+        coords = mask.coords,
+        dims   = mask.dims,
+        attrs  = {'units': 'kg/m^3'},
+    )
+
+
+
+def _is_north(lons, lats, outer=False):
+    """
+    Classify points (or, if `outer`, the grid `lats` x `lons`) as north/south of the dichotomy by comparing with the dichotomy boundary at the exact coordinates. Longitudes must be signed.
+
+    NOTE: This deliberately never reads `dat_dichotomy_mask` -- the raster is a nearest-cell approximation, and lookups shouldn't change depending on what was loaded earlier. Use `get_rho_raster` for whole-grid density.
+    """
+    if outer:
+        return lats[:,None] >= get_dichotomy_boundary(lons)[None,:]
+    return is_above_dichotomy(lons, lats)
 
     # v1 = (rlon-llon, rlat-llat)
     # v2 = (rlon-lon, rlat-lat)
@@ -175,7 +322,10 @@ def is_above_dichotomy(lon, lat):
 
 
 
-def load_topo(grid_spacing=0.1): #, maximum_degree=None):
+def load_topo(grid_spacing=0.1, lazy=None): #, maximum_degree=None):
+    """
+    Load the topography grid, which every other quantity is aligned to. Grids finer than 0.1 degrees are lazy by default (`lazy=None`): they're backed by dask and each latitude band is only expanded from spherical harmonics when it's first read (see `_lazy_shcoeffs_grid`), rather than materializing up to several GB at once. Moho models loaded afterwards are lazy too.
+    """
 
     _initialize()
 
@@ -205,10 +355,23 @@ def load_topo(grid_spacing=0.1): #, maximum_degree=None):
     lmax = round(90. / grid_spacing - 1)
     grid_spacing = 180. / (2 * lmax + 2)
 
+    if lazy is None:
+        lazy = (lmax > 899)
+
 
     '''load topography'''
 
-    if grid_spacing == 0.1:
+    _moho_models.clear()    # any loaded moho models were expanded for the previous resolution
+    _lazy_band_cache.clear()
+    _overviews.clear()
+
+    global dat_dichotomy_mask
+    dat_dichotomy_mask = None
+
+    ## fast path: we've already built this grid in its final layout, so just memory-map it
+    topo_xrda = _load_topo_grid(lmax)
+
+    if (topo_xrda is None) and (grid_spacing == 0.1):
         '''OPTION 1/2: use pre-computed grid for speed -- see 'Footnote 1' at bottom of `Crust.py` for further discussion on this.'''
         with utils.disable_pooch_logger():
             fpath_topo_grid = pooch.retrieve(
@@ -223,7 +386,7 @@ def load_topo(grid_spacing=0.1): #, maximum_degree=None):
         topo_shgrid = pysh.SHGrid.from_file(fpath_topo_grid, binary=True)
 
 
-    else:
+    elif topo_xrda is None:
         '''OPTION 2/2: if user is manually requesting a finer grid, compute manually -- the overhead is downloading additional ~300MB to cache and 3-10 seconds processing, so recommend avoiding this.'''
         with utils.disable_pooch_logger():
             fpath_MarsTopo2600 = pooch.retrieve(
@@ -237,12 +400,21 @@ def load_topo(grid_spacing=0.1): #, maximum_degree=None):
 
         # fpath_MarsTopo2600 = Path(fpath_MarsTopo2600)  # causes error when trying to readfile with pysh.SHCoeffs.from_file, it expects a string
         topo_shcoeffs = pysh.SHCoeffs.from_file(fpath_MarsTopo2600, lmax=lmax, name='MarsTopo2600', units='m')
-        topo_shgrid = topo_shcoeffs.expand(grid='DH2', extend=True) * 1e-3 # convert m -> km
+        if lazy:
+            topo_xrda = _lazy_shcoeffs_grid(topo_shcoeffs, lmax, scale=1e-3) # convert m -> km
+        else:
+            topo_shgrid = topo_shcoeffs.expand(grid='DH2', extend=True) * 1e-3 # convert m -> km
+
+
+    if topo_xrda is None:
+        ## save in the final layout, then reopen the saved file so the in-memory copies can be freed
+        _save_topo_grid(lmax, _fix_xarray_coords(topo_shgrid.to_xarray()))
+        del topo_shgrid
+        topo_xrda = _load_topo_grid(lmax)
 
 
 
     '''format into xarray dataset'''
-    topo_xrda = _fix_xarray_coords(topo_shgrid.to_xarray())
     dat_crust_xrds = xr.Dataset({'topo': topo_xrda})
     dat_crust_xrds.attrs = {
         'units': 'km',
@@ -260,13 +432,65 @@ def load_topo(grid_spacing=0.1): #, maximum_degree=None):
 
 
 
+def _topo_grid_fpath(lmax):
+    return _datapath / 'topo' / f'MarsTopo2600__lmax={lmax}__v{_topo_grid_version}.npy'
+
+
+
+def _load_topo_grid(lmax):
+    """
+    Topography grids are saved after `_fix_xarray_coords` (signed longitudes, ascending latitudes, wraparound column) as a `.npy` with the coordinates in a small `.npz` beside it, so loading is a memory-map with no copies -- pages are only read from disk when they're accessed.
+
+    Returns a memory-mapped DataArray, or None if the grid hasn't been built yet.
+    """
+    fpath = _topo_grid_fpath(lmax)
+    fpath_coords = fpath.with_suffix('.coords.npz')
+    if not (fpath.is_file() and fpath_coords.is_file()):
+        return None
+
+    try:
+        dat = np.load(fpath, mmap_mode='r')
+        with np.load(fpath_coords) as coords:
+            lat, lon = coords['lat'], coords['lon']
+    except (ValueError, OSError, KeyError):
+        dat = None
+    if (dat is None) or (dat.shape != (lat.size, lon.size)):
+        fpath.unlink(missing_ok=True)    # corrupt/incomplete, rebuild
+        return None
+
+    return xr.DataArray(dat, coords={'lat': lat, 'lon': lon}, dims=('lat', 'lon'))
+
+
+
+def _save_topo_grid(lmax, topo_xrda):
+    fpath = _topo_grid_fpath(lmax)
+    fpath.parent.mkdir(parents=True, exist_ok=True)
+    ## coordinates first, since the grid file existing is what marks the pair as complete
+    np.savez(fpath.with_suffix('.coords.npz'), lat=topo_xrda.lat.values, lon=topo_xrda.lon.values)
+    utils.save_npy_atomic(fpath, topo_xrda.values)
+
+
+
+
+
+
+
 def load_model(
     RIM, 
     insight_thickness, 
     rho_north, 
     rho_south, 
     suppress_model_error = False,
+    use_cache = True,
+    rho_raster = False,
 ) -> bool:
+    """
+    Load a moho model and add it to `dat_crust_xrds` as 'moho'.
+
+    If `use_cache` is True, the expanded grid is stored on disk (see `_load_cached_moho_grid`), so switching back to a model you've used before is a memory-map rather than a download + SH expansion.
+
+    If `rho_raster` is True, also load the north/south raster on the same grid (see `load_dichotomy_mask`) up front, for `get_rho_raster`. It doesn't change the results of any other lookup.
+    """
 
     _initialize()
 
@@ -274,10 +498,103 @@ def load_model(
     global dat_crust_xrds
     
     model_name = f'{RIM}-{insight_thickness}-{rho_south}-{rho_north}'
+    lmax = dat_crust_xrds.lmax
+
+
+    '''fast paths: the model is already in memory, or we've already expanded it at this resolution'''
+    if model_name in _moho_models:
+        moho_xrda = _moho_models[model_name]['moho']
+    else:
+        moho_xrda = _load_cached_moho_grid(model_name, lmax) if use_cache else None
+    if moho_xrda is None:
+        lazy = _is_lazy(dat_crust_xrds.topo)
+        moho_xrda = _expand_moho_grid(model_name, lmax, suppress_model_error, lazy=lazy)
+        if moho_xrda is None:
+            return False
+        if use_cache and not lazy:
+            _save_cached_moho_grid(model_name, lmax, moho_xrda.values)
+
+
+    dat_crust_xrds['moho'] = moho_xrda
+    more_moho_attrs = {
+        'moho_model_name': model_name,
+        'moho_model_RIM': RIM,
+        'moho_model_insight_thickness': insight_thickness,
+        'moho_model_rho_north': rho_north,
+        'moho_model_rho_south': rho_south,
+    }
+    dat_crust_xrds.attrs.update(more_moho_attrs)
+
+    _register_moho_model(model_name, moho_xrda, get_model_info())
+
+
+    _update_dict_to_match_xrds()
+
+    if rho_raster and (dat_dichotomy_mask is None):
+        load_dichotomy_mask()
+
+    return True
+
+
+
+
+
+
+
+def set_moho_model_memory_limit(max_bytes):
+    """
+    Set the memory budget for moho models held in RAM (default 2 GB). Least recently used models are dropped first once the budget is exceeded, but the active model (most recent `load_model`) is always kept.
+    """
+    global _moho_models_max_bytes
+    _moho_models_max_bytes = max_bytes
+    _evict_moho_models()
+
+
+
+def _register_moho_model(model_name, moho_xrda, info):
+    _moho_models[model_name] = {'moho': moho_xrda, 'info': info}
+    _moho_models.move_to_end(model_name)
+    _evict_moho_models()
+
+
+
+def _evict_moho_models():
+    active = dat_crust_xrds.attrs.get('moho_model_name') if dat_crust_xrds is not None else None
+    total = sum(entry['moho'].nbytes for entry in _moho_models.values())
+    for model_name in list(_moho_models.keys()):    # least recently used first
+        if total <= _moho_models_max_bytes:
+            break
+        if model_name == active:
+            continue
+        total -= _moho_models.pop(model_name)['moho'].nbytes
+
+
+
+def _get_model(model):
+    """Look up a loaded model by name (and mark it as recently used)."""
+    if model not in _moho_models:
+        raise ValueError(f'Moho model "{model}" is not loaded. Load it with `load_model(...)` first -- loaded models are: {get_loaded_models()}.')
+    _moho_models.move_to_end(model)
+    return _moho_models[model]
+
 
 
+def _get_model_xrds(model):
+    """The crust dataset with `model`'s moho in place of the active one (the topography is shared, not copied). `model=None` means the active model."""
+    if model is None:
+        return dat_crust_xrds
+    return dat_crust_xrds.assign(moho=_get_model(model)['moho'])
 
-    '''load a pre-computed registry of moho models, which provides a google drive download link and a sha256 hash for a given model name'''
+
+
+
+
+
+
+def _load_moho_registry() -> dict:
+    """
+    Load a pre-computed registry of moho models, which provides a google drive download link and a sha256 hash for a given model name.
+    """
     with utils.disable_pooch_logger():
         fpath_moho_shcoeffs_registry = pooch.retrieve(
             fname      = 'Crust_mohoSHcoeffs_rawdata_registry.json',
@@ -290,48 +607,313 @@ def load_model(
     with open(fpath_moho_shcoeffs_registry, 'r') as file:
         moho_shcoeffs_registry = json.load(file)
 
+    return moho_shcoeffs_registry
+
+
+
+
+
+
+
+def _expand_moho_grid(model_name, lmax, suppress_model_error=False, lazy=False):
+    """
+    Download SH coefficients for a moho model and expand them onto the same grid as the topography (lazily if `lazy`, see `_lazy_shcoeffs_grid`). Returns None if the model doesn't exist and `suppress_model_error` is True.
+    """
 
+    moho_shcoeffs_registry = _load_moho_registry()
 
-    '''download SH coefficients for the chosen model'''
     try:
         _ = moho_shcoeffs_registry[model_name]
     except KeyError:
         if suppress_model_error:
-            return False
+            return None
         else:
             raise ValueError(f'No Moho model with the inputs {model_name} exists.')
 
+    if lazy:
+        moho_shcoeffs = _read_moho_shcoeffs(model_name, moho_shcoeffs_registry[model_name])
+        return _lazy_shcoeffs_grid(moho_shcoeffs, lmax, scale=1e-3) # convert m -> km
+
+    return _expand_moho_shcoeffs(model_name, moho_shcoeffs_registry[model_name], lmax)
+
+
+
+def _retrieve_moho_shcoeffs(model_name, registry_entry) -> str:
+    """Download (or load from cache) SH coefficients for the chosen model, given its entry in `_load_moho_registry()`."""
     with utils.disable_pooch_logger():
         fpath_moho_shcoeffs = pooch.retrieve(
             fname      = f'{model_name}.txt',
-            url        = moho_shcoeffs_registry[model_name]['link'], 
-            known_hash = moho_shcoeffs_registry[model_name]['hash'],
+            url        = registry_entry['link'], 
+            known_hash = registry_entry['hash'],
             path       = _datapath / 'moho' / 'SH_coeffs', 
             downloader = utils.download_gdrive_file, 
         )
+    return fpath_moho_shcoeffs
 
 
 
-    '''load+save model'''
-    lmax = dat_crust_xrds.lmax
-    moho_shcoeffs = pysh.SHCoeffs.from_file(fpath_moho_shcoeffs)
+def _read_moho_shcoeffs(model_name, registry_entry):
+    return pysh.SHCoeffs.from_file(_retrieve_moho_shcoeffs(model_name, registry_entry))
+
+
+
+def _expand_moho_shcoeffs(model_name, registry_entry, lmax, moho_shcoeffs=None):
+    if moho_shcoeffs is None:
+        moho_shcoeffs = _read_moho_shcoeffs(model_name, registry_entry)
     moho_shgrid = moho_shcoeffs.expand(lmax=lmax, grid='DH2', extend=True) * 1e-3 # convert m -> km
 
-    moho_xrda = _fix_xarray_coords(moho_shgrid.to_xarray())
-    dat_crust_xrds['moho'] = moho_xrda
-    more_moho_attrs = {
-        'moho_model_name': model_name,
-        'moho_model_RIM': RIM,
-        'moho_model_insight_thickness': insight_thickness,
-        'moho_model_rho_north': rho_north,
-        'moho_model_rho_south': rho_south,
-    }
-    dat_crust_xrds.attrs.update(more_moho_attrs)
+    return _fix_xarray_coords(moho_shgrid.to_xarray())
 
 
-    _update_dict_to_match_xrds()
 
-    return True
+def _moho_at_points(model_name, registry_entry, lmax, node_lats, node_lons, indices, method='auto'):
+    """
+    Moho (km) at points given by `indices` (output of `_point_indices`) on the grid with coordinates `node_lats`/`node_lons`, without needing the model to be loaded.
+
+    Uses the on-disk grid cache if the model is there. Otherwise either expands the full grid (`method='grid'`) or sums the spherical harmonics at just the grid nodes that are needed (`method='points'`) -- both give the same values up to floating point round-off, since the point sum is evaluated at the exact grid nodes that `get_points` would read/interpolate between. `method='auto'` picks whichever is cheaper (see `_prefer_point_expansion`).
+    """
+    dat_moho = None
+    fpath = _moho_grid_cache_fpath(model_name, lmax)
+    if fpath.is_file():
+        try:
+            dat_moho = np.load(fpath, mmap_mode='r')
+        except (ValueError, OSError):
+            dat_moho = None
+        if (dat_moho is not None) and (dat_moho.shape != (node_lats.size, node_lons.size)):
+            dat_moho = None
+    if dat_moho is not None:
+        return _sample_points(dat_moho, *indices)
+
+    moho_shcoeffs = _read_moho_shcoeffs(model_name, registry_entry)
+
+    if method == 'auto':
+        n_corners = 1 if indices[1] is None else 4
+        i_lat = indices[0] if n_corners == 1 else np.concatenate([indices[0], indices[0]+1])
+        method = 'points' if _prefer_point_expansion(np.unique(i_lat).size, n_corners * indices[0].size, min(moho_shcoeffs.lmax, lmax), lmax) else 'grid'
+
+    match method:
+        case 'grid':
+            dat_moho = _expand_moho_shcoeffs(model_name, registry_entry, lmax, moho_shcoeffs).values
+            return _sample_points(dat_moho, *indices)
+        case 'points':
+            return _sample_points_from_shcoeffs(moho_shcoeffs, lmax, node_lats, node_lons, *indices) * 1e-3 # convert m -> km
+        case _:
+            raise ValueError(f'Invalid method "{method}". Options are ["auto", "grid", "points"].')
+
+
+
+def _prefer_point_expansion(n_lats, n_nodes, lmax_calc, lmax):
+    """
+    Rough cost model for `_moho_at_points` (weights were measured at lmax=899, in units of one Legendre term inside pyshtools' grid expansion).
+
+        - 'grid': Legendre functions at (2*lmax+2) latitudes up to the coefficients' degree, plus FFTs/copies of the full (2*lmax+2) x (4*lmax+4) grid.
+        - 'points': Legendre functions at every distinct latitude (computed one latitude at a time, so ~8x slower per term), plus a sum over orders for every grid node.
+    """
+    n_terms = (lmax_calc+1)**2
+    cost_grid   = (2*lmax+2) * n_terms + 40 * (2*lmax+2) * (4*lmax+4)
+    cost_points = 8 * n_lats * n_terms + 50 * n_nodes * (lmax_calc+1)
+    return cost_points < cost_grid
+
+
+
+def _sample_points_from_shcoeffs(shcoeffs, lmax, node_lats, node_lons, i_lat, w_lat, j_lon, w_lon):
+    """Same as `_sample_points`, but evaluates the spherical harmonic expansion only at the grid nodes that are needed rather than reading from a full grid."""
+    if w_lat is None:
+        corners = [(i_lat, j_lon)]
+    else:
+        corners = [(i_lat, j_lon), (i_lat, j_lon+1), (i_lat+1, j_lon), (i_lat+1, j_lon+1)]
+
+    ## each grid node is only evaluated once, no matter how many points/corners share it
+    flat = np.concatenate([i * node_lons.size + j for i, j in corners])
+    nodes, inverse = np.unique(flat, return_inverse=True)
+    vals = _expand_shcoeffs_at_points(shcoeffs, lmax, node_lats[nodes // node_lons.size], node_lons[nodes % node_lons.size])
+    vals = vals[inverse].reshape(len(corners), -1)
+
+    if w_lat is None:
+        return vals[0]
+    return (
+        vals[0] * (1-w_lat) * (1-w_lon) +
+        vals[1] * (1-w_lat) *    w_lon  +
+        vals[2] *    w_lat  * (1-w_lon) +
+        vals[3] *    w_lat  *    w_lon
+    )
+
+
+
+def _expand_shcoeffs_at_points(shcoeffs, lmax, lats, lons):
+    """
+    Vectorized equivalent of `shcoeffs.expand(lat=lats, lon=lons)` truncated at degree `lmax` (pyshtools calls `MakeGridPoint` once per point, which recomputes the Legendre functions every time).
+
+    For each distinct latitude, the Legendre functions are computed once and contracted with the coefficients into per-order sums A_m, B_m (see `_shcoeffs_order_sums`), so that each point only costs sum_m [A_m cos(m*lon) + B_m sin(m*lon)].
+    """
+    lats_unique, inverse = np.unique(lats, return_inverse=True)
+    A, B = _shcoeffs_order_sums(shcoeffs, lmax, lats_unique)
+    m = np.arange(A.shape[1])
+
+    ## process points in blocks to bound the size of the (points x orders) cos/sin arrays
+    vals = np.empty(lats.size)
+    lons = np.radians(lons)
+    step = max(1, 2**22 // m.size)
+    for start in range(0, lats.size, step):
+        sl = slice(start, start+step)
+        mlon = np.outer(lons[sl], m)
+        vals[sl] = (
+            np.einsum('ij,ij->i', A[inverse[sl]], np.cos(mlon)) +
+            np.einsum('ij,ij->i', B[inverse[sl]], np.sin(mlon))
+        )
+    return vals
+
+
+
+def _expand_shcoeffs_band(shcoeffs, lmax, lats, n_lon):
+    """
+    Rows of a grid at latitudes `lats` and `n_lon` equally spaced longitudes starting at 0 (i.e. pyshtools' column layout without the duplicate at 360). Along each row the sum over orders is a real inverse FFT, which is how pyshtools expands a full DH grid too -- but here only the requested rows are ever computed.
+    """
+    A, B = _shcoeffs_order_sums(shcoeffs, lmax, lats)
+    X = np.zeros((lats.size, n_lon//2 + 1), dtype=np.complex128)
+    X[:, :A.shape[1]] = (A - 1j*B) * (n_lon/2)
+    X[:, 0] = A[:, 0] * n_lon
+    return np.fft.irfft(X, n=n_lon, axis=1)
+
+
+
+def _shcoeffs_order_sums(shcoeffs, lmax, lats):
+    """
+    For each latitude, contract the coefficients (truncated at degree `lmax`) with the Legendre functions into A_m = sum_l C_lm P_lm(sin(lat)) and B_m = sum_l S_lm P_lm(sin(lat)). Returns `(A, B)`, each with shape (lats.size, lmax_calc+1).
+    """
+    plm = {
+        '4pi'    : pysh.legendre.PlmBar,
+        'ortho'  : pysh.legendre.PlmON,
+        'schmidt': pysh.legendre.PlmSchmidt,
+        'unnorm' : lambda lmax, z, csphase: pysh.legendre.PLegendreA(lmax, z, csphase=csphase),
+    }[shcoeffs.normalization]
+
+    lmax_calc = min(shcoeffs.lmax, lmax)
+
+    ## sparse map from pyshtools' packed Legendre index (l*(l+1)/2 + m) to [A_0..A_lmax, B_0..B_lmax]
+    l_idx, m_idx = np.tril_indices(lmax_calc+1)
+    coeffs_to_AB = scipy.sparse.csr_matrix(
+        (
+            np.concatenate([shcoeffs.coeffs[0][l_idx, m_idx], shcoeffs.coeffs[1][l_idx, m_idx]]),
+            (np.tile(np.arange(l_idx.size), 2), np.concatenate([m_idx, m_idx + lmax_calc+1])),
+        ),
+        shape = (l_idx.size, 2*(lmax_calc+1)),
+    ).T.tocsr()
+
+    AB = np.empty((np.size(lats), 2*(lmax_calc+1)))
+    for k, lat in enumerate(np.ravel(lats)):
+        AB[k] = coeffs_to_AB @ plm(lmax_calc, np.sin(np.radians(lat)), csphase=shcoeffs.csphase)
+    return AB[:, :lmax_calc+1], AB[:, lmax_calc+1:]
+
+
+
+def _lazy_shcoeffs_grid(shcoeffs, lmax, scale=1.):
+    """
+    Same grid as `_fix_xarray_coords(shcoeffs.expand(lmax=lmax, grid='DH2', extend=True).to_xarray()) * scale`, but as a dask-backed DataArray made of latitude bands (`_lazy_band_rows` rows each, spanning all longitudes). A band is only expanded when something reads from it, e.g. a regional `get_region` at 0.035 degrees only computes the few bands it overlaps instead of a multi-GB global grid.
+    """
+    n = 2*lmax + 2
+    lats, lons = utils.reorder_pyshtools_coords(np.linspace(90., -90., n+1), np.linspace(0., 360., 2*n+1))
+    n_lon = 2*n
+    i_180 = n_lon // 2
+    token = next(_lazy_grid_tokens)
+
+    def _band(block_info=None):
+        (r0, r1), _ = block_info[None]['array-location']
+        band = _get_cached_lazy_band((token, r0))
+        if band is None:
+            band = _expand_shcoeffs_band(shcoeffs, lmax, lats[r0:r1], n_lon) * scale
+            ## same reordering as `utils.reorder_pyshtools_grid`: -180 first, plus the wraparound column at 180
+            band = np.concatenate((band[:, i_180:], band[:, :i_180], band[:, i_180:i_180+1]), axis=1)
+            _cache_lazy_band((token, r0), band)
+        return band
+
+    row_chunks = tuple(min(_lazy_band_rows, lats.size - r0) for r0 in range(0, lats.size, _lazy_band_rows))
+    dat = dask_array.map_blocks(_band, chunks=(row_chunks, (lons.size,)), dtype=np.float64, meta=np.empty((0, 0)))
+
+    return xr.DataArray(dat, coords={'lat': lats, 'lon': lons}, dims=('lat', 'lon'))
+
+
+
+def _get_cached_lazy_band(key):
+    with _lazy_band_cache_lock:
+        band = _lazy_band_cache.get(key)
+        if band is not None:
+            _lazy_band_cache.move_to_end(key)
+        return band
+
+
+
+def _cache_lazy_band(key, band):
+    with _lazy_band_cache_lock:
+        _lazy_band_cache[key] = band
+        total = sum(b.nbytes for b in _lazy_band_cache.values())
+        while total > _lazy_band_cache_max_bytes and len(_lazy_band_cache) > 1:
+            total -= _lazy_band_cache.popitem(last=False)[1].nbytes
+
+
+
+
+
+
+
+def set_moho_grid_cache_limit(max_bytes):
+    """
+    Set the maximum total size of the on-disk cache of expanded moho grids (default 4 GB). Least recently used grids are deleted first once the limit is exceeded. Set to 0 to empty the cache.
+    """
+    global _moho_grid_cache_max_bytes
+    _moho_grid_cache_max_bytes = max_bytes
+    _evict_moho_grid_cache()
+
+
+
+def _moho_grid_cache_fpath(model_name, lmax):
+    return _moho_grid_cache_dirpath / f'{model_name}__lmax={lmax}__v{_moho_grid_cache_version}.npy'
+
+
+
+def _load_cached_moho_grid(model_name, lmax):
+    """
+    The cache holds the final (post-`_fix_xarray_coords`) moho values as `.npy` files, keyed by model name, lmax, and `_moho_grid_cache_version`. The lat/lon coordinates aren't stored since they're identical to the topography grid (which has the same lmax).
+
+    Returns a memory-mapped DataArray, or None on a cache miss.
+    """
+    fpath = _moho_grid_cache_fpath(model_name, lmax)
+    if not fpath.is_file():
+        return None
+
+    shape = (dat_crust_xrds.lat.size, dat_crust_xrds.lon.size)
+    try:
+        dat = np.load(fpath, mmap_mode='r')
+    except (ValueError, OSError):
+        dat = None
+    if (dat is None) or (dat.shape != shape):
+        fpath.unlink(missing_ok=True)    # corrupt/incomplete, recompute
+        return None
+
+    fpath.touch()    # mark as recently used for LRU eviction
+    return xr.DataArray(dat, coords={'lat': dat_crust_xrds.lat, 'lon': dat_crust_xrds.lon}, dims=('lat', 'lon'))
+
+
+
+def _save_cached_moho_grid(model_name, lmax, dat):
+    fpath = _moho_grid_cache_fpath(model_name, lmax)
+    fpath.parent.mkdir(parents=True, exist_ok=True)
+    utils.save_npy_atomic(fpath, dat)
+    _evict_moho_grid_cache()
+
+
+
+def _evict_moho_grid_cache():
+    """Delete least recently used grids until the cache is under `_moho_grid_cache_max_bytes`."""
+    if not _moho_grid_cache_dirpath.is_dir():
+        return
+    entries = [(f.stat().st_mtime, f.stat().st_size, f) for f in _moho_grid_cache_dirpath.glob('*.npy')]
+    total = sum(size for _, size, _ in entries)
+    for _, size, f in sorted(entries):
+        if total <= _moho_grid_cache_max_bytes:
+            break
+        f.unlink(missing_ok=True)
+        total -= size
 
 
 
@@ -342,18 +924,19 @@ def load_model(
 
 
 def _fix_xarray_coords(dataarray):
-    dataarray = dataarray.sel(lon=slice(0,359.99999))   # Artiface of pyshtools `extend=True` thing, but I don't just flip it to False because that would clip out latitude -90 as well.
-    dataarray = dataarray.assign_coords(lon=xr.apply_ufunc(utils.clon2lon, dataarray.lon))
-    dataarray = dataarray.sortby('lon', ascending=True)
-    dataarray = dataarray.sortby('lat', ascending=True)
-    dataarray = xr.concat([dataarray, dataarray.sel(lon=-180).assign_coords(lon=180)], dim='lon')  # wraparound for interpolation
-    return dataarray
+    ## drop the duplicate lon=360 column (artifact of pyshtools `extend=True`, which we keep since it also gives latitude -90), convert to signed lons, make lats ascending, and add a wraparound column for interpolation -- in a single copy.
+    return utils.fix_pyshtools_coords(dataarray)
+
 
 
 
 
 
 
+def _is_lazy(dataarray):
+    return isinstance(dataarray.data, dask_array.Array)
+
+
 
 def _update_dict_to_match_xrds():
     global dat_crust_dict
@@ -362,8 +945,13 @@ def _update_dict_to_match_xrds():
         'lons': dat_crust_xrds.lon.values,
         'attrs': dat_crust_xrds.attrs, 
     }
+    ## grid descriptors for O(1) index arithmetic in `get_points`
+    dat_crust_dict['lat_axis'] = utils.describe_uniform_axis(dat_crust_dict['lats'])
+    dat_crust_dict['lon_axis'] = utils.describe_uniform_axis(dat_crust_dict['lons'])
+    ## dichotomy boundary latitude at every grid longitude, see `get_dichotomy_boundary`
+    dat_crust_dict['dichotomy_lats'] = get_dichotomy_boundary(dat_crust_dict['lons'])
     for data_var in list(dat_crust_xrds.data_vars):
-        dat_crust_dict[data_var] = dat_crust_xrds[data_var].values
+        dat_crust_dict[data_var] = dat_crust_xrds[data_var].data    # numpy array, or dask array for lazy grids (never materialized here)
 
 
 
@@ -383,7 +971,14 @@ def get_pt(
     lon, 
     lat, 
     interpolate = False,
+    model       = None,
 ):
+    """
+    Get topography/moho/crustal thickness [km] or crustal density [kg/m^3] at a single coordinate. For many points, use `get_points` or `get_region`.
+
+    model : str (default None)
+        - Name of any loaded moho model (see `get_loaded_models()`) to query instead of the active one.
+    """
 
     '''checks'''
     _initialize()
@@ -406,17 +1001,17 @@ def get_pt(
     match quantity:
 
         case 'topo' | 'moho':
-            val = dat_crust_xrds.interp(lon=lon, lat=lat, assume_sorted=True, method=method)[quantity].item()
+            val = _window(_get_model_xrds(model), lon, lat).interp(lon=lon, lat=lat, assume_sorted=True, method=method)[quantity].values.item()
         
         case 'crust' | 'crustal thickness' | 'crthick':
-            interped = dat_crust_xrds.interp(lon=lon, lat=lat, assume_sorted=True, method=method)
-            val = (interped.topo - interped.moho).item()
+            interped = _window(_get_model_xrds(model), lon, lat).interp(lon=lon, lat=lat, assume_sorted=True, method=method)
+            val = (interped.topo - interped.moho).values.item()
         
         case 'rho' | 'density' | 'crustal density':
-            if is_above_dichotomy(lon, lat):
-                val = get_model_info()['rho_north']
+            if _is_north(lon, lat):
+                val = get_model_info(model)['rho_north']
             else:
-                val = get_model_info()['rho_south']
+                val = get_model_info(model)['rho_south']
         
         case _:
             raise Exception('Invalid quantity. Options are ["topo", "moho", "crust"/"crustal thickness"/"crthick", "rho"/"density"/"crustal desntiy"].')
@@ -433,16 +1028,262 @@ def get_pt(
 
 
 
-def get_region(
-    quantity, 
-    lons         = None,
-    lats         = None,
-    lon_bounds   = None, 
-    lat_bounds   = None, 
-    grid_spacing = None,
+def _window(xrds, lons, lats):
+    """
+    Cut `xrds` down to the cells around the bounding box of `lons`/`lats` (with one cell of margin for interpolation), so that `interp` only reads -- or, for lazy grids, only computes -- the part of the grid it needs. Doesn't change any results.
+    """
+    i_lat = utils.uniform_axis_index(dat_crust_dict['lat_axis'], [np.min(lats), np.max(lats)], method='nearest')
+    j_lon = utils.uniform_axis_index(dat_crust_dict['lon_axis'], [np.min(lons), np.max(lons)], method='nearest')
+    return xrds.isel(
+        lat = slice(max(i_lat[0]-1, 0), i_lat[1]+2),
+        lon = slice(max(j_lon[0]-1, 0), j_lon[1]+2),
+    )
+
+
+
+def _check_points(lons, lats):
+    """Validate paired point coordinates and return them as flat float arrays, with signed longitudes."""
+    lons = np.asarray(lons, dtype=np.float64).ravel()
+    lats = np.asarray(lats, dtype=np.float64).ravel()
+
+    if lons.shape != lats.shape:
+        raise ValueError(f'`lons` and `lats` must have the same number of points (got {lons.shape[0]} and {lats.shape[0]}).')
+    if np.any(lons < -180) or np.any(lons > 360):
+        raise ValueError(f'One value in given `lons` array is out of range [-180, 360].')
+    if np.any(lats < -90) or np.any(lats > 90):
+        raise ValueError(f'One value in given `lats` array is out of range [-90, 90].')
+
+    return utils.plon2slon(lons), lats
+
+
+
+def _point_indices(lons, lats, interpolate):
+    """
+    Grid indices (and weights, if `interpolate`) of points on the current topography grid -- these are the same for every moho model at this resolution.
+
+    For 'nearest', ties go to the *lower* index to match `xarray.interp` (which is what `get_pt`/`get_region` use).
+    """
+    if interpolate:
+        i_lat, w_lat = utils.uniform_axis_index(dat_crust_dict['lat_axis'], lats, method='linear')
+        j_lon, w_lon = utils.uniform_axis_index(dat_crust_dict['lon_axis'], lons, method='linear')
+    else:
+        i_lat, w_lat = utils.uniform_axis_index(dat_crust_dict['lat_axis'], lats, method='nearest', tie='lower'), None
+        j_lon, w_lon = utils.uniform_axis_index(dat_crust_dict['lon_axis'], lons, method='nearest', tie='lower'), None
+    return i_lat, w_lat, j_lon, w_lon
+
+
+
+def _sample_points(dat, i_lat, w_lat, j_lon, w_lon):
+    """Gather values from a 2D (lat, lon) grid at indices/weights from `utils.uniform_axis_index` (weights are None for 'nearest'). For lazy grids, only the bands containing the points are computed (once each, even when several corners share them)."""
+    if isinstance(dat, dask_array.Array):
+        ## gather every corner in a single graph, so each band is computed once
+        corners = [(i_lat, j_lon)] if w_lat is None else [(i_lat, j_lon), (i_lat, j_lon+1), (i_lat+1, j_lon), (i_lat+1, j_lon+1)]
+        vals = dask.compute(*[dat.vindex[i, j] for i, j in corners])
+        if w_lat is None:
+            return vals[0]
+        return (
+            vals[0] * (1-w_lat) * (1-w_lon) +
+            vals[1] * (1-w_lat) *    w_lon  +
+            vals[2] *    w_lat  * (1-w_lon) +
+            vals[3] *    w_lat  *    w_lon
+        )
+    if w_lat is None:
+        return dat[i_lat, j_lon]
+    return (
+        dat[i_lat  , j_lon  ] * (1-w_lat) * (1-w_lon) +
+        dat[i_lat  , j_lon+1] * (1-w_lat) *    w_lon  +
+        dat[i_lat+1, j_lon  ] *    w_lat  * (1-w_lon) +
+        dat[i_lat+1, j_lon+1] *    w_lat  *    w_lon
+    )
+
+
+
+
+
+
+
+
+
+
+def get_points(
+    quantity,
+    lons,
+    lats,
+    interpolate = False,
+    model       = None,
+) -> np.ndarray:
+    """
+    DESCRIPTION:
+    ------------
+        Array-native version of `get_pt` for many scattered points (e.g. crater centres or spacecraft tracks). Works directly on the numpy arrays in `dat_crust_dict` with uniform-grid index arithmetic, so it skips the per-call overhead of `xarray.interp`.
+
+    PARAMETERS:
+    ------------
+        quantity : str
+            Same options as `get_pt`.
+
+        lons, lats : array-like (same shape)
+            Paired coordinates -- the i-th point is (lons[i], lats[i]). Longitude in range [-180, 360], latitude in range [-90, 90].
+
+        interpolate : bool (default False)
+            If True, bilinearly interpolate between the four nearest grid points. Otherwise take the nearest grid point.
+
+        model : str (default None)
+            Name of any loaded moho model (see `get_loaded_models()`) to query instead of the active one.
+
+    RETURN:
+    ------------
+        np.ndarray
+            1D array with one value per point.
+    """
+
+    '''checks'''
+    _initialize()
+
+    lons, lats = _check_points(lons, lats)
+
+
+
+    '''accessing'''
+    i_lat, w_lat, j_lon, w_lon = _point_indices(lons, lats, interpolate)
+
+    dat_topo = dat_crust_dict['topo']
+    dat_moho = dat_crust_dict.get('moho') if model is None else _get_model(model)['moho'].data
+
+    match quantity:
+
+        case 'topo':
+            arr = _sample_points(dat_topo, i_lat, w_lat, j_lon, w_lon)
+
+        case 'moho':
+            arr = _sample_points(dat_moho, i_lat, w_lat, j_lon, w_lon)
+
+        case 'crust' | 'crustal thickness' | 'crthick':
+            arr = (
+                _sample_points(dat_topo, i_lat, w_lat, j_lon, w_lon)
+                - _sample_points(dat_moho, i_lat, w_lat, j_lon, w_lon)
+            )
+
+        case 'rho' | 'density' | 'crustal density':
+            arr = np.where(_is_north(lons, lats), get_model_info(model)['rho_north'], get_model_info(model)['rho_south'])
+
+        case _:
+            raise Exception('Invalid quantity. Options are ["topo", "moho", "crust"/"crustal thickness"/"crthick", "rho"/"density"/"crustal density"].')
+
+    return arr
+
+
+
+
+
+
+
+
+
+
+
+def get_model_points(
+    quantity,
+    lons,
+    lats,
+    RIM,
+    insight_thickness,
+    rho_north,
+    rho_south,
+    interpolate = False,
+    method      = 'auto',
+) -> np.ndarray:
+    """
+    DESCRIPTION:
+    ------------
+        Same as `get_points`, but for any moho model in the registry without loading it (i.e. without making it the active model or keeping its grid in memory). When there are only a few points (e.g. landing sites or crater centres), the spherical harmonics are summed at just those points instead of expanding the full grid, which takes a fraction of the time and memory.
+
+    PARAMETERS:
+    ------------
+        quantity : str
+            Options are ["moho", "crust"/"crustal thickness"/"crthick", "rho"/"density"/"crustal density"].
+
+        lons, lats : array-like (same shape)
+            Paired coordinates -- the i-th point is (lons[i], lats[i]). Longitude in range [-180, 360], latitude in range [-90, 90].
+
+        RIM, insight_thickness, rho_north, rho_south :
+            Model parameters, same as `load_model`.
+
+        interpolate : bool (default False)
+            Same as `get_points`.
+
+        method : str (default 'auto')
+            - 'grid': expand the full grid (like `load_model`) and read the points from it.
+            - 'points': evaluate the spherical harmonics only at the grid nodes needed for the requested points.
+            - 'auto': pick whichever is cheaper for the number of points and the degree of the model.
+            All give the same values as `get_points` after `load_model` (up to floating point round-off).
+
+    RETURN:
+    ------------
+        np.ndarray
+            1D array with one value per point.
+    """
+
+    '''checks'''
+    _initialize()
+
+    lons, lats = _check_points(lons, lats)
+
+    model_name = f'{RIM}-{insight_thickness}-{rho_south}-{rho_north}'
+
+
+
+    '''accessing'''
+    match quantity:
+
+        case 'rho' | 'density' | 'crustal density':
+            return np.where(_is_north(lons, lats), rho_north, rho_south)
+
+        case 'moho' | 'crust' | 'crustal thickness' | 'crthick':
+            pass
+
+        case _:
+            raise Exception('Invalid quantity. Options are ["moho", "crust"/"crustal thickness"/"crthick", "rho"/"density"/"crustal density"].')
+
+    indices = _point_indices(lons, lats, interpolate)
+
+    if model_name in _moho_models:
+        moho = _sample_points(_get_model(model_name)['moho'].data, *indices)
+    else:
+        moho_shcoeffs_registry = _load_moho_registry()
+        if model_name not in moho_shcoeffs_registry:
+            raise ValueError(f'No Moho model with the inputs {model_name} exists.')
+        moho = _moho_at_points(
+            model_name, moho_shcoeffs_registry[model_name], dat_crust_xrds.lmax,
+            dat_crust_xrds.lat.values, dat_crust_xrds.lon.values, indices, method,
+        )
+
+    if quantity == 'moho':
+        return moho
+    return _sample_points(dat_crust_dict['topo'], *indices) - moho
+
+
+
+
+
+
+
+
+
+
+
+def get_region(
+    quantity, 
+    lons         = None,
+    lats         = None,
+    lon_bounds   = None, 
+    lat_bounds   = None, 
+    grid_spacing = None,
     num_points   = None, 
     interpolate  = False,
     as_xarray    = False,
+    model        = None,
+    overview     = False,
 ):
     """
     lon_bounds, clon_bounds, lat_bounds : tuple(float, float)
@@ -451,6 +1292,12 @@ def get_region(
     grid_spacing : float
         - Spacing between points being sampled in degrees. Note that original data is 5x5 degree bins.
 
+    model : str (default None)
+        - Name of any loaded moho model (see `get_loaded_models()`) to query instead of the active one.
+
+    overview : bool (default False)
+        - If True, sample 'topo'/'moho'/'crust' from a block-averaged overview of the grids (2x, 4x, 8x, ... coarser than the loaded grid spacing) -- the coarsest one whose spacing is still at most the spacing of the requested points. Much faster for maps and global sweeps at coarse `grid_spacing`, and each value is then roughly an average over its cell rather than a single sample of the full-resolution grid. Has no effect on 'rho'.
+
     """
 
 
@@ -505,21 +1352,23 @@ def get_region(
     match quantity:
 
         case 'topo' | 'moho':
-            arr = dat_crust_xrds.interp(lon=lons, lat=lats, assume_sorted=True, method=method)[quantity]
+            arr = _interp_grids(model, lons, lats, method, overview)[quantity]
         
         case 'crust' | 'crustal thickness' | 'crthick':
-            interped = dat_crust_xrds.interp(lon=lons, lat=lats, assume_sorted=True, method=method)
+            interped = _interp_grids(model, lons, lats, method, overview)
             arr = (interped.topo - interped.moho)
         
         case 'rho' | 'density' | 'crustal density':
-            vec_is_above_dichotomy = np.vectorize(is_above_dichotomy)
-            arr = vec_is_above_dichotomy(np.meshgrid(lons, lats)[0], np.meshgrid(lons, lats)[1])
-            arr = np.where(arr, get_model_info()['rho_north'], get_model_info()['rho_south'])
+            arr = _is_north(np.asarray(lons), np.asarray(lats), outer=True)
+            arr = np.where(arr, get_model_info(model)['rho_north'], get_model_info(model)['rho_south'])
+            arr = xr.DataArray(arr, coords={'lat': lats, 'lon': lons}, dims=('lat', 'lon'))
         
         case _:
             raise Exception('Invalid quantity. Options are ["topo", "moho", "crust"/"crustal thickness"/"crthick", "rho"/"density"/"crustal density"].')
 
 
+    arr = arr.compute()    # no-op unless the grids are lazy, in which case only the bands under the region are computed
+
     if as_xarray == False:
         arr = arr.values
 
@@ -533,6 +1382,556 @@ def get_region(
 
 
 
+def _interp_grids(model, lons, lats, method, overview=False):
+    """
+    Interpolate the crust dataset (see `_get_model_xrds`) onto the grid `lons` x `lats`, optionally from the coarsest overview that's still at least as fine as the requested points (see `_get_overview`).
+    """
+    factor = _overview_factor(lons, lats) if overview else 1
+    if factor == 1:
+        return _window(_get_model_xrds(model), lons, lats).interp(lon=lons, lat=lats, assume_sorted=True, method=method)
+
+    xrds = _get_overview(model, factor)
+    ## overview cells are block centres, so latitudes beyond the outermost centres are clamped to the edge cells
+    lats_clamped = np.clip(lats, xrds.lat.values[0], xrds.lat.values[-1])
+    interped = _overview_window(xrds, lons, lats_clamped).interp(lon=lons, lat=lats_clamped, assume_sorted=True, method=method)
+    return interped.assign_coords(lat=lats)
+
+
+
+def _overview_factor(lons, lats):
+    """Largest overview factor whose grid spacing is at most the spacing of the requested points (1 if none is)."""
+    spacings = [np.min(np.diff(np.unique(axis))) for axis in (lons, lats) if np.unique(axis).size > 1]
+    if not spacings:
+        return 1
+    max_spacing = min(spacings) * (1 + 1e-9)
+    factor = 1
+    for overview_factor in _overview_factors:
+        if overview_factor * dat_crust_xrds.attrs['grid_spacing'] <= max_spacing:
+            factor = overview_factor
+    return factor
+
+
+
+def _get_overview(model, factor):
+    """
+    The crust dataset of `_get_model_xrds(model)`, block-averaged by `factor` in both directions (see `_coarsen_grid`). Overviews of the topography and of each moho model are built once (lazily, for lazy grids) and kept in a small LRU.
+    """
+    xrds = _get_model_xrds(model)
+    moho_name = model if model is not None else xrds.attrs.get('moho_model_name')
+
+    grids = {}
+    for quantity in xrds.data_vars:
+        key = ('topo' if quantity == 'topo' else moho_name, factor)
+        if key not in _overviews:
+            _overviews[key] = _coarsen_grid(xrds[quantity], factor)
+        _overviews.move_to_end(key)
+        grids[quantity] = _overviews[key]
+
+    total = sum(grid.nbytes for grid in _overviews.values())
+    while total > _overviews_max_bytes and len(_overviews) > len(grids):
+        total -= _overviews.popitem(last=False)[1].nbytes
+
+    return xr.Dataset(grids, attrs=xrds.attrs)
+
+
+
+def _coarsen_grid(dataarray, factor):
+    """
+    Block-average a grid in the layout of `_fix_xarray_coords` by `factor` x `factor` cells, with coordinates at the block centres. Leftover rows/columns that don't fill a whole block are dropped, and a copy of the last/first column is wrapped around each side so the overview still covers longitudes [-180, 180].
+    """
+    body = dataarray.isel(lon=slice(0, -1))    # the last column repeats the first (lon=180 == lon=-180)
+    coarse = body.coarsen(lat=factor, lon=factor, boundary='trim').mean()
+    first, last = coarse.isel(lon=[0]), coarse.isel(lon=[-1])
+    return xr.concat(
+        [last.assign_coords(lon=last.lon - 360), coarse, first.assign_coords(lon=first.lon + 360)],
+        dim = 'lon',
+    )
+
+
+
+def _overview_window(xrds, lons, lats):
+    """Same as `_window`, for overviews (whose wrapped edge columns aren't necessarily evenly spaced, so cells are located by search)."""
+    lat, lon = xrds.lat.values, xrds.lon.values
+    return xrds.isel(
+        lat = slice(max(np.searchsorted(lat, np.min(lats)) - 1, 0), np.searchsorted(lat, np.max(lats), side='right') + 1),
+        lon = slice(max(np.searchsorted(lon, np.min(lons)) - 1, 0), np.searchsorted(lon, np.max(lons), side='right') + 1),
+    )
+
+
+
+
+
+
+
+
+
+def load_dem(fpath=None):
+    """
+    DESCRIPTION:
+    ------------
+        Open the 200m MOLA/HRSC blended DEM (Fergason et al. 2017), which is stored as a chunked Zarr ZipStore (see 'datasets/step1_generate-local/crust/topo/Mars_DEM_200m_MOLA-HRSC.zarr'). Only the coordinates and metadata are read here -- the raster itself is ~11 GB, so `get_dem_region` reads just the chunks overlapping each request.
+
+        Stores built by the dataset pipeline also hold block-averaged overviews (2x, 4x, 8x, ... coarser) which `get_dem_region` uses when a coarser `grid_spacing` is requested. Stores without them still work, just always at full resolution.
+
+        This is independent of `load_topo` (spherical harmonic topography), and is called automatically the first time you use `get_dem_region`.
+
+    PARAMETERS:
+    ------------
+        fpath : str or Path (default None)
+            - Path to a local `.zarr.zip` (e.g. one you built yourself with the dataset pipeline). By default, download (~4 GB, once) to the cache.
+    """
+
+    global dat_dem, _dem_store
+
+    if fpath is None:
+        with utils.disable_pooch_logger():
+            fpath = pooch.retrieve(
+                fname      = f'{_dem_name}.zarr.zip',
+                url        = r'https://rutgers.box.com/shared/static/ou32pr1v6d3osfpicqimn5p9j3tywzs6.zip',
+                known_hash = 'sha1:dc7648a41bba9f5b7acd229560832840150d7ff7',
+                path       = _datapath / 'topo',
+            )
+
+    if _dem_store is not None:
+        _dem_store.close()
+    _dem_chunk_cache.clear()
+
+    _dem_store = zarr.ZipStore(fpath, mode='r')
+    group = zarr.open_group(_dem_store, mode='r')
+    arr = group[_dem_name]
+
+    dat_dem = {
+        'fill_value' : arr.attrs.get('_FillValue', arr.fill_value),
+        'units'      : arr.attrs.get('units', 'm'),
+        'levels'     : {1: _dem_level(group)},
+    }
+    if 'overviews' in group:
+        for name, overview_group in group['overviews'].groups():
+            dat_dem['levels'][int(name.lstrip('x'))] = _dem_level(overview_group)
+    dat_dem['levels'] = dict(sorted(dat_dem['levels'].items()))
+
+
+
+def _dem_level(group):
+    level = {
+        'array' : group[_dem_name],
+        'lat'   : group['lat'][:],
+        'lon'   : group['lon'][:],
+    }
+    level['lat_axis'] = utils.describe_uniform_axis(level['lat'])
+    level['lon_axis'] = utils.describe_uniform_axis(level['lon'])
+    return level
+
+
+
+def set_dem_chunk_cache_limit(max_bytes):
+    """
+    Set the maximum total size of DEM chunks kept in memory by `get_dem_region` (default 256 MB). Least recently used chunks are dropped first.
+    """
+    global _dem_chunk_cache_max_bytes
+    _dem_chunk_cache_max_bytes = max_bytes
+    with _dem_chunk_cache_lock:
+        _evict_dem_chunks()
+
+
+
+def get_dem_region(lon_bounds, lat_bounds, grid_spacing=None, as_xarray=False):
+    """
+    DESCRIPTION:
+    ------------
+        Get the 200m DEM over a lon/lat box. Only the chunks overlapping the box are read from disk/decompressed, and they're kept in a small LRU cache (see `set_dem_chunk_cache_limit`) so neighbouring or repeated queries don't read them again.
+
+    PARAMETERS:
+    ------------
+        lon_bounds : tuple(float, float)
+            - Longitudes in [-180, 360]. A box that crosses the antimeridian is fine, e.g. (170, 190) or (170, -170).
+        lat_bounds : tuple(float, float)
+            - Latitudes in [-90, 90].
+        grid_spacing : float (default None)
+            - Coarsest pixel spacing (degrees) you need. The region is read from the coarsest overview level whose spacing is still at most this (e.g. `grid_spacing=0.1` reads the 16x overview, ~0.054 deg), rather than reading full resolution and throwing most of it away. By default, full resolution (~0.0034 deg).
+        as_xarray : bool (default False)
+            - If True, return an `xr.DataArray` with the pixel coordinates.
+
+    RETURN:
+    ------------
+        np.ndarray (or xr.DataArray)
+            - Elevation in km with dims (lat, lon), NaN where the DEM has no data.
+    """
+
+    lon_bounds = np.asarray(lon_bounds, dtype=np.float64)
+    lat_bounds = np.asarray(lat_bounds, dtype=np.float64)
+    if np.any(lon_bounds < -180) or np.any(lon_bounds > 360):
+        raise ValueError(f'`lon_bounds` {tuple(lon_bounds)} out of range [-180, 360].')
+    if np.any(lat_bounds < -90) or np.any(lat_bounds > 90) or (lat_bounds[0] > lat_bounds[1]):
+        raise ValueError(f'`lat_bounds` {tuple(lat_bounds)} must be ascending within [-90, 90].')
+
+    if dat_dem is None:
+        load_dem()
+
+
+    '''pick resolution'''
+    factor = 1
+    if grid_spacing is not None:
+        for level_factor, level in dat_dem['levels'].items():
+            if level['lon_axis']['spacing'] <= grid_spacing * (1 + 1e-9):
+                factor = level_factor
+    level = dat_dem['levels'][factor]
+
+
+    '''pixel index ranges inside the box'''
+    i0, i1 = _dem_axis_range(level['lat_axis'], *lat_bounds)
+
+    lon_lo, lon_hi = utils.plon2slon(lon_bounds)
+    if (lon_bounds[1] - lon_bounds[0]) >= 360:
+        lon_ranges = [(0, level['lon_axis']['n'])]
+    elif lon_lo <= lon_hi:
+        lon_ranges = [_dem_axis_range(level['lon_axis'], lon_lo, lon_hi)]
+    else:
+        ## crosses the antimeridian -- read both sides and stitch them together
+        lon_ranges = [
+            _dem_axis_range(level['lon_axis'], lon_lo, 180),
+            _dem_axis_range(level['lon_axis'], -180, lon_hi),
+        ]
+
+
+    '''read'''
+    raw = np.concatenate([_read_dem_window(factor, i0, i1, j0, j1) for (j0, j1) in lon_ranges], axis=1)
+
+    arr = raw * 1e-3 if dat_dem['units'] in ('m', 'meters') else raw.astype(np.float64)
+    if dat_dem['fill_value'] is not None:
+        arr[raw == dat_dem['fill_value']] = np.nan
+
+    if as_xarray:
+        arr = xr.DataArray(
+            arr,
+            coords = {
+                'lat': level['lat'][i0:i1],
+                'lon': np.concatenate([level['lon'][j0:j1] for (j0, j1) in lon_ranges]),
+            },
+            dims  = ('lat', 'lon'),
+            attrs = {'units': 'km', 'overview_factor': factor},
+        )
+
+    return arr
+
+
+
+def _dem_axis_range(axis_desc, lo, hi):
+    """Indices `[i0, i1)` of the pixels with centers in `[lo, hi]`."""
+    i0 = int(np.ceil((lo - axis_desc['start']) / axis_desc['spacing'] - 1e-9))
+    i1 = int(np.floor((hi - axis_desc['start']) / axis_desc['spacing'] + 1e-9)) + 1
+    i0, i1 = max(i0, 0), min(i1, axis_desc['n'])
+    return i0, max(i0, i1)
+
+
+
+def _read_dem_window(factor, i0, i1, j0, j1):
+    """
+    Assemble pixels `[i0:i1, j0:j1]` of a DEM level from whole chunks, so each chunk is decompressed at most once and then served from `_dem_chunk_cache`.
+    """
+    arr = dat_dem['levels'][factor]['array']
+    ch_lat, ch_lon = arr.chunks
+    out = np.empty((i1-i0, j1-j0), dtype=arr.dtype)
+
+    for ci in range(i0 // ch_lat, -(-i1 // ch_lat)):
+        for cj in range(j0 // ch_lon, -(-j1 // ch_lon)):
+            chunk = _get_dem_chunk(factor, ci, cj)
+            ## overlap of this chunk with the window, in global pixel indices
+            r0, r1 = max(i0, ci*ch_lat), min(i1, (ci+1)*ch_lat)
+            c0, c1 = max(j0, cj*ch_lon), min(j1, (cj+1)*ch_lon)
+            out[r0-i0:r1-i0, c0-j0:c1-j0] = chunk[r0-ci*ch_lat:r1-ci*ch_lat, c0-cj*ch_lon:c1-cj*ch_lon]
+
+    return out
+
+
+
+def _get_dem_chunk(factor, ci, cj):
+    key = (factor, ci, cj)
+    with _dem_chunk_cache_lock:
+        chunk = _dem_chunk_cache.get(key)
+        if chunk is not None:
+            _dem_chunk_cache.move_to_end(key)
+            return chunk
+
+    chunk = dat_dem['levels'][factor]['array'].blocks[ci, cj]
+
+    with _dem_chunk_cache_lock:
+        _dem_chunk_cache[key] = chunk
+        _evict_dem_chunks()
+    return chunk
+
+
+
+def _evict_dem_chunks():
+    ## caller holds `_dem_chunk_cache_lock`
+    total = sum(chunk.nbytes for chunk in _dem_chunk_cache.values())
+    while total > _dem_chunk_cache_max_bytes and _dem_chunk_cache:
+        total -= _dem_chunk_cache.popitem(last=False)[1].nbytes
+
+
+
+
+
+
+
+
+
+def find_models(
+    RIM               = None,
+    insight_thickness = None,
+    rho_north         = None,
+    rho_south         = None,
+) -> list:
+    """
+    DESCRIPTION:
+    ------------
+        Search the registry of ~22K moho models (the same one `load_model` uses) for models matching the given criteria.
+
+    PARAMETERS:
+    ------------
+        RIM, insight_thickness, rho_north, rho_south : optional
+            Each criterion can be:
+                - None (default) -- match anything,
+                - a single value, e.g. `RIM='Khan2022'` or `insight_thickness=39`,
+                - a list/tuple/set of accepted values, e.g. `rho_north=[2800, 2900]`,
+                - a function returning True/False, e.g. `insight_thickness=lambda t: 30 <= t <= 50`.
+            Numeric fields are compared as numbers, so `39` and `39.0` are equivalent.
+
+    RETURN:
+    ------------
+        list[str]
+            Sorted model names formatted '{RIM}-{insight_thickness}-{rho_south}-{rho_north}'.
+    """
+    criteria = {
+        'RIM'              : RIM,
+        'insight_thickness': insight_thickness,
+        'rho_south'        : rho_south,
+        'rho_north'        : rho_north,
+    }
+
+    model_names = []
+    for model_name in _load_moho_registry().keys():
+        fields = dict(zip(_model_name_fields, model_name.rsplit('-', 3)))    # the RIM itself may contain dashes, so split from the right
+        if all(_field_matches(fields[key], criterion, numeric=(key != 'RIM')) for key, criterion in criteria.items()):
+            model_names.append(model_name)
+
+    return sorted(model_names)
+
+
+
+def _field_matches(value, criterion, numeric):
+    if criterion is None:
+        return True
+    if numeric:
+        value = float(value)
+    if callable(criterion):
+        return bool(criterion(value))
+    if isinstance(criterion, (list, tuple, set, np.ndarray)):
+        return any(_field_matches_one(value, c, numeric) for c in criterion)
+    return _field_matches_one(value, criterion, numeric)
+
+
+
+def _field_matches_one(value, criterion, numeric):
+    return (float(criterion) == value) if numeric else (str(criterion) == value)
+
+
+
+
+
+
+
+def sweep_models(
+    lons,
+    lats,
+    RIM               = None,
+    insight_thickness = None,
+    rho_north         = None,
+    rho_south         = None,
+    models            = None,
+    interpolate       = False,
+    method            = 'auto',
+    out               = None,
+    n_workers         = None,
+    checkpoint_every  = 32,
+) -> 'xr.DataArray':
+    """
+    DESCRIPTION:
+    ------------
+        Evaluate crustal thickness at a set of points for many moho models at once, e.g. every model matching some criteria in the registry. Models are expanded in parallel worker processes, and only the values at the requested points are kept (a full 0.1 degree grid is ~60 MB per model, so keeping every grid is not an option for large sweeps).
+
+        If `out` is given, results are streamed into a zarr store as each model finishes. If the sweep is interrupted, calling `sweep_models` again with the same `out`, models, and points picks up where it left off.
+
+    PARAMETERS:
+    ------------
+        lons, lats : array-like (same shape)
+            Paired coordinates of the sample points -- the i-th point is (lons[i], lats[i]). Longitude in range [-180, 360], latitude in range [-90, 90].
+
+        RIM, insight_thickness, rho_north, rho_south : optional
+            Filter on the registry, see `find_models`. Ignored if `models` is given.
+
+        models : list[str] (default None)
+            Explicit list of model names to evaluate instead of a filter.
+
+        interpolate : bool (default False)
+            Same as `get_points`.
+
+        method : str (default 'auto')
+            Same as `get_model_points`.
+
+        out : str or Path (default None)
+            Path to a zarr store for the results/checkpoint. If None, results are only kept in memory.
+
+        n_workers : int (default None)
+            Number of worker processes (default is `os.cpu_count()`). With `n_workers=1` everything runs in the current process.
+
+        checkpoint_every : int (default 32)
+            How many finished models to accumulate between checkpoint updates in `out`.
+
+    RETURN:
+    ------------
+        xr.DataArray
+            Crustal thickness in km with dims ('model', 'point'), and coordinates 'lon'/'lat' along 'point'. When `out` is given, the array is backed lazily by the zarr store.
+
+    NOTES:
+    ------------
+        Models are evaluated at the resolution of the current topography (see `load_topo`). Moho grids that are already in the on-disk cache (see `load_model`) are reused, but new ones are not added to it since a large sweep would flush everything else out.
+    """
+
+    '''checks'''
+    _initialize()
+
+    lons, lats = _check_points(lons, lats)
+
+    if models is None:
+        models = find_models(RIM=RIM, insight_thickness=insight_thickness, rho_north=rho_north, rho_south=rho_south)
+    models = list(models)
+
+    moho_shcoeffs_registry = _load_moho_registry()
+    missing = [model_name for model_name in models if model_name not in moho_shcoeffs_registry]
+    if missing:
+        raise ValueError(f'No Moho model(s) with the inputs {missing} exist.')
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+
+
+
+    '''setup -- everything that's shared between models is computed once here'''
+    lmax = dat_crust_xrds.lmax
+    i_lat, w_lat, j_lon, w_lon = _point_indices(lons, lats, interpolate)
+    topo = _sample_points(dat_crust_dict['topo'], i_lat, w_lat, j_lon, w_lon)
+
+    if out is None:
+        thick = np.full((len(models), lons.size), np.nan)
+        done = np.zeros(len(models), dtype=bool)
+    else:
+        store = _open_sweep_store(out, models, lons, lats, lmax, interpolate)
+        thick = store['thickness']
+        done = store['done'][:]
+
+    todo = [(i, model_name) for i, model_name in enumerate(models) if not done[i]]
+
+
+
+    '''sweep'''
+    initargs = (topo, (i_lat, w_lat, j_lon, w_lon), lmax, dat_crust_xrds.lat.values, dat_crust_xrds.lon.values, method)
+    n_finished = 0
+
+    def _record(i, row):
+        nonlocal n_finished
+        thick[i] = row
+        done[i] = True
+        n_finished += 1
+        if (out is not None) and (n_finished % checkpoint_every == 0):
+            store['done'][:] = done
+
+    try:
+        if n_workers == 1 or len(todo) <= 1:
+            _init_sweep_worker(*initargs)
+            for i, model_name in todo:
+                _record(i, _sweep_worker(model_name, moho_shcoeffs_registry[model_name]))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers, initializer=_init_sweep_worker, initargs=initargs) as executor:
+                futures = {
+                    executor.submit(_sweep_worker, model_name, moho_shcoeffs_registry[model_name]): i
+                    for i, model_name in todo
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    _record(futures[future], future.result())
+    finally:
+        if out is not None:
+            store['done'][:] = done    # rows are written before they're marked done, so an interrupted sweep only ever redoes work
+        _sweep_worker_state.clear()
+
+
+
+    '''output'''
+    if out is not None:
+        thick = dask_array.from_zarr(store['thickness'])
+
+    return xr.DataArray(
+        thick,
+        dims   = ('model', 'point'),
+        coords = {
+            'model': models,
+            'lon'  : ('point', lons),
+            'lat'  : ('point', lats),
+        },
+        name   = 'crthick',
+        attrs  = {'units': 'km', 'lmax': lmax, 'interpolate': interpolate},
+    )
+
+
+
+def _open_sweep_store(out, models, lons, lats, lmax, interpolate):
+    """
+    Open (or create) the zarr store used as the output/checkpoint of `sweep_models`. An existing store is only resumed if it was made for the exact same models, points, resolution, and interpolation setting.
+    """
+    store = zarr.open_group(str(out), mode='a')
+
+    if 'done' in store:
+        same = (
+            store.attrs.get('lmax') == lmax
+            and store.attrs.get('interpolate') == interpolate
+            and list(store['model'][:]) == models
+            and np.array_equal(store['lon'][:], lons)
+            and np.array_equal(store['lat'][:], lats)
+        )
+        if not same:
+            raise ValueError(f'Existing sweep store at "{out}" was created for different models/points/settings. Delete it or choose a different `out` path.')
+        return store
+
+    store.attrs.update({'lmax': lmax, 'interpolate': interpolate})
+    store.array('model', np.array(models, dtype=str))
+    store.array('lon', lons)
+    store.array('lat', lats)
+    ## one chunk per model, so every finished model is a single independent write
+    store.full('thickness', fill_value=np.nan, shape=(len(models), lons.size), chunks=(1, lons.size), dtype=np.float64)
+    store.zeros('done', shape=(len(models),), chunks=(max(len(models), 1),), dtype=bool)
+    return store
+
+
+
+def _init_sweep_worker(topo, indices, lmax, node_lats, node_lons, method):
+    _sweep_worker_state.update({'topo': topo, 'indices': indices, 'lmax': lmax, 'node_lats': node_lats, 'node_lons': node_lons, 'method': method})
+
+
+
+def _sweep_worker(model_name, registry_entry):
+    """Crustal thickness at the sweep points for a single model. Runs in a worker process, so it only relies on `_sweep_worker_state` and never on the parent's loaded dataset."""
+    state = _sweep_worker_state
+    moho = _moho_at_points(model_name, registry_entry, state['lmax'], state['node_lats'], state['node_lons'], state['indices'], state['method'])
+    return state['topo'] - moho
+
+
+
+
+
+
+
+
+
 '''
 [FOOTNOTE 1]
 
@@ -540,6 +1939,7 @@ def get_region(
     - Spherical harmonic coefficient file 'MarsTopo2600.shape.gz' is 73MB compressed, or 200MB decompressed. 
     - Loading this and expanding to 0.1 degree grid spacing takes 3-7 seconds, which can be annoying for users if forced to wait everytime they import `redplanet.Crust`. 
 - So instead, I pre-compute the `pysh.ShGrid` object and save it to a numpy binary for speed -- corresponding code is below. This topography grid is loaded by default, and if the user wants a finer resolution, we download/load/expand manually.
+- The first time a grid is loaded (either option), it's converted to its final layout (see `_fix_xarray_coords`) and saved in the cache (see `_load_topo_grid`). Every later load just memory-maps that file, which is near-instant and doesn't hold copies of the grid in RAM.
 
     ```
     from redplanet import utils
@@ -20,8 +20,8 @@ from pathlib import Path
 
 import pooch
 import numpy as np
-import pandas as pd 
-import xarray as xr
+pd = utils.lazy_import('pandas')
+xr = utils.lazy_import('xarray')
 
 
 
@@ -164,6 +164,10 @@ def _initialize():
         'lons': _dat_grs_xarr.lon.values,
         'attrs': _dat_grs_xarr.attrs,
     }
+
+    ## grid descriptors (the data is a fixed 5 degree lattice of bin centers) so nearest-bin lookups are index arithmetic rather than a scan over the axis -- see 'Footnote 2'.
+    _dat_grs_dict['lat_axis'] = utils.describe_uniform_axis(_dat_grs_dict['lats'])
+    _dat_grs_dict['lon_axis'] = utils.describe_uniform_axis(_dat_grs_dict['lons'])
     
     for element in _dat_grs_xarr.element.values:
         _dat_grs_dict[element] = {}
@@ -246,8 +250,8 @@ def get_pt(
 
     """NOTE: See 'Footnote 2' at bottom of `GRS.py` for explanation of this indexing method."""
     
-    index_nearest_lat = _dat_grs_dict['lats'].shape[0] - np.argmin(np.flip(np.abs(_dat_grs_dict['lats'] - lat))) - 1
-    index_nearest_lon = _dat_grs_dict['lons'].shape[0] - np.argmin(np.flip(np.abs(_dat_grs_dict['lons'] - lon))) - 1    
+    index_nearest_lat = utils.uniform_axis_index(_dat_grs_dict['lat_axis'], lat, method='nearest', tie='higher')
+    index_nearest_lon = utils.uniform_axis_index(_dat_grs_dict['lon_axis'], lon, method='nearest', tie='higher')
     
     val = _dat_grs_dict[element][quantity][index_nearest_lat][index_nearest_lon] 
 
@@ -268,6 +272,82 @@ def get_pt(
 
 
 
+def get_points(
+    element,
+    lons,
+    lats,
+    quantity = 'concentration',
+    normalize = False,
+):
+    """
+    DESCRIPTION:
+    ------------
+        Batched version of `get_pt` -- get GRS-derived concentration/sigma of an element at many scattered coordinates at once, with no Python loop (scales to 10^7+ points). Gives the same answers as calling `get_pt` on each point.
+
+
+    PARAMETERS:
+    ------------
+        *element : str
+            See `get_pt`.
+
+        *lons, lats : array-like (same shape)
+            Paired coordinates -- the i-th point is (lons[i], lats[i]). Longitude in range [-180, 360], latitude in range [-90, 90]. (These are *not* the axes of a grid, for that use `get_region`.)
+
+        quantity, normalize
+            See `get_pt`.
+
+
+    RETURN:
+    ------------
+        np.ndarray
+            Array with the same shape as `lons`/`lats`, with nan where undefined in GRS data.
+
+    """
+
+    '''checks'''
+    _initialize()
+
+    if element not in ['al','ca','cl','fe','h2o','k','si','s','th']:
+        raise ValueError(f"Element {element} is not in list of supported elements: ['al','ca','cl','fe','h2o','k','si','s','th'].")
+
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+
+    if lons.shape != lats.shape:
+        raise ValueError(f'`lons` and `lats` must have the same shape (got {lons.shape} and {lats.shape}).')
+    if np.any(lons < -180) or np.any(lons > 360):
+        raise ValueError(f'One value in given `lons` array is out of range [-180, 360].')
+    if np.any(lats < -90) or np.any(lats > 90):
+        raise ValueError(f'One value in given `lats` array is out of range [-90, 90].')
+
+    lons = utils.plon2slon(lons) # this only modifies values btwn 180 and 360
+
+
+
+    '''accessing (see 'Footnote 2')'''
+
+    index_nearest_lat = utils.uniform_axis_index(_dat_grs_dict['lat_axis'], lats, method='nearest', tie='higher')
+    index_nearest_lon = utils.uniform_axis_index(_dat_grs_dict['lon_axis'], lons, method='nearest', tie='higher')
+
+    arr = _dat_grs_dict[element][quantity][index_nearest_lat, index_nearest_lon]
+
+    if normalize:
+        if element in ['cl','h2o','s']:
+            raise ValueError(f"Can't normalize a volatile element ('{element}') to a volatile-free (cl, h2o, s) basis.")
+        arr_volatiles = _dat_grs_dict['volatiles'][quantity][index_nearest_lat, index_nearest_lon]
+        arr = arr/(1-arr_volatiles)
+
+    return arr
+
+
+
+
+
+
+
+
+
+
 def get_region(
     element, 
     lons         = None,
@@ -395,4 +475,6 @@ Note to future self:
         ```
 
 - **The only difference** between the two implementations is, in the case of a *tie*, the first method chooses the lower index, and the second method chooses the higher index. We choose the latter because xarray's `sel` function with `method='nearest'` always chooses the higher index and we want consistent behavior here. 
+
+- Both of these are a linear scan over the axis (plus a flipped copy for (2)), done twice per point. Since the GRS data is a fixed 5 degree lattice, we now instead compute the index arithmetically with `utils.uniform_axis_index(..., tie='higher')`, i.e. `floor((lat - lats[0]) / spacing + 0.5)` clipped to the axis, which gives the same answer as (2) in O(1) and works on arrays (see `get_points`).
 '''
\ No newline at end of file
@@ -25,6 +25,33 @@ import numpy as np
 
 
 
+HPE_CONSTANTS = {
+    'U238': {
+        'isotopic_frac': 0.9928, # natural abundance of this isotope relative to all isotopes of this element
+        'heat_release_const': 9.46e-5, # net energy per unit mass [W/kg]
+        'half_life': 4.47e9 # half life [yr]
+    },
+    'U235': {
+        'isotopic_frac': 0.0071,
+        'heat_release_const': 5.69e-4,
+        'half_life': 7.04e8
+    },
+    'Th232': {
+        'isotopic_frac': 1.00,
+        'heat_release_const': 2.64e-5,
+        'half_life': 1.40e10
+    },
+    'K40': {
+        'isotopic_frac': 1.191e-4,
+        'heat_release_const': 2.92e-5,
+        'half_life': 1.25e9
+    }
+}
+'''
+Constants for radiogenic heat producing elements (HPEs), see `calc_H` for references.
+'''
+
+
 
 
 ############################################################################################################################################
@@ -62,7 +89,7 @@ def calc_H(
             How many billions of years in the past to calculate H. (This is used to calculate elapsed half-lives of radiogenic HPEs.)
 
         normalize : bool (default True)
-            If True, normalize to a volatile-free (Cl, H2O, S) basis to get a value representative of the bulk crust chemistry. See `GRS.get()` documentation for more information. We do not recommend turning this off.
+            If True, normalize to a volatile-free (Cl, H2O, S) basis to get a value representative of the bulk crust chemistry. See `GRS.get_pt()` documentation for more information. We do not recommend turning this off.
 
             
     RETURN:
@@ -79,44 +106,26 @@ def calc_H(
 
     """
 
-    utils.checkCoords(lon, lat)
-
-
-    '''initialize heat producing element constants'''
-    HPE = {
-        'U238': {
-            'isotopic_frac': 0.9928, # natural abundance of this isotope relative to all isotopes of this element
-            'heat_release_const': 9.46e-5, # net energy per unit mass [W/kg]
-            'half_life': 4.47e9 # half life [yr]
-        },
-        'U235': {
-            'isotopic_frac': 0.0071,
-            'heat_release_const': 5.69e-4,
-            'half_life': 7.04e8
-        },
-        'Th232': {
-            'isotopic_frac': 1.00,
-            'heat_release_const': 2.64e-5,
-            'half_life': 1.40e10
-        },
-        'K40': {
-            'isotopic_frac': 1.191e-4,
-            'heat_release_const': 2.92e-5,
-            'half_life': 1.25e9
-        }
-    }
+    if not (-180 <= lon <= 180):
+        raise ValueError(f'Given longitude coordinate {lon=} is out of range [-180, 180].')
+    if not (-90 <= lat <= 90):
+        raise ValueError(f'Given latitude coordinate {lat=} is out of range [-90, 90].')
+
+
+    '''initialize heat producing element constants (copy, since we add concentrations below)'''
+    HPE = {element: dict(consts) for element, consts in HPE_CONSTANTS.items()}
 
 
     '''concentrations'''
-    HPE['Th232']['concentration'] = GRS.get(element_name='th', lon=lon, lat=lat, normalize=normalize, quantity='concentration')
-    HPE['K40']['concentration'] = GRS.get(element_name='k', lon=lon, lat=lat, normalize=normalize, quantity='concentration')
+    HPE['Th232']['concentration'] = GRS.get_pt(element='th', lon=lon, lat=lat, normalize=normalize, quantity='concentration')
+    HPE['K40']['concentration'] = GRS.get_pt(element='k', lon=lon, lat=lat, normalize=normalize, quantity='concentration')
 
     HPE['U235']['concentration'] = HPE['U238']['concentration'] = HPE['Th232']['concentration'] / 3.8
 
     for element in HPE:
-        # if HPE[hpe]['concentration'] == GRS.get_nanval:
-        if HPE[element]['concentration'] < 0:
-            return GRS.get_nanval()
+        ## no GRS data here
+        if np.isnan(HPE[element]['concentration']) or HPE[element]['concentration'] < 0:
+            return np.nan
         
         
     '''calculate crustal heat production'''
@@ -201,12 +210,12 @@ def calc_temp_at_depth(
     
     H = calc_H(lon, lat, t_Ga, normalize=True)
 
-    if H == GRS.get_nanval():
-        return GRS.get_nanval()
+    if np.isnan(H):
+        return np.nan
     
     depth_m = depth_km * 1.e3
-    crthick_m = Crust.get('thick', lon, lat) * 1.e3
-    rho = Crust.get('rho', lon, lat)
+    crthick_m = Crust.get_pt('crthick', lon, lat) * 1.e3
+    rho = Crust.get_pt('rho', lon, lat)
     q_b = q_b_mW * 1e-3
 
 
@@ -261,7 +270,7 @@ def calc_depth_at_temp(
     """
     DESCRIPTION:
     ------------
-        Calculate how deep you need to go to reach some ambient temperature. This is nearly identical to `calc_temp_at_depth()` as we're just (binary) searching the crust for a point where the desired temperature is reached -- we simply optimize it so values aren't unnecessarily recomputed. 
+        Calculate how deep you need to go to reach some ambient temperature. This is the inverse of `calc_temp_at_depth()` -- both pieces of the temperature profile (quadratic in the crust, linear in the mantle) are inverted analytically, so the result is exact. If the temperature isn't reached within [0, 1000] km, returns nan. 
 
     
     PARAMETERS:
@@ -303,64 +312,251 @@ def calc_depth_at_temp(
     
     H = calc_H(lon, lat, t_Ga, normalize=True)
 
-    if H == GRS.get_nanval():
-        return GRS.get_nanval()
+    if np.isnan(H):
+        return np.nan
     
-    crthick_m = Crust.get('thick', lon, lat) * 1.e3
-    rho = Crust.get('rho', lon, lat)
+    crthick_m = Crust.get_pt('crthick', lon, lat) * 1.e3
+    rho = Crust.get_pt('rho', lon, lat)
     q_b = q_b_mW * 1e-3
 
 
-    def calc_T(depth_km):
+    '''invert the piecewise temperature profile in closed form (see `_invert_geotherm`) -- exact, rather than a bisection to some tolerance'''
+    depth_km = _invert_geotherm(temp_C, crthick_m, rho, H, q_b, k_cr, k_m)
 
-        depth_m = depth_km * 1.e3
+    if np.isnan(depth_km):
+        return np.nan
 
-        def T_eq1(z_m):
-            return (
-                rho * H * z_m * (crthick_m - z_m/2) / k_cr
-                + q_b * z_m / k_cr
-            )
-        def T_eq2(z):
-            return (
-                rho * H * crthick_m**2 / (2*k_m)
-                + q_b * z / k_m
-            )
+    return float(depth_km)
 
-        if depth_m < crthick_m:
-            T = T_eq1(z_m=depth_m)
-        else:
-            T_0 = T_eq1(z_m=crthick_m) - T_eq2(z=crthick_m) # ensure continutity at crust-mantle boundary
-            T = T_0 + T_eq2(z=depth_m)
 
-        return T
-    
 
-    '''use binary search to find depth at which T = temp_C, within some error (tweak for desired accuracy)'''
 
-    depth_left_km, depth_right_km = 0, 1000
-    depth_mid_km = (depth_left_km + depth_right_km) / 2
 
-    T_left = calc_T(depth_km=depth_left_km)
-    T_right = calc_T(depth_km=depth_right_km)
-    T_mid = calc_T(depth_km=depth_mid_km)
 
-    if temp_C <= T_left or T_right <= temp_C:
-        return GRS.get_nanval()
 
-    error = 1e-2
-    while abs(T_mid - temp_C) > error:
-            
-        if temp_C < T_mid:
-            depth_right_km = depth_mid_km
-        else:
-            depth_left_km = depth_mid_km
 
-        depth_mid_km = (depth_left_km + depth_right_km) / 2
-        T_mid = calc_T(depth_km=depth_mid_km)
 
 
-    return depth_mid_km
-    
+
+############################################################################################################################################
+""" vectorized versions (whole grids, many times) """
+
+
+
+def _decay_coefficients(t_Ga) -> tuple:
+    """
+    Precompute the time-dependent part of `calc_H` once per `t_Ga`, so the heat production rate on a grid reduces to `H = c_Th * a_ThU + c_K * a_K`. The U238/U235 terms are folded into `a_ThU` since their concentrations are both Th/3.8.
+
+    Returns `(a_ThU, a_K)`, each a 1D array with one entry per value in `t_Ga` [W/kg].
+    """
+    t_yr = np.atleast_1d(np.asarray(t_Ga, dtype=np.float64)) * 1e9
+
+    def term(element):
+        consts = HPE_CONSTANTS[element]
+        return consts['isotopic_frac'] * consts['heat_release_const'] * np.exp( (t_yr * np.log(2)) / consts['half_life'] )
+
+    a_ThU = term('Th232') + (term('U238') + term('U235')) / 3.8
+    a_K = term('K40')
+    return a_ThU, a_K
+
+
+
+def _load_region_inputs(lons, lats, normalize=True, need_crust=True) -> dict:
+    """
+    Pull everything the heat calculations need on a (lat, lon) grid as whole arrays, in a single call to each module. Crustal thickness is converted km -> m.
+    """
+    lon_grid, lat_grid = np.meshgrid(np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64))
+
+    dat = {
+        'th': GRS.get_points('th', lon_grid, lat_grid, normalize=normalize),
+        'k' : GRS.get_points('k' , lon_grid, lat_grid, normalize=normalize),
+    }
+    if need_crust:
+        dat['crthick_m'] = Crust.get_points('crthick', lon_grid, lat_grid).reshape(lon_grid.shape) * 1.e3
+        dat['rho'] = Crust.get_points('rho', lon_grid, lat_grid).reshape(lon_grid.shape)
+    return dat
+
+
+
+def _geotherm(depth_m, crthick_m, rho, H, q_b, k_cr, k_m):
+    """
+    Vectorized form of the piecewise temperature profile in `calc_temp_at_depth` (quadratic in the crust, linear in the mantle, continuous at the crust-mantle boundary). All arguments broadcast against each other.
+    """
+    z_cr = np.minimum(depth_m, crthick_m)
+    T = (
+        rho * H * z_cr * (crthick_m - z_cr/2) / k_cr
+        + q_b * z_cr / k_cr
+    )
+    ## below the moho, the `rho * H * crthick_m**2 / (2*k_m)` terms from `T_eq2` cancel out and only the basal heat flow contributes.
+    T = T + q_b * np.maximum(depth_m - crthick_m, 0) / k_m
+    return T
+
+
+
+def _invert_geotherm(temp_C, crthick_m, rho, H, q_b, k_cr, k_m, max_depth_km=1000):
+    """
+    Closed-form inverse of `_geotherm`, i.e. the depth [km] at which the temperature reaches `temp_C`. All arguments broadcast against each other.
+
+    With `a = rho*H/k_cr`, `b = q_b/k_cr`, and crustal thickness `c`:
+        - crust  (T <= T_c):  T = -(a/2) z^2 + (a c + b) z  -->  z = 2T / ((a c + b) + sqrt((a c + b)^2 - 2 a T))
+            (this is the smaller root of the quadratic, written so it stays stable as `a -> 0`)
+        - mantle (T >  T_c):  T = T_c + q_b (z - c) / k_m    -->  z = c + (T - T_c) k_m / q_b
+    where `T_c = a c^2 / 2 + b c` is the temperature at the moho.
+
+    The result is nan unless `T(0) < temp_C < T(max_depth_km)` (which includes points where `H` is nan).
+    """
+    a = rho * H / k_cr
+    b = q_b / k_cr
+    ac_b = a * crthick_m + b
+    T_c = a * crthick_m**2 / 2 + b * crthick_m
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_crust = 2 * temp_C / (ac_b + np.sqrt(np.maximum(ac_b**2 - 2 * a * temp_C, 0)))
+        z_mantle = crthick_m + (temp_C - T_c) * k_m / q_b
+    depth_m = np.where(temp_C <= T_c, z_crust, z_mantle)
+
+    T_max = _geotherm(max_depth_km * 1.e3, crthick_m, rho, H, q_b, k_cr, k_m)
+    valid = (0 < temp_C) & (temp_C < T_max)
+    return np.where(valid, depth_m * 1.e-3, np.nan)
+
+
+
+
+
+
+
+
+
+
+def calc_H_region(
+    lons,
+    lats,
+    t_Ga,
+    normalize = True,
+) -> np.ndarray:
+    """
+    DESCRIPTION:
+    ------------
+        Vectorized version of `calc_H` over a grid and any number of times. Decay factors are computed once per time, and GRS data is pulled as whole arrays.
+
+
+    PARAMETERS:
+    ------------
+        lons, lats : 1D array-like
+            Grid axes in degrees.
+
+        t_Ga : float or 1D array-like
+            How many billions of years in the past to calculate H.
+
+        normalize : bool (default True)
+            See `calc_H`.
+
+
+    RETURN:
+    ------------
+        np.ndarray
+            Heat production rate [W/kg] with shape (len(t_Ga), len(lats), len(lons)). Points without GRS data are nan.
+
+    """
+    dat = _load_region_inputs(lons, lats, normalize=normalize, need_crust=False)
+    a_ThU, a_K = _decay_coefficients(t_Ga)
+    return dat['th'] * a_ThU[:,None,None] + dat['k'] * a_K[:,None,None]
+
+
+
+
+
+
+
+
+
+
+def calc_temp_at_depth_region(
+    lons,
+    lats,
+    depth_km: float,
+    t_Ga,
+    q_b_mW = 0,
+    k_cr = 2.5,
+    k_m = 4,
+) -> np.ndarray:
+    """
+    DESCRIPTION:
+    ------------
+        Vectorized version of `calc_temp_at_depth` over a grid and any number of times. GRS and Crust data are pulled once as whole arrays, so a global map takes seconds rather than the tens of minutes of the per-pixel path.
+
+
+    PARAMETERS:
+    ------------
+        lons, lats : 1D array-like
+            Grid axes in degrees.
+
+        depth_km, q_b_mW, k_cr, k_m
+            See `calc_temp_at_depth`.
+
+        t_Ga : float or 1D array-like
+            How many billions of years in the past to calculate H.
+
+
+    RETURN:
+    ------------
+        np.ndarray
+            Temperature in Celsius with shape (len(t_Ga), len(lats), len(lons)). Points without GRS data are nan.
+
+    """
+    dat = _load_region_inputs(lons, lats)
+    a_ThU, a_K = _decay_coefficients(t_Ga)
+    H = dat['th'] * a_ThU[:,None,None] + dat['k'] * a_K[:,None,None]
+
+    return _geotherm(depth_km * 1.e3, dat['crthick_m'], dat['rho'], H, q_b_mW * 1e-3, k_cr, k_m)
+
+
+
+
+
+
+
+
+
+
+def calc_depth_at_temp_region(
+    lons,
+    lats,
+    temp_C: float,
+    t_Ga,
+    q_b_mW = 0,
+    k_cr = 2.5,
+    k_m = 4,
+) -> np.ndarray:
+    """
+    DESCRIPTION:
+    ------------
+        Vectorized version of `calc_depth_at_temp` over a grid and any number of times. The temperature profile is inverted in closed form on every point at once (see `_invert_geotherm`).
+
+
+    PARAMETERS:
+    ------------
+        lons, lats : 1D array-like
+            Grid axes in degrees.
+
+        temp_C, q_b_mW, k_cr, k_m
+            See `calc_depth_at_temp`.
+
+        t_Ga : float or 1D array-like
+            How many billions of years in the past to calculate H.
+
+
+    RETURN:
+    ------------
+        np.ndarray
+            Depth in km with shape (len(t_Ga), len(lats), len(lons)). Nan where there's no GRS data, or where `temp_C` isn't reached within [0, 1000] km.
+
+    """
+    dat = _load_region_inputs(lons, lats)
+    a_ThU, a_K = _decay_coefficients(t_Ga)
+    H = dat['th'] * a_ThU[:,None,None] + dat['k'] * a_K[:,None,None]
+
+    return _invert_geotherm(temp_C, dat['crthick_m'], dat['rho'], H, q_b_mW * 1e-3, k_cr, k_m)
 
 
 
@@ -491,9 +687,9 @@ def visualize(
 
         case 'heat flow':
             def plotThis(lon, lat):
-                rho = Crust.get('rho', lon, lat)
+                rho = Crust.get_pt('rho', lon, lat)
                 H = calc_H(lon, lat, t_Ga, normalize=True)
-                z = Crust.get('thick', lon, lat) * 1.e3
+                z = Crust.get_pt('crthick', lon, lat) * 1.e3
                 return rho * H * z * 1.e3
 
             title1 = 'Crustal Heat Flow'
@@ -14,8 +14,10 @@ from redplanet import utils
 
 import pooch
 
-import pyshtools as pysh
 import numpy as np
+pysh = utils.lazy_import('pyshtools')
+
+import concurrent.futures
 
 
 
@@ -27,7 +29,7 @@ import numpy as np
 
 
 
-__datapath = utils.getPath(pooch.os_cache('redplanet'), 'Mag')
+__datapath = pooch.os_cache('redplanet') / 'Mag'
 '''
 Path where pooch downloads/caches data.
 '''
@@ -46,26 +48,58 @@ Holds all information for the currently loaded crustal thickness model. Fields a
     - (model parameters)
         - 'grid_spacing'
             - Grid spacing [deg]
+        - 'lmax'
+            - Maximum spherical harmonic degree
     - (data)
+        - 'radii'
+            - 1D np.ndarray of the radii of the loaded shells, ascending [km]
         - 'lons'
             - 1D np.ndarray of longitudes [deg]
         - 'lats'
             - 1D np.ndarray of latitudes [deg]
         - 'dat_Bmag'
-            - 2D np.ndarray of magnetic field, total magnitude [nT]
+            - 3D np.ndarray (radius, lat, lon) of magnetic field, total magnitude [nT]
         - 'dat_Blon'
-            - 2D np.ndarray of magnetic field, longitude/theta/azimuth component [nT]
+            - 3D np.ndarray (radius, lat, lon) of magnetic field, longitude/theta/azimuth component [nT]
         - 'dat_Blat'
-            - 2D np.ndarray of magnetic field, latitude/phi/elevation component [nT]
+            - 3D np.ndarray (radius, lat, lon) of magnetic field, latitude/phi/elevation component [nT]
         - 'dat_Br'
-            - 2D np.ndarray of magnetic field, radial component [nT]
+            - 3D np.ndarray (radius, lat, lon) of magnetic field, radial component [nT]
 '''
 
 def get_current_model() -> dict:
+    _initialize()
     return __current_model
 
 
 
+__shcoeffs = {}
+'''
+Langlais spherical harmonic coefficients (`pysh.SHMagCoeffs`) that have been read so far, keyed by lmax. Evaluating the field off the surface (`get_points_at_radius`) only needs these, not the expanded grids.
+'''
+
+__r0 = 3393.5
+'''
+Reference radius of the Langlais coefficients [km].
+'''
+
+__quantities = {
+    'dat_Bmag': 'total',
+    'dat_Blon': 'theta',
+    'dat_Blat': 'phi',
+    'dat_Br'  : 'radial',
+}
+'''
+Keys of the grids in `__current_model`, and the corresponding variables of the expanded `pysh.SHMagGrid` (as an xarray Dataset).
+'''
+
+__points_chunk_size = 512
+'''
+Number of points evaluated at once by `get_points_at_radius` (a few (lmax+1) x chunk arrays, sized to stay in CPU cache).
+'''
+
+
+
 
 
 
@@ -74,11 +108,33 @@ def get_current_model() -> dict:
 
 
 ############################################################################################################################################
-""" initialize (run upon import, last line of file) """
+""" initialize (lazily, upon first use) """
 
 
-def __init():
 
+_has_been_initialized = False
+'''
+See `_initialize()`. Also set by `load_langlais`, so a model the user loaded themselves is never replaced by the default one.
+'''
+
+
+
+def ensure_loaded():
+    """
+    DESCRIPTION:
+    ------------
+        Load the default model (full resolution Langlais at its reference radius, see `load_langlais`) now, unless a model has already been loaded. Importing `Mag` doesn't download or expand anything -- this otherwise happens the first time a grid is sampled (e.g. `get`, `get_points`, `get_region`), so processes that never touch the grids (e.g. `maven` workers, or `get_points_at_radius` which only needs the coefficients) don't pay for it.
+
+    """
+    _initialize()
+
+
+
+def _initialize():
+
+    '''lazy initialization uwu'''
+    if _has_been_initialized:
+        return
 
     '''load the highest resolution of langlais magnetic field model'''
     load_langlais()
@@ -103,72 +159,62 @@ def __init():
 
 
 
-def load_langlais(lmax=134):
-
-    '''temporarily disable the logger so we don't get unnecessary output every time a file is downloaded for the first time'''    
-    logger = pooch.get_logger()
-    logger.disabled = True
+def load_langlais(lmax=134, radii=None, use_cache=True):
+    """
+    DESCRIPTION:
+    ------------
+        Load the Langlais et al. (2019) crustal field model as grids on one or more spherical shells, which `get`/`get_points`/`get_region` then interpolate (bilinearly within a shell, and linearly in radius between shells).
 
-    filepath = pooch.retrieve(
-        fname      = 'Langlais2019.sh.gz',
-        url        = r'https://drive.google.com/file/d/1cm40isnBN4YhSdIYlYHHaExJmoMi_K8Q/view?usp=sharing',
-        known_hash = 'sha256:3cad9e268f0673be1702f1df504a4cbcb8dba4480c7b3f629921911488fe247b',
-        path       = __datapath,
-        downloader = utils.download_gdrive_file,
-    )
+        Each shell is expanded once and saved to the cache (keyed by `lmax` and radius) in its final layout, so loading it again is a memory-map instead of a spherical harmonic expansion.
 
-    logger.disabled = False
 
+    PARAMETERS:
+    ------------
+        lmax : int (default 134)
+            Maximum spherical harmonic degree (134 is the full model).
 
+        radii : list of float (default None)
+            Radii of the shells from the center of Mars in km, e.g. `3396.2 + np.array([0, 100, 150, 200])` for altitudes of 0-200 km. By default, a single shell at the reference radius of the model (3393.5 km).
 
-    '''construct data'''
+        use_cache : bool (default True)
+            If False, always expand the shells (and don't save them).
 
-    langlais = pysh.SHMagCoeffs.from_file(filepath, lmax=lmax, skip=4, r0=3393.5e3, header=False, file_units='nT', name='Langlais2019', units='nT', encoding='utf-8')
+    """
 
-    # langlais_grid = langlais.expand()
-    # dat_langlais = langlais_grid.to_xarray()
+    radii = np.array([__r0] if radii is None else sorted(set(float(r) for r in np.ravel(radii))))
+    if np.any(radii <= 0):
+        raise ValueError(f'Radii must be positive (got {radii}).')
 
-    dat_langlais = langlais.expand().to_xarray()
 
-    lons = utils.clon2lon(dat_langlais['lon'].to_numpy())
-    lats = dat_langlais['lat'].to_numpy()
+    '''load or expand each shell'''
+    shells = []
+    for radius in radii:
+        shell = __load_shell(lmax, radius) if use_cache else None
+        if shell is None:
+            shell = __expand_shell(lmax, radius)
+            if use_cache:
+                utils.save_npy_atomic(__shell_fpath(lmax, radius), shell)
+        shells.append(shell)
 
-    dat = {
-        'dat_Bmag': dat_langlais['total'].to_numpy(),
-        'dat_Blon': dat_langlais['theta'].to_numpy(),
-        'dat_Blat': dat_langlais['phi'].to_numpy(),
-        'dat_Br': dat_langlais['radial'].to_numpy(),
-    }
+    ## stacked (radius, quantity, lat, lon) -- each quantity is a view of this one array
+    shells = np.stack(shells)
+    for k, key in enumerate(__quantities):
+        __current_model[key] = shells[:, k]
 
-    
-    # rearrange: gridded data is originally in clon 0->360, and we converted to lon, so the current order is lon 0->180/-180->0. we want to convert to lon -180->180, so we rearrange columns.
-    i_left = np.where(lons == -180)[0][0]
-    lons = np.hstack((lons[i_left:], lons[:i_left]))
-    
-    # rearrange: make lats increasing
-    lats = np.flip(lats)
+    n = 2*lmax + 2
+    lats, lons = utils.reorder_pyshtools_coords(np.linspace(90., -90., n+1), np.linspace(0., 360., 2*n+1), lon_pad=2, lat_pad=1)
 
-    # pad: lon (via wraparound) and lat (via duplication) to allow for interpolation at edges
     grid_spacing = 180. / (2 * lmax + 2)
-    lons = np.array( (*lons, lons[-1]+grid_spacing, lons[-1]+grid_spacing*2) )
-    lats = np.array( (*lats, lats[-1]+grid_spacing) )
-
-
 
     __current_model['grid_spacing'] = grid_spacing
+    __current_model['lmax'] = lmax
+    __current_model['radii'] = radii
     __current_model['lons'] = lons
     __current_model['lats'] = lats
 
-    # duplicate above changes for 2d data
-    for key in dat:
-        dat[key] = np.hstack((dat[key][:,i_left:], dat[key][:,:i_left]))
-        
-        dat[key] = np.flip(dat[key], axis=0)
-
-        dat[key] = np.hstack( (dat[key], dat[key][:,0:2] ) )
-        dat[key] = np.vstack( (dat[key], dat[key][-1:,:]) )
-
-        __current_model[key] = dat[key]
+    '''lazy loadinggg'''
+    global _has_been_initialized
+    _has_been_initialized = True
 
 
 
@@ -208,24 +254,142 @@ def load_langlais(lmax=134):
 
 
 
-def get(quantity: str, lon, lat) -> float:
-    
-    utils.checkCoords(lon, lat)
+def __load_shcoeffs(lmax=134) -> 'pysh.SHMagCoeffs':
+    '''
+    Download (once) and read the Langlais coefficients up to degree `lmax`, see `__shcoeffs`.
+    '''
+
+    if lmax in __shcoeffs:
+        return __shcoeffs[lmax]
+
 
+    '''temporarily disable the logger so we don't get unnecessary output every time a file is downloaded for the first time'''    
+    logger = pooch.get_logger()
+    logger.disabled = True
+
+    filepath = pooch.retrieve(
+        fname      = 'Langlais2019.sh.gz',
+        url        = r'https://drive.google.com/file/d/1cm40isnBN4YhSdIYlYHHaExJmoMi_K8Q/view?usp=sharing',
+        known_hash = 'sha256:3cad9e268f0673be1702f1df504a4cbcb8dba4480c7b3f629921911488fe247b',
+        path       = __datapath,
+        downloader = utils.download_gdrive_file,
+    )
+
+    logger.disabled = False
+
+
+    __shcoeffs[lmax] = pysh.SHMagCoeffs.from_file(filepath, lmax=lmax, skip=4, r0=__r0*1e3, header=False, file_units='nT', name='Langlais2019', units='nT', encoding='utf-8')
+    return __shcoeffs[lmax]
+
+
+
+def get_shcoeffs(lmax=134) -> np.ndarray:
+    '''
+    Langlais coefficients up to degree `lmax` as an array with shape (2, lmax+1, lmax+1) (Schmidt semi-normalized, nT, reference radius 3393.5 km), downloaded and read once. Pass these to `get_points_at_radius(..., coeffs=...)` to skip loading them again, e.g. in worker processes.
+    '''
+    return __load_shcoeffs(lmax).coeffs
+
+
+
+
+
+
+
+
+
+def __expand_shell(lmax, radius) -> np.ndarray:
+    '''
+    Expand the model on a shell of radius `radius` [km]. Returns an array with shape (4, lat, lon) holding the grids of `__quantities` (in that order), each reordered + padded like `utils.reorder_pyshtools_grid` describes.
+    '''
+    dat_langlais = __load_shcoeffs(lmax).expand(a=radius*1e3).to_xarray()
+
+    # rearrange + pad: gridded data is originally in clon 0->360 with lats descending. we want lon -180->180 with lats increasing, padded in lon (via wraparound) and lat (via duplication) to allow for interpolation at edges. this is done in a single copy per quantity.
+    return np.stack([
+        utils.reorder_pyshtools_grid(
+            dat_langlais[var].values, dat_langlais['lat'].values, dat_langlais['lon'].values,
+            lon_pad = 2,
+            lat_pad = 1,
+        )[0]
+        for var in __quantities.values()
+    ])
+
+
+
+def __shell_fpath(lmax, radius):
+    return __datapath / 'shells' / f'Langlais2019_lmax{lmax}_r{radius:.4f}km.npy'
+
+
+
+def __load_shell(lmax, radius):
+    '''
+    Memory-map a cached shell, or return None if it hasn't been saved yet (or the file is incomplete).
+    '''
+    fpath = __shell_fpath(lmax, radius)
+    if not fpath.is_file():
+        return None
+    n = 2*lmax + 2
+    try:
+        shell = np.load(fpath, mmap_mode='r')
+    except (ValueError, OSError):
+        shell = None
+    if (shell is None) or (shell.shape != (len(__quantities), n+2, 2*n+2)):
+        fpath.unlink(missing_ok=True)    # corrupt/incomplete, re-expand
+        return None
+    return shell
+
+
+
+
+
+
+
+def __shell_indices(radii) -> tuple:
+    '''
+    For radii [km] (array, or None if only one shell is loaded), the index of the shell below/above each radius and the weight of the one above, for linear interpolation in radius.
+    '''
+    model_radii = __current_model['radii']
+    if radii is None:
+        if model_radii.size > 1:
+            raise ValueError(f'Several shells are loaded (radii {model_radii} km), so a radius has to be given.')
+        return 0, 0, 0.
+
+    radii = np.asarray(radii, dtype=np.float64)
+    tol = 1e-6
+    if np.any(radii < model_radii[0] - tol) or np.any(radii > model_radii[-1] + tol):
+        raise ValueError(f'Radius out of range of the loaded shells [{model_radii[0]}, {model_radii[-1]}] km. Load more shells with `load_langlais(radii=...)`.')
+    if model_radii.size == 1:
+        return 0, 0, np.zeros_like(radii)
+
+    k = np.clip(np.searchsorted(model_radii, radii, side='right') - 1, 0, model_radii.size - 2)
+    w = np.clip((radii - model_radii[k]) / (model_radii[k+1] - model_radii[k]), 0, 1)
+    return k, k+1, w
+
+
+
+
+
+
+
+
+
+def __get_dat(quantity: str) -> np.ndarray:
+    '''
+    Map a user-facing quantity name to the corresponding padded 3D (radius, lat, lon) grid in `__current_model`.
+    '''
 
     match quantity:
 
         case 'Bmag' | 'B_mag':
-            dat = __current_model['dat_Bmag']
+            return __current_model['dat_Bmag']
 
         case 'Blon' | 'B_lon' | 'Btheta' | 'B_theta':
-            dat = __current_model['dat_Blon']
+            return __current_model['dat_Blon']
 
         case 'Blat' | 'B_lat' | 'Bphi' | 'B_phi':
-            dat = __current_model['dat_Blat']
+            return __current_model['dat_Blat']
 
         case 'Br' | 'B_r':
-            dat = __current_model['dat_Br']
+            return __current_model['dat_Br']
 
         case _:
             raise Exception('''Invalid quantity. Options are:
@@ -237,6 +401,27 @@ def get(quantity: str, lon, lat) -> float:
 
 
 
+
+
+
+
+
+def get(quantity: str, lon, lat, radius=None) -> float:
+    
+    if not (-180 <= lon <= 180):
+        raise ValueError(f'Given longitude coordinate {lon=} is out of range [-180, 180].')
+    if not (-90 <= lat <= 90):
+        raise ValueError(f'Given latitude coordinate {lat=} is out of range [-90, 90].')
+
+    _initialize()
+
+
+    dat = __get_dat(quantity)
+    k0, k1, w = __shell_indices(radius)
+
+
+
+
     def bilinear_interpolation(x: float, y: float, points: list) -> float:
         '''
         Credit for this function: https://stackoverflow.com/a/8662355/22122546
@@ -266,37 +451,46 @@ def get(quantity: str, lon, lat) -> float:
 
 
 
-    '''get longitude and latitude (`np.searchsorted` returns the index at which the point would be inserted, i.e. point to the 'right', which is why we subtract 1 to get the point to the 'left'. earlier, we padded the edges of the data with extra points to allow for wraparound on the right side, so we don't need to worry about edge cases.)'''
-    i_lat = np.searchsorted(__current_model['lats'], lat, side='right') - 1
-    j_lon = np.searchsorted(__current_model['lons'], lon, side='right') - 1
-
-
-    points = (
-        (
-            __current_model['lons'][j_lon],
-            __current_model['lats'][i_lat],
-            dat                    [i_lat, j_lon]
-        ),
-        (
-            __current_model['lons'][j_lon+1],
-            __current_model['lats'][i_lat],
-            dat                    [i_lat, j_lon+1]
-        ),
-        (
-            __current_model['lons'][j_lon],
-            __current_model['lats'][i_lat+1],
-            dat                    [i_lat+1, j_lon]
-        ),
-        (
-            __current_model['lons'][j_lon+1],
-            __current_model['lats'][i_lat+1],
-            dat                    [i_lat+1, j_lon+1]
-        ),
-    )
+    def interpolate_shell(dat):
+
+        '''get longitude and latitude (`np.searchsorted` returns the index at which the point would be inserted, i.e. point to the 'right', which is why we subtract 1 to get the point to the 'left'. earlier, we padded the edges of the data with extra points to allow for wraparound on the right side, so we don't need to worry about edge cases.)'''
+        i_lat = np.searchsorted(__current_model['lats'], lat, side='right') - 1
+        j_lon = np.searchsorted(__current_model['lons'], lon, side='right') - 1
+
+
+        points = (
+            (
+                __current_model['lons'][j_lon],
+                __current_model['lats'][i_lat],
+                dat                    [i_lat, j_lon]
+            ),
+            (
+                __current_model['lons'][j_lon+1],
+                __current_model['lats'][i_lat],
+                dat                    [i_lat, j_lon+1]
+            ),
+            (
+                __current_model['lons'][j_lon],
+                __current_model['lats'][i_lat+1],
+                dat                    [i_lat+1, j_lon]
+            ),
+            (
+                __current_model['lons'][j_lon+1],
+                __current_model['lats'][i_lat+1],
+                dat                    [i_lat+1, j_lon+1]
+            ),
+        )
+
+
+
+        return bilinear_interpolation(lon, lat, points)
 
 
 
-    val = bilinear_interpolation(lon, lat, points)
+    '''interpolate within the shell(s) below/above `radius`, then linearly between them'''
+    val = interpolate_shell(dat[k0])
+    if k1 != k0:
+        val = (1 - w) * val + w * interpolate_shell(dat[k1])
 
     return val
 
@@ -308,8 +502,323 @@ def get(quantity: str, lon, lat) -> float:
 
 
 
+def get_points(quantity: str, lons, lats, radii=None) -> np.ndarray:
+    """
+    DESCRIPTION:
+    ------------
+        Vectorized version of `get` -- sample the magnetic field at many arbitrary (lon, lat) pairs in a single pass (e.g. a full MAVEN ground track). Gives the same answers as calling `get` on each point, but at array speed.
+
+        When several shells are loaded (see `load_langlais`), each point is interpolated bilinearly in the two shells around its radius, then linearly in radius.
+
+
+    PARAMETERS:
+    ------------
+        quantity : str
+            See `get`.
+
+        lons, lats : array-like (same shape)
+            Paired coordinates in degrees, with longitude in range [-180, 180] and latitude in range [-90, 90]. These are *not* the axes of a grid -- the i-th point is (lons[i], lats[i]). For a grid, use `get_region`.
+
+        radii : float or array-like (default None)
+            Radius of each point from the center of Mars in km (a single value applies to all points). Must lie within the loaded shells. Can be omitted if only one shell is loaded.
+
+
+    RETURN:
+    ------------
+        np.ndarray
+            Array with the same shape as `lons`/`lats`, units are nT.
+
+    """
+
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+
+    if lons.shape != lats.shape:
+        raise ValueError(f'`lons` and `lats` must have the same shape (got {lons.shape} and {lats.shape}).')
+    if np.any(lons < -180) or np.any(lons > 180):
+        raise ValueError(f'One value in given `lons` array is out of range [-180, 180].')
+    if np.any(lats < -90) or np.any(lats > 90):
+        raise ValueError(f'One value in given `lats` array is out of range [-90, 90].')
+
+
+    _initialize()
+
+    if radii is not None:
+        radii = np.broadcast_to(np.asarray(radii, dtype=np.float64), lons.shape)
+
+
+    dat = __get_dat(quantity)
+    k0, k1, w = __shell_indices(radii)
+    model_lons = __current_model['lons']
+    model_lats = __current_model['lats']
+
+
+    '''same indexing as `get` (see comment there) -- the padding added in `load_langlais` means `i+1`/`j+1` never go out of bounds'''
+    i_lat = np.searchsorted(model_lats, lats, side='right') - 1
+    j_lon = np.searchsorted(model_lons, lons, side='right') - 1
+
+    x1, x2 = model_lons[j_lon], model_lons[j_lon+1]
+    y1, y2 = model_lats[i_lat], model_lats[i_lat+1]
+
+
+    '''same formula (and order of operations) as `bilinear_interpolation` in `get`, so results match the scalar path'''
+    def interpolate_shell(k):
+        return (
+            dat[k, i_lat  , j_lon  ] * (x2 - lons) * (y2 - lats) +
+            dat[k, i_lat  , j_lon+1] * (lons - x1) * (y2 - lats) +
+            dat[k, i_lat+1, j_lon  ] * (x2 - lons) * (lats - y1) +
+            dat[k, i_lat+1, j_lon+1] * (lons - x1) * (lats - y1)
+        ) / ((x2 - x1) * (y2 - y1) + 0.0)
+
+    vals = interpolate_shell(k0)
+    if __current_model['radii'].size > 1:
+        vals = (1 - w) * vals + w * interpolate_shell(k1)
+
+    return vals
+
+
+
+
+
+
+
+
+
+def get_points_at_radius(lons, lats, radii, lmax=134, n_workers=1, coeffs=None) -> np.ndarray:
+    """
+    DESCRIPTION:
+    ------------
+        Evaluate the Langlais et al. (2019) crustal field model at arbitrary points (lon, lat, radius), e.g. every sample along a MAVEN track at its own altitude. Unlike `get`/`get_points`, which interpolate the surface grid from `load_langlais`, this sums the spherical harmonic series at each point, continued upward (or downward) from the reference radius 3393.5 km.
+
+
+    PARAMETERS:
+    ------------
+        lons, lats, radii : array-like (same shape)
+            Paired coordinates: longitude and latitude in degrees (any longitude range), and radius from the center of Mars in km (e.g. 3396.2 + altitude).
+
+        lmax : int (default 134)
+            Maximum spherical harmonic degree (134 is the full model).
+
+        n_workers : int (default 1)
+            Number of worker processes. Points are split into contiguous blocks, one per worker. With `n_workers=1`, everything runs in the current process.
+
+        coeffs : np.ndarray (default None)
+            Coefficients from `get_shcoeffs`. By default they're loaded for `lmax` (downloaded once); if given, `lmax` is ignored and nothing is downloaded or read from disk.
+
+
+    RETURN:
+    ------------
+        np.ndarray
+            Array with shape `lons.shape + (3,)`, with components (B_r, B_theta, B_phi) in nT -- the same convention as pyshtools (B_theta points south, i.e. towards increasing colatitude, and B_phi points east).
+
+
+    NOTES:
+    ------------
+        This is the same as `pysh.gravmag.MakeMagGridPoint` for every point, but vectorized over blocks of points (see `__field_at_points`), which is ~2x faster per point on a single core and has no per-point Python overhead.
+
+    """
+
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    radii = np.asarray(radii, dtype=np.float64)
+
+    if not (lons.shape == lats.shape == radii.shape):
+        raise ValueError(f'`lons`, `lats`, and `radii` must have the same shape (got {lons.shape}, {lats.shape}, and {radii.shape}).')
+    if np.any(np.abs(lats) > 90):
+        raise ValueError(f'One value in given `lats` array is out of range [-90, 90].')
+    if np.any(radii <= 0):
+        raise ValueError(f'One value in given `radii` array is not positive.')
+
+
+    if coeffs is None:
+        coeffs = get_shcoeffs(lmax)
+    shape = lons.shape
+    lons, lats, radii = lons.ravel(), lats.ravel(), radii.ravel()
+
+    if n_workers == 1 or lons.size <= __points_chunk_size:
+        B = __field_at_points(coeffs, __r0, lons, lats, radii)
+    else:
+        bounds = np.linspace(0, lons.size, n_workers+1).astype(int)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as executor:
+            blocks = executor.map(
+                __field_at_points,
+                [coeffs] * n_workers, [__r0] * n_workers,
+                *[[arr[i:j] for i, j in zip(bounds[:-1], bounds[1:])] for arr in (lons, lats, radii)],
+            )
+            B = np.concatenate(list(blocks))
+
+    return B.reshape(shape + (3,))
+
+
+
+def __field_at_points(coeffs, r0, lons, lats, radii, chunk_size=__points_chunk_size) -> np.ndarray:
+    '''
+    (B_r, B_theta, B_phi) of the field with Schmidt semi-normalized coefficients `coeffs` (shape (2, lmax+1, lmax+1)) and reference radius `r0` at 1D arrays of points, as an Nx3 array. See `__field_at_points_chunk`.
+    '''
+    B = np.empty((lons.size, 3))
+    for i in range(0, lons.size, chunk_size):
+        sl = slice(i, i+chunk_size)
+        B[sl] = __field_at_points_chunk(coeffs, r0, lons[sl], lats[sl], radii[sl])
+    return B
+
+
+
+def __field_at_points_chunk(coeffs, r0, lons, lats, radii) -> np.ndarray:
+    '''
+    With the potential V = r0 sum_l (r0/r)^(l+1) sum_m (g_lm cos(m lon) + h_lm sin(m lon)) P_lm(cos(colat)), the field B = -grad V is:
+        B_r     =  sum_l (l+1) (r0/r)^(l+2) S_l,                       S_l = sum_m (g_lm cos(m lon) + h_lm sin(m lon)) P_lm
+        B_theta = -sum_l       (r0/r)^(l+2) sum_m (g_lm cos(m lon) + h_lm sin(m lon)) dP_lm/dtheta
+        B_phi   =  sum_l       (r0/r)^(l+2) sum_m m (g_lm sin(m lon) - h_lm cos(m lon)) P_lm / sin(colat)
+
+    The Schmidt semi-normalized Legendre functions are computed degree by degree for all orders and all points at once (arrays with shape (orders, points), so each step is a few contiguous array operations), with the standard recursions:
+        P_mm = sqrt((2m-1)/(2m)) sin(colat) P_(m-1)(m-1)
+        P_lm = ((2l-1) cos(colat) P_(l-1)m - sqrt((l-1)^2-m^2) P_(l-2)m) / sqrt(l^2-m^2)
+        dP_lm/dtheta = (l cos(colat) P_lm - sqrt(l^2-m^2) P_(l-1)m) / sin(colat)
+    and the sums over orders are matrix products with the coefficients of each degree.
+    '''
+
+    lmax = coeffs.shape[1] - 1
+    g, h = coeffs[0], coeffs[1]
+    m = np.arange(lmax+1.)
+
+
+    '''recursion coefficients (row l, column m), zero where m >= l'''
+    l = m[:,None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrt_l2m2 = np.sqrt(np.maximum(l**2 - m**2, 0))
+        a = np.where(m < l, (2*l - 1) / sqrt_l2m2, 0.)
+        b = np.where(m < l, np.sqrt(np.maximum((l-1)**2 - m**2, 0)) / sqrt_l2m2, 0.)
+
+    ## sums over orders: [S_l, sum_m m (g sin - h cos) P_lm] = coeffs_cos @ (cos(m lon) P_lm) + coeffs_sin @ (sin(m lon) P_lm), and the sqrt(l^2-m^2) P_(l-1)m term of dP/dtheta
+    coeffs_cos = np.stack([g, -m*h], axis=1)
+    coeffs_sin = np.stack([h,  m*g], axis=1)
+    g_prev, h_prev = g*sqrt_l2m2, h*sqrt_l2m2
+
+
+    '''per point'''
+    colat_cos = np.sin(np.radians(lats))
+    colat_sin = np.maximum(np.cos(np.radians(lats)), 1e-12)     # avoid dividing by zero exactly at the poles
+    mlon = np.outer(m, np.radians(lons))
+    cos_mlon, sin_mlon = np.cos(mlon), np.sin(mlon)
+    q = r0 / radii
+
+    P, P_prev, P_prev2, tmp, cP, sP, cP_prev, sP_prev = np.zeros((8, lmax+1, lons.size))
+    P_prev[0] = 1
+    cP_prev[0] = 1
+
+    q_l = q**2
+    B_r = q_l * g[0,0]
+    B_theta = np.zeros(lons.size)
+    B_phi = np.zeros(lons.size)
+
+
+    '''sum degree by degree'''
+    for l in range(1, lmax+1):
+        q_l = q_l * q
+
+        np.multiply(P_prev[:l], colat_cos, out=P[:l])
+        P[:l] *= a[l,:l,None]
+        np.multiply(P_prev2[:l], b[l,:l,None], out=tmp[:l])
+        P[:l] -= tmp[:l]
+        np.multiply(P_prev[l-1], colat_sin, out=P[l])
+        if l > 1:
+            P[l] *= np.sqrt((2*l - 1) / (2*l))
+
+        np.multiply(cos_mlon[:l+1], P[:l+1], out=cP[:l+1])
+        np.multiply(sin_mlon[:l+1], P[:l+1], out=sP[:l+1])
+
+        S, U = coeffs_cos[l][:, :l+1] @ cP[:l+1] + coeffs_sin[l][:, :l+1] @ sP[:l+1]
+        T = g_prev[l,:l] @ cP_prev[:l] + h_prev[l,:l] @ sP_prev[:l]
+
+        B_r += (l+1) * q_l * S
+        B_theta += q_l * (l * colat_cos * S - T)
+        B_phi += q_l * U
+
+        P, P_prev, P_prev2 = P_prev2, P, P_prev
+        cP, cP_prev = cP_prev, cP
+        sP, sP_prev = sP_prev, sP
+
+    return np.column_stack([B_r, -B_theta / colat_sin, B_phi / colat_sin])
+
+
+
+
+
+
+
+
+
+def get_region(
+    quantity: str, 
+    lons         = None,
+    lats         = None,
+    lon_bounds   = None, 
+    lat_bounds   = None, 
+    grid_spacing = None,
+    num_points   = None, 
+    radius       = None,
+) -> np.ndarray:
+    """
+    DESCRIPTION:
+    ------------
+        Sample the magnetic field over a grid. Arguments follow the same conventions as `Crust.get_region` / `GRS.get_region`: either give 1D axes `lons=..., lats=...`, or a bounding box with `lon_bounds=..., lat_bounds=...` and one of `grid_spacing`/`num_points`.
+
+        `radius` [km] selects the altitude when several shells are loaded, see `get_points`.
+
+
+    RETURN:
+    ------------
+        np.ndarray
+            2D array with shape (len(lats), len(lons)), units are nT.
+
+    """
+
+
+    '''args     (this approach is a bit verbose, but easy to understand and comprehensive)'''
+
+    error_msg = 'Invalid inputs for `get_region`. Options are: [1] `lons=..., lats=...` OR [2] `lon_bounds=..., lat_bounds=..., grid_spacing=...` OR [3] `lon_bounds=..., lat_bounds=..., num_points=...`.'
+    ## input case 1:
+    if ((lons is not None) and (lats is not None)):
+        ## eliminate case 2:
+        if ((lon_bounds is not None) or (lat_bounds is not None) or (grid_spacing is not None) or (num_points is not None)):
+            raise ValueError(error_msg)
+        ## execution:
+        pass
+    ## input case 2:
+    elif ((lon_bounds is not None) and (lat_bounds is not None)):
+        ## eliminate case 1:
+        if ((lons is not None) or (lats is not None)):
+            raise ValueError(error_msg)
+        ## execution (based on `grid_spacing` xor `num_points`):
+        if ((grid_spacing is not None) and (num_points is None)):
+            lons = np.arange(lon_bounds[0], lon_bounds[1]+grid_spacing, grid_spacing)
+            lats = np.arange(lat_bounds[0], lat_bounds[1]+grid_spacing, grid_spacing)
+        elif ((grid_spacing is None) and (num_points is not None)):
+            lons = np.linspace(lon_bounds[0], lon_bounds[1], num_points)
+            lats = np.linspace(lat_bounds[0], lat_bounds[1], num_points)
+        else:
+            raise ValueError(error_msg + ' (HINT: Specify either `grid_spacing` OR `num_points`, but not both.)')
+    else:
+        raise ValueError(error_msg)
+
+
+    lons = np.round(np.asarray(lons, dtype=np.float64), 10)
+    lats = np.round(np.asarray(lats, dtype=np.float64), 10)
+
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+    return get_points(quantity, lon_grid, lat_grid, radius)
+
+
+
+
+
+
+
+
+
 def visualize(
     quantity: str, 
+    radius = None,
     lon_bounds = (-180,180), 
     lat_bounds = (-90,90), 
     grid_spacing = 1,
@@ -336,6 +845,7 @@ def visualize(
 
         For these parameters, see documentation for `redplanet.Mag.get()` or call `help(redplanet.Mag.get)`.
             quantity
+            radius  (by default, the lowest loaded shell -- i.e. the reference radius 3393.5 km unless `load_langlais` was called with other `radii`)
     
         For these parameters, see documentation for `redplanet.utils.visualize()` or call `help(redplanet.utils.visualize)`.
             *lon_bounds
@@ -368,13 +878,17 @@ def visualize(
 
     '''plotThis is the only mandatory argument for `redplanet.utils.visualize()`'''
     def plotThis(lon, lat):
-        return get(quantity, lon, lat)
+        return get(quantity, lon, lat, radius)
     
     
 
     '''default values that can't be defined in function header'''
 
-    title = 'Crustal Magnetic Field at Surface (Langlais et al., 2019)' if title is ... else title
+    _initialize()
+    radius = __current_model['radii'][0] if radius is None else radius
+
+    if title is ...:
+        title = 'Crustal Magnetic Field at Surface (Langlais et al., 2019)' if np.isclose(radius, __r0) else f'Crustal Magnetic Field at r = {radius:g} km (Langlais et al., 2019)'
 
     match quantity:
 
@@ -400,23 +914,10 @@ def visualize(
 
 
 
-    '''Add all arguments that are either specified by the user or have default values'''
+    '''Add all arguments that are either specified by the user or have default values (`radius` is only used by `plotThis`)'''
     for key, value in locals().items():
-        if value is not ...:
+        if value is not ... and key != 'radius':
             kwargs[key] = value
 
 
     utils.visualize(**kwargs)
-
-    
-
-
-
-
-
-
-
-
-
-############################################################################################################################################
-__init()
\ No newline at end of file
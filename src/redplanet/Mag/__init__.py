@@ -1 +1,2 @@
-from .Mag import *
\ No newline at end of file
+from .Mag import *
+from . import maven
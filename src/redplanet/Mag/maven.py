@@ -0,0 +1,1289 @@
+"""
+Written by Zain Kamal (zain.eris.kamal@rutgers.edu).
+https://github.com/Humboldt-Penguin/redplanet
+
+Pipeline stages for reducing the MAVEN magnetometer dataset (calibrated, planetocentric, high resolution), which is distributed as one `.sts` text file per day (~1 TB unzipped for the full mission). This is the packaged version of the scripts in 'docs/.development/public/Mag/'.
+
+The raw data should NOT be unzipped -- every stage reads members straight out of the zip archives. Options to download the zipped data are:
+    (1) Yearly data from our Google Drive mirror (~20 GB each), which has significantly faster download speeds: https://drive.google.com/drive/folders/1iRJoprOsjB02DYjtk8wr8LExupcdWY5y
+    (2) Full, yearly, or monthly data from NASA PDS, which is much slower and prone to timeouts: https://pds-ppi.igpp.ucla.edu/search/view/?f=null&id=pds://PPI/maven.mag.calibrated/data/pc/highres
+
+
+Reduced data are saved as one `.npy` file per day, which `np.load` returns as an Nx7 np.ndarray with columns:
+    0: decimal days [since 2014-10-10 00:00:00]
+    1: longitude    [-180, 180]
+    2: latitude     [-90, 90]
+    3: radius       [km]
+    4: B_r          [nT]   (radial, outward)
+    5: B_east       [nT]
+    6: B_north      [nT]
+
+(NOTE: The reference scripts in 'docs/.development/public/Mag/' label columns 4-6 as B_theta/B_phi/B_r, but the values are the components along the rows of their rotation matrix, which are the radial/east/north unit vectors in that order, see `cart2sph`. The data are the same, only the labels were fixed.)
+
+Optionally, nighttime data can be selected in the same pass by solar zenith angle (from the MAVEN Insitu Key Parameters data, also zipped), see `min_sza` in `reduce_altitude` and `night_mask`.
+
+For analyses spanning many days, `build_store` consolidates the daily files into a single time-sorted, chunked zarr store with per-chunk statistics, and `query_store` reads only the chunks that overlap a time/region/altitude query.
+
+`add_langlais_residuals` then evaluates the Langlais et al. (2019) crustal field model at every sample's own position/altitude and saves the residuals (data minus model) next to the data in the store.
+
+"""
+
+
+
+############################################################################################################################################
+
+from redplanet import utils
+
+from pathlib import Path
+from datetime import datetime
+import concurrent.futures
+import io
+import itertools
+import os
+import re
+import time
+import zipfile
+
+import numpy as np
+import numcodecs
+import zarr
+
+pd = utils.lazy_import('pandas')
+
+
+
+
+############################################################################################################################################
+""" module variables """
+
+
+
+## mean radius of Mars used for the altitude cut [km]
+R_mars = 3396.2
+
+## origin of the "decimal days" time column
+t0 = datetime(2014, 10, 10)
+
+## number of columns in a reduced file, see module docstring
+n_columns = 7
+
+## per-process state of `reduce_altitude` workers (the open zip archive(s)), set once by `_init_reduce_worker`.
+_reduce_worker_state = {}
+
+## `.sts` format: the first data line is the first line containing `_sts_sentinel`, and we keep columns (year, decimal day of year, BX, BY, BZ, posX, posY, posZ).
+_sts_sentinel = b'0  0'
+_sts_usecols = (0, 6, 7, 8, 9, 11, 12, 13)
+_sts_block_size = 1024**2
+
+## rows per chunk in `cart2sph` (9 buffers of this many float64s, ~1 MB, fits in L2 cache)
+_cart2sph_chunk_size = 2**14
+
+## consolidated store (see `build_store`): one array per column, plus per-chunk min/max of `store_stats_columns`
+store_columns = ('time', 'lon', 'lat', 'r', 'B_r', 'B_east', 'B_north')
+store_stats_columns = ('time', 'lon', 'lat', 'altitude')
+_store_chunk_size = 2**18     # ~2 MB per column chunk
+_store_compressor = numcodecs.Blosc(cname='zstd', clevel=5, shuffle=numcodecs.Blosc.SHUFFLE)
+
+## model residuals written next to the data by `add_langlais_residuals` (data minus model, same components as the data)
+residual_columns = ('residual_B_r', 'residual_B_east', 'residual_B_north')
+
+## per-process state of `add_langlais_residuals` workers (the open store and the model coefficients), set once by `_init_residual_worker`
+_residual_worker_state = {}
+
+## date in a raw file name, e.g. 'mvn_mag_l2_2014284pc_20141011_v01_r01.sts'
+_sts_date_pattern = re.compile(r'_(\d{4})(\d{2})(\d{2})_v\d+_r\d+\.sts$')
+
+## MAVEN Insitu Key Parameters files (solar zenith angle is column 195), e.g. '2014/10/mvn_kp_insitu_20141011_v18_r03.tab'
+_insitu_pattern = re.compile(r'mvn_kp_insitu_(\d{8})_v(\d+)_r(\d+)\.tab$')
+_insitu_usecols = (0, 194)
+
+
+
+
+
+
+
+
+
+
+############################################################################################################################################
+""" altitude reducer """
+
+
+
+def reduce_altitude(
+    fpath_magzip,
+    dirpath_out,
+    max_altitude    = 200,
+    n_workers       = None,
+    overwrite       = False,
+    verbose         = True,
+    min_sza         = None,
+    fpath_insituzip = None,
+) -> dict:
+    """
+    DESCRIPTION:
+    ------------
+        Reduce every `.sts` file in a zipped MAVEN magnetometer archive to the points below `max_altitude`, converted to spherical coordinates (see module docstring for the output columns). More than 95% of points are removed at 200 km, which makes the reduced data far smaller and faster to read.
+
+        If `min_sza` is given, only nighttime points (solar zenith angle >= `min_sza`) are kept as well -- both filters are applied in a single pass over each day, see `night_mask`.
+
+        Files are processed in parallel by a pool of worker processes, each of which keeps its own handle on the zip archive. The stage is resumable: outputs that already exist are validated and skipped (only missing or invalid files are redone), and every output is written atomically, so an interrupted run never leaves a partial file behind.
+
+
+    PARAMETERS:
+    ------------
+        fpath_magzip : str or Path
+            Path to a *zip file* of MAVEN mag data, e.g. a single year. Only members ending in '.sts' are processed.
+
+        dirpath_out : str or Path
+            Directory to save the reduced data in. Files are saved as '{year}/{month}/mvn_mag_{max_altitude}km_{year}-{month}-{day}.npy', or '.../mvn_mag_{max_altitude}km,sza{min_sza}_{year}-{month}-{day}.npy' with `min_sza`.
+
+        max_altitude : float (default 200)
+            Maximum altitude above the mean radius (3396.2 km) to keep, in km.
+
+        n_workers : int (default None)
+            Number of worker processes. By default, one per CPU core. With `n_workers=1`, everything runs in the current process.
+
+        overwrite : bool (default False)
+            If True, redo every file even if a valid output already exists.
+
+        verbose : bool (default True)
+            If True, print progress and throughput as files finish.
+
+        min_sza : float (default None)
+            If given, also remove daytime data, i.e. keep only points between consecutive samples of the insitu data with solar zenith angle >= `min_sza` [deg] (e.g. 110). Requires `fpath_insituzip`. Days without insitu data are reported as failed.
+
+        fpath_insituzip : str or Path (default None)
+            Path to the *zipped* "MAVEN Insitu Key Parameters Data Collection", which provides solar zenith angles. Either download from our Google Drive mirror (faster): https://drive.google.com/file/d/1j5xTf1U7xnOoj1iL44q4zHbOqY0GYX-x/view?usp=sharing, or from PDS: https://pds-ppi.igpp.ucla.edu/search/view/?f=yes&id=pds://PPI/maven.insitu.calibrated/data
+
+
+    RETURN:
+    ------------
+        dict
+            Summary of the run, with keys:
+                - 'n_files'     : number of `.sts` files in the archive
+                - 'n_reduced'   : number of files reduced in this run
+                - 'n_skipped'   : number of files skipped because a valid output already exists
+                - 'failed'      : {member name: error message} for files that couldn't be reduced
+                - 'n_points_in' / 'n_points_out' : number of points read / kept in this run
+                - 'seconds'     : wall time of the run
+                - 'files_per_second', 'MB_per_second' : throughput of this run (uncompressed input)
+
+    """
+
+    start = time.perf_counter()
+
+    fpath_magzip = Path(fpath_magzip)
+    dirpath_out = Path(dirpath_out)
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+
+    if (min_sza is not None) and (fpath_insituzip is None):
+        raise ValueError('Filtering by solar zenith angle (`min_sza`) requires the insitu data (`fpath_insituzip`).')
+
+
+
+    '''find work'''
+    with zipfile.ZipFile(fpath_magzip, 'r') as magzip:
+        members = sorted(
+            (info.filename, info.file_size)
+            for info in magzip.infolist()
+            if info.filename.endswith('.sts')
+        )
+
+    summary = {
+        'n_files'      : len(members),
+        'n_reduced'    : 0,
+        'n_skipped'    : 0,
+        'failed'       : {},
+        'n_points_in'  : 0,
+        'n_points_out' : 0,
+    }
+
+    todo = []
+    for member, size in members:
+        fpath_out = reduced_fpath(dirpath_out, member, max_altitude, min_sza)
+        if (not overwrite) and is_valid_reduced_file(fpath_out, max_altitude):
+            summary['n_skipped'] += 1
+        else:
+            todo.append((member, size, fpath_out))
+
+    if verbose:
+        print(f'Found {len(members)} files in "{fpath_magzip.name}": {summary["n_skipped"]} already reduced, {len(todo)} to do with {min(n_workers, max(len(todo), 1))} worker(s).')
+
+
+
+    '''reduce'''
+    bytes_done = 0
+    pad_digits = len(str(len(todo)))
+
+    def _record(member, size, result):
+        nonlocal bytes_done
+        n_done = summary['n_reduced'] + len(summary['failed'])
+        if isinstance(result, BaseException):
+            summary['failed'][member] = repr(result)
+        else:
+            summary['n_reduced'] += 1
+            summary['n_points_in'] += result[0]
+            summary['n_points_out'] += result[1]
+        bytes_done += size
+        if verbose:
+            elapsed = time.perf_counter() - start
+            rate = (n_done + 1) / elapsed
+            eta = (len(todo) - n_done - 1) / rate
+            status = 'FAILED: ' + summary['failed'][member] if isinstance(result, BaseException) else f'kept {result[1]}/{result[0]} points'
+            print(f'[{n_done+1:0{pad_digits}}/{len(todo)}] {member} -- {status} ({rate:.2f} files/s, {bytes_done / 1024**2 / elapsed:.1f} MB/s, ETA {eta/60:.1f} min)')
+
+    try:
+        if n_workers == 1 or len(todo) <= 1:
+            _init_reduce_worker(fpath_magzip, fpath_insituzip)
+            for member, size, fpath_out in todo:
+                try:
+                    result = _reduce_worker(member, fpath_out, max_altitude, min_sza)
+                except Exception as e:
+                    result = e
+                _record(member, size, result)
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers, initializer=_init_reduce_worker, initargs=(fpath_magzip, fpath_insituzip)) as executor:
+                futures = {
+                    executor.submit(_reduce_worker, member, fpath_out, max_altitude, min_sza): (member, size)
+                    for member, size, fpath_out in todo
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    _record(*futures[future], future.exception() or future.result())
+    finally:
+        _close_reduce_worker()
+
+
+
+    '''summary'''
+    summary['seconds'] = time.perf_counter() - start
+    summary['files_per_second'] = (summary['n_reduced'] + len(summary['failed'])) / summary['seconds']
+    summary['MB_per_second'] = bytes_done / 1024**2 / summary['seconds']
+
+    if verbose:
+        print(f'Done in {summary["seconds"]/60:.1f} min: {summary["n_reduced"]} reduced, {summary["n_skipped"]} skipped, {len(summary["failed"])} failed ({summary["files_per_second"]:.2f} files/s, {summary["MB_per_second"]:.1f} MB/s).')
+
+    return summary
+
+
+
+def reduced_fpath(dirpath_out, member, max_altitude=200, min_sza=None) -> Path:
+    """
+    Path of the reduced file for a raw `.sts` file name (any leading directories in `member` are ignored).
+    """
+    match = _sts_date_pattern.search(member)
+    if match is None:
+        raise ValueError(f'Can\'t find a date in MAVEN file name "{member}".')
+    year, month, day = match.groups()
+    return Path(dirpath_out) / year / month / f'mvn_mag_{_filters_name(max_altitude, min_sza)}_{year}-{month}-{day}.npy'
+
+
+
+def _filters_name(max_altitude, min_sza=None):
+    """Filters in a reduced file name, e.g. '200km' or '200km,sza110' (same convention as the scripts in 'docs/.development/public/Mag/')."""
+    return f'{max_altitude:g}km' + (f',sza{min_sza:g}' if min_sza is not None else '')
+
+
+
+def is_valid_reduced_file(fpath, max_altitude=200) -> bool:
+    """
+    Check that a reduced file exists, loads, and looks like the output of `reduce_altitude` (7 finite columns, valid coordinates, nothing above `max_altitude`). Only the header is parsed and the data is memory-mapped, so this is cheap even for large files.
+    """
+    fpath = Path(fpath)
+    if not fpath.is_file():
+        return False
+    try:
+        dat = np.load(fpath, mmap_mode='r')
+    except (ValueError, OSError, EOFError):
+        return False
+    if (dat.ndim != 2) or (dat.shape[1] != n_columns):
+        return False
+    if dat.shape[0] == 0:
+        return True
+    return bool(
+        np.all(np.isfinite(dat))
+        and np.all(np.abs(dat[:, 1]) <= 180)
+        and np.all(np.abs(dat[:, 2]) <= 90)
+        and np.all(dat[:, 3] < R_mars + max_altitude)
+    )
+
+
+
+def _init_reduce_worker(fpath_magzip, fpath_insituzip=None):
+    _reduce_worker_state['magzip'] = zipfile.ZipFile(fpath_magzip, 'r')
+    if fpath_insituzip is not None:
+        _reduce_worker_state['insituzip'] = zipfile.ZipFile(fpath_insituzip, 'r')
+        _reduce_worker_state['insitu_members'] = _index_insitu_members(_reduce_worker_state['insituzip'].namelist())
+
+
+
+def _close_reduce_worker():
+    for key in ('magzip', 'insituzip'):
+        zipf = _reduce_worker_state.pop(key, None)
+        if zipf is not None:
+            zipf.close()
+    _reduce_worker_state.clear()
+
+
+
+def _reduce_worker(member, fpath_out, max_altitude, min_sza=None):
+    """
+    Reduce one `.sts` member of the (already open) zip archive and save it. Returns (number of points read, number kept).
+    """
+    with _reduce_worker_state['magzip'].open(member) as fin_mag:
+        dat_mag_cart, n_in = _read_sts(fin_mag, max_radius=R_mars+max_altitude)
+
+    dat_mag_sph = reduce_sts_data(dat_mag_cart, max_altitude)
+
+    if min_sza is not None:
+        date = ''.join(_sts_date_pattern.search(member).groups())
+        member_insitu = _reduce_worker_state['insitu_members'].get(date)
+        if member_insitu is None:
+            raise ValueError(f'No insitu data available for {date}.')
+        with _reduce_worker_state['insituzip'].open(member_insitu) as fin_insitu:
+            days_insitu, sza = read_insitu_sza(fin_insitu)
+        dat_mag_sph = dat_mag_sph[night_mask(dat_mag_sph[:,0], days_insitu, sza, min_sza)]
+
+    utils.save_npy_atomic(fpath_out, dat_mag_sph)
+    return n_in, dat_mag_sph.shape[0]
+
+
+
+
+
+
+
+
+
+
+
+
+
+############################################################################################################################################
+""" single file """
+
+
+
+def read_sts(fin_mag, max_radius=None) -> np.ndarray:
+    """
+    DESCRIPTION:
+    ------------
+        Read the data block of a MAVEN `.sts` file (a binary file object, e.g. from `zipfile.ZipFile.open`).
+
+        The file is streamed in blocks of raw bytes -- nothing is decoded to text, and the file is never held in memory as a whole. The start of the data is found with a byte search, and since the data lines are fixed-width, each column is parsed with numpy straight from its byte columns (see `_parse_fixed_width`). Values are bit-for-bit identical to `np.loadtxt`. If a block isn't in the expected fixed-width format, the rest of the file falls back to `np.loadtxt` on the raw bytes.
+
+        See `read_sts_loadtxt` for the slower reference implementation.
+
+    PARAMETERS:
+    ------------
+        fin_mag : binary file object
+            Open `.sts` file.
+
+        max_radius : float (default None)
+            If given, only return points with `sqrt(posX^2 + posY^2 + posZ^2) < max_radius` [km]. Only the position columns are parsed for the other points, which is much faster when most points are discarded (e.g. the altitude cut in `reduce_altitude`).
+
+    RETURN:
+    ------------
+        np.ndarray
+            Nx8 array with columns: 0: year, 1: decimal day of year, 2: BX, 3: BY, 4: BZ, 5: posX, 6: posY, 7: posZ (nT and km, planetocentric).
+
+    NOTES:
+    ------------
+        Measured with 'docs/.development/public/Mag/benchmark_read_sts.py' on a 390 MB member (fastest of 3 runs, one core), where decompression alone takes 2.4 s: `read_sts_loadtxt` 6.8 s, `read_sts` 6.2 s, and `read_sts(..., max_radius=R_mars+200)` 5.2 s. Vectorized general-purpose parsers on the same undecoded stream were slower than `np.loadtxt` -- `pd.read_csv(engine='c')` 8.5 s and `np.fromstring` 10.7 s -- since they convert all 17 columns, so they aren't used.
+    """
+    return _read_sts(fin_mag, max_radius)[0]
+
+
+
+def _read_sts(fin_mag, max_radius=None):
+    """`read_sts`, but also returns the total number of data lines in the file (including points beyond `max_radius`)."""
+
+    stream, first_line = _sts_data_stream(fin_mag)
+    if stream is None:
+        return np.empty((0, len(_sts_usecols))), 0
+    layout = _sts_layout(first_line)
+
+
+    '''parse block by block (whole lines per block)'''
+    chunks = []
+    n_lines = 0
+
+    if layout is not None:
+        line_len = layout[0]
+        while True:
+            buf = stream.read(max(_sts_block_size // line_len, 1) * line_len)
+            if not buf:
+                break
+            dat = _parse_sts_block(buf, layout, max_radius)
+            if dat is None:
+                ## not in the fixed-width format from here on (e.g. a last line without a newline), parse the rest the slow way
+                stream = io.BytesIO(buf + stream.read())
+                break
+            chunks.append(dat[0])
+            n_lines += dat[1]
+            buf = None
+
+    rest = stream.read()
+    if rest.strip():
+        dat = np.loadtxt(io.BytesIO(rest), usecols=_sts_usecols, ndmin=2)
+        n_lines += dat.shape[0]
+        if max_radius is not None:
+            dat = dat[_sts_radius2(dat[:,5:8]) < max_radius**2]
+        chunks.append(dat)
+
+    if not chunks:
+        return np.empty((0, len(_sts_usecols))), n_lines
+    return np.concatenate(chunks), n_lines
+
+
+
+def _sts_data_stream(fin_mag):
+    """
+    Find the first data line of a `.sts` file (the header ends right before the first line containing '0  0') with a byte search, reading block by block. Returns (binary stream starting at the first data line, that line including its newline), or (None, None) if there is no data.
+    """
+    head = b''
+    while True:
+        block = fin_mag.read(_sts_block_size)
+        head += block
+        i_sentinel = head.find(_sts_sentinel)
+        if ((i_sentinel >= 0) and (head.find(b'\n', i_sentinel) >= 0)) or (not block):
+            break
+    if i_sentinel < 0:
+        return None, None
+
+    i_data = head.rfind(b'\n', 0, i_sentinel) + 1
+    first_line = head[i_data : head.find(b'\n', i_sentinel)+1]
+    return io.BufferedReader(_PrefixedStream(head[i_data:], fin_mag), buffer_size=_sts_block_size), first_line
+
+
+
+def _sts_layout(line):
+    """
+    Column layout of a fixed-width `.sts` data line (including its newline): `(line length, [(start, stop, position of the decimal point or None) for each of `_sts_usecols`])`. A field spans from the end of the previous value to the end of its own value, since values are right-aligned. Returns None if the line doesn't look like fixed-width data that `_parse_fixed_width` can read exactly.
+    """
+    tokens = [match.span() for match in re.finditer(rb'\S+', line)]
+    if len(tokens) <= max(_sts_usecols):
+        return None
+
+    fields = []
+    for i in _sts_usecols:
+        start, stop = (tokens[i-1][1] if i > 0 else 0), tokens[i][1]
+        i_dot = line.find(b'.', tokens[i][0], stop)
+        n_digits = (stop - tokens[i][0]) - (i_dot >= 0)
+        if n_digits > 15:    # beyond float64's exact integers
+            return None
+        fields.append((start, stop, (i_dot - start) if i_dot >= 0 else None))
+    return len(line), fields
+
+
+
+def _parse_sts_block(buf, layout, max_radius=None):
+    """
+    Parse whole fixed-width lines of `.sts` data (see `_sts_layout`). Returns (Nx8 array, number of lines in `buf`), or None if `buf` doesn't match the layout.
+    """
+    line_len, fields = layout
+    if len(buf) % line_len:
+        return None
+    lines = np.frombuffer(buf, dtype=np.uint8).reshape(-1, line_len)
+    if not np.all(lines[:, -1] == ord('\n')):
+        return None
+    n_lines = lines.shape[0]
+
+    cols = [None] * len(fields)
+
+    '''positions first, so everything else is only parsed for points within `max_radius`'''
+    for k in (5, 6, 7):
+        start, stop, dot = fields[k]
+        cols[k] = _parse_fixed_width(lines[:, start:stop], dot)
+        if cols[k] is None:
+            return None
+    if max_radius is not None:
+        keep = _sts_radius2(np.column_stack(cols[5:8])) < max_radius**2
+        lines = lines[keep]
+        cols[5:8] = [col[keep] for col in cols[5:8]]
+
+    for k in range(5):
+        start, stop, dot = fields[k]
+        cols[k] = _parse_fixed_width(lines[:, start:stop], dot)
+        if cols[k] is None:
+            return None
+
+    return np.column_stack(cols), n_lines
+
+
+
+def _parse_fixed_width(field, dot):
+    """
+    DESCRIPTION:
+    ------------
+        Parse a column of right-aligned decimal numbers, given as an (N, width) uint8 array of their characters with the decimal point at the same position `dot` in every row (or no decimal point if `dot` is None), e.g. b'   -12.3456'. Returns None if any row doesn't fit that format.
+
+    NOTES:
+    ------------
+        Every row is read as an integer (digits dotted with powers of ten) and then divided by 10^(digits after the decimal point). With at most 15 digits, both are exact in float64, so the division is correctly rounded -- i.e. exactly what `float()`/`np.loadtxt` give.
+    """
+    chars = np.ascontiguousarray(field)
+    n, width = chars.shape
+
+    digits = chars - np.uint8(ord('0'))
+    is_digit = digits < 10
+    is_space = chars == ord(' ')
+    is_minus = chars == ord('-')
+
+
+    '''check format'''
+    n_other = (dot is not None)    # chars per row that aren't digits/spaces/minus signs
+    if np.count_nonzero(is_digit | is_space | is_minus) != n * (width - n_other):
+        return None
+    if (dot is not None) and not np.all(chars[:, dot] == ord('.')):
+        return None
+    if not np.all(is_digit[:, -1]):
+        return None
+    if np.any(is_space[:, 1:] > is_space[:, :-1]):     # a space after anything but a space
+        return None
+    if np.any(is_minus[:, 1:] & ~is_space[:, :-1]):    # a minus sign after anything but a space
+        return None
+
+
+    '''parse'''
+    digits[~is_digit] = 0
+    powers = np.zeros(width)
+    exponent = 0
+    for j in reversed(range(width)):
+        if j != dot:
+            powers[j] = 10.**exponent
+            exponent += 1
+
+    vals = digits.astype(np.float64) @ powers
+    if dot is not None:
+        vals /= 10.**(width - 1 - dot)
+    np.negative(vals, out=vals, where=is_minus.any(axis=1))
+    return vals
+
+
+
+def _sts_radius2(pos):
+    return pos[:,0]**2 + pos[:,1]**2 + pos[:,2]**2
+
+
+
+class _PrefixedStream(io.RawIOBase):
+
+    """Read-only stream of `prefix` followed by the rest of `stream`, so the bytes consumed while searching for the data can be handed back to the parser."""
+
+    def __init__(self, prefix, stream):
+        self._prefix = memoryview(prefix)
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if len(self._prefix):
+            n = min(len(buffer), len(self._prefix))
+            buffer[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+
+def read_sts_loadtxt(fin_mag) -> np.ndarray:
+    """
+    Reference implementation of `read_sts` (Python line scan for the header + `np.loadtxt` on decoded text), i.e. what the original reducer scripts did. Same output, just much slower -- kept for validation and benchmarking.
+    """
+    fin_mag = io.TextIOWrapper(fin_mag)
+
+    ## the header ends right before the first line containing '0  0' (the first data line) -- skip up to it, then parse that line and everything after
+    first_line = next((line for line in fin_mag if '0  0' in line), None)
+    if first_line is None:
+        return np.empty((0, len(_sts_usecols)))
+    return np.loadtxt(itertools.chain([first_line], fin_mag), usecols=_sts_usecols, ndmin=2)
+
+
+
+def reduce_sts_data(dat_mag_cart, max_altitude=200) -> np.ndarray:
+    """
+    DESCRIPTION:
+    ------------
+        Apply the altitude cut to the output of `read_sts` and convert it to the reduced format (see module docstring).
+
+    NOTES:
+    ------------
+        Position conversion requires simple trig, but magnetic field vectors must be converted with a transformation matrix in order to preserve orthogonality -- see the explanation in 'docs/.development/public/Mag/maven_reducer_1_altitude.py', and `cart2sph` for the implementation.
+    """
+
+    if dat_mag_cart.shape[0] == 0:
+        return np.empty((0, n_columns))
+
+
+    '''convert to total decimal days since data collection started, starting with 0 on 2014-10-10 00:00:00'''
+    days = dat_mag_cart[:,1] + ((datetime(int(dat_mag_cart[0,0]), 1, 1) - t0).days - 1)
+    pos = dat_mag_cart[:,5:8]
+    B = dat_mag_cart[:,2:5]
+
+
+    '''altitude cut'''
+    i_altitude_cut = np.where(_sts_radius2(pos) < ((R_mars + max_altitude)**2))[0]
+    days, pos, B = days[i_altitude_cut], pos[i_altitude_cut], B[i_altitude_cut]
+
+
+    '''convert to spherical'''
+    dat_mag_sph = np.empty((days.shape[0], n_columns))
+    dat_mag_sph[:,0] = days
+    cart2sph(pos, B, out=dat_mag_sph[:,1:])
+
+    return dat_mag_sph
+
+
+
+
+
+
+
+
+
+
+############################################################################################################################################
+""" coordinate conversion """
+
+
+
+def cart2sph(pos, B, out=None, chunk_size=_cart2sph_chunk_size) -> np.ndarray:
+    """
+    DESCRIPTION:
+    ------------
+        Convert Cartesian (planetocentric or MSO) positions and magnetic field vectors to longitude/latitude/radius and spherical field components.
+
+        This is the rotation by the matrix `D` in 'docs/.development/public/Mag/maven_reducer_1_altitude.py', but `D` is never built: its entries are cos/sin of longitude and latitude, which are just ratios of the position components (e.g. cos(lon) = x / sqrt(x^2 + y^2)), so each component is a few multiply-adds. Rows are processed in chunks of `chunk_size` with a fixed set of reused buffers, so the extra memory is constant (~1 MB) no matter how many samples are converted, and each chunk stays in CPU cache.
+
+    PARAMETERS:
+    ------------
+        pos : np.ndarray
+            Nx3 positions (x, y, z) [km].
+
+        B : np.ndarray
+            Nx3 magnetic field vectors (Bx, By, Bz) [nT].
+
+        out : np.ndarray (default None)
+            Nx6 array to write the result to, e.g. `dat[:,1:]` of an Nx7 array of reduced data. Can be (or overlap) the same rows as `pos`/`B` for an in-place conversion, e.g. `cart2sph(dat[:,0:3], dat[:,3:6], out=dat)`. By default, a new array is allocated.
+
+        chunk_size : int (default 16384)
+            Number of rows converted at once.
+
+    RETURN:
+    ------------
+        np.ndarray
+            Nx6 array `out` with columns:
+                0: longitude [-180, 180]
+                1: latitude  [-90, 90]
+                2: radius    (same units as `pos`)
+                3: B_r,     i.e. B dotted with (cos(lon) cos(lat), sin(lon) cos(lat), sin(lat))
+                4: B_east,  i.e. B dotted with (-sin(lon), cos(lon), 0)
+                5: B_north, i.e. B dotted with (-cos(lon) sin(lat), -sin(lon) sin(lat), cos(lat))
+            (the rows of `D`, in the same order as the reduced data columns).
+    """
+
+    pos = np.asarray(pos, dtype=np.float64)
+    B = np.asarray(B, dtype=np.float64)
+    n = pos.shape[0]
+    if (pos.ndim != 2) or (pos.shape[1] != 3) or (B.shape != pos.shape):
+        raise ValueError(f'Expected two Nx3 arrays, got shapes {pos.shape} and {B.shape}.')
+    if out is None:
+        out = np.empty((n, 6))
+    elif out.shape != (n, 6):
+        raise ValueError(f'Expected `out` with shape {(n, 6)}, got {out.shape}.')
+
+    buffers = np.empty((9, min(chunk_size, n)))
+
+    for i in range(0, n, chunk_size):
+        j = min(i + chunk_size, n)
+        _cart2sph_chunk(pos[i:j], B[i:j], out[i:j], buffers[:, :j-i])
+
+    return out
+
+
+
+def _cart2sph_chunk(pos, B, out, buffers):
+    """
+    One chunk of `cart2sph`. Every intermediate lives in `buffers` (9 x chunk), and `out` is only written at the very end, so it may alias `pos`/`B`.
+    """
+    x, y, z = pos.T
+    Bx, By, Bz = B.T
+    lon, lat, r, c_lon, s_lon, c_lat, s_lat, h, tmp = buffers
+
+
+    '''position'''
+    np.multiply(x, x, out=c_lat)
+    np.multiply(y, y, out=tmp)
+    np.add(c_lat, tmp, out=c_lat)                   # x^2 + y^2
+    np.multiply(z, z, out=tmp)
+    np.add(c_lat, tmp, out=r)
+    np.sqrt(r, out=r)
+    np.sqrt(c_lat, out=c_lat)                       # distance from the z-axis
+
+    np.arctan2(y, x, out=lon)
+    np.arctan2(z, c_lat, out=lat)
+    np.degrees(lon, out=lon)
+    np.degrees(lat, out=lat)
+
+
+    '''entries of `D`, i.e. cos/sin of lon/lat'''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(x, c_lat, out=c_lon)
+        np.divide(y, c_lat, out=s_lon)
+        np.divide(z, r, out=s_lat)
+        np.divide(c_lat, r, out=c_lat)
+
+    ## on the z-axis / at the origin, use the angles `arctan2` gives there (lon = 0 / lat = 0)
+    if not np.all(np.isfinite(c_lon)):
+        on_axis = ~np.isfinite(c_lon)
+        c_lon[on_axis], s_lon[on_axis] = 1, 0
+    if not np.all(np.isfinite(c_lat)):
+        at_origin = ~np.isfinite(c_lat)
+        c_lat[at_origin], s_lat[at_origin] = 1, 0
+
+
+    '''rotate B (`h` is the horizontal component of B away from the z-axis, shared by the first and last rows of `D`)'''
+    np.multiply(c_lon, Bx, out=h)
+    np.multiply(s_lon, By, out=tmp)
+    np.add(h, tmp, out=h)
+
+    np.multiply(c_lon, By, out=tmp)
+    np.multiply(s_lon, Bx, out=c_lon)
+    np.subtract(tmp, c_lon, out=tmp)                # row 2: -sin(lon) Bx + cos(lon) By
+
+    np.multiply(c_lat, h, out=c_lon)
+    np.multiply(s_lat, Bz, out=s_lon)
+    np.add(c_lon, s_lon, out=c_lon)                 # row 1: cos(lat) h + sin(lat) Bz
+
+    np.multiply(c_lat, Bz, out=s_lon)
+    np.multiply(s_lat, h, out=h)
+    np.subtract(s_lon, h, out=s_lon)                # row 3: -sin(lat) h + cos(lat) Bz
+
+
+    '''write output only now, since `out` may alias the inputs'''
+    out[:,0] = lon
+    out[:,1] = lat
+    out[:,2] = r
+    out[:,3] = c_lon
+    out[:,4] = tmp
+    out[:,5] = s_lon
+
+
+
+
+
+
+
+
+
+
+############################################################################################################################################
+""" solar zenith angle filter """
+
+
+
+def read_insitu_sza(fin_insitu) -> tuple[np.ndarray, np.ndarray]:
+    """
+    DESCRIPTION:
+    ------------
+        Read times and solar zenith angles from a MAVEN Insitu Key Parameters `.tab` file (a binary file object, e.g. from `zipfile.ZipFile.open`).
+
+    RETURN:
+    ------------
+        days : np.ndarray
+            Decimal days since 2014-10-10 00:00:00 (same as the time column of reduced data).
+
+        sza : np.ndarray
+            Solar zenith angle [deg].
+    """
+    dat_insitu = pd.read_csv(fin_insitu, comment='#', header=None, sep=r'\s+', usecols=_insitu_usecols, names=('time', 'sza'))
+    days = (dat_insitu['time'].to_numpy(dtype='datetime64[ms]') - np.datetime64(t0, 'ms')) / np.timedelta64(1, 'D')
+    return days, dat_insitu['sza'].to_numpy(dtype=np.float64)
+
+
+
+def night_mask(days, days_insitu, sza, min_sza=110) -> np.ndarray:
+    """
+    DESCRIPTION:
+    ------------
+        Boolean mask of the points at times `days` that were taken at night, i.e. within a run of consecutive insitu samples with solar zenith angle >= `min_sza` (from the first to the last sample of the run, inclusive). This is the same definition as 'docs/.development/public/Mag/maven_reducer_2_sza.py'.
+
+        Runs are found with `np.diff` on the boolean night indicator, and each point is matched to the latest run starting at or before it with `np.searchsorted`, so the cost is O((N + M) log M) with no Python loops. This composes with any other mask over the same points, e.g. `reduce_altitude` applies it right after the altitude cut.
+
+    PARAMETERS:
+    ------------
+        days : np.ndarray
+            Times of the points to classify, in decimal days since 2014-10-10 (e.g. column 0 of reduced data). Don't need to be sorted.
+
+        days_insitu, sza : np.ndarray
+            Insitu times (sorted) and solar zenith angles, e.g. from `read_insitu_sza`.
+
+        min_sza : float (default 110)
+            Minimum solar zenith angle [deg] that counts as night.
+
+    RETURN:
+    ------------
+        np.ndarray
+            Boolean mask with the same shape as `days`.
+    """
+    is_night = np.concatenate(([False], np.asarray(sza) >= min_sza, [False]))
+    edges = np.diff(is_night.astype(np.int8))
+    t_start = days_insitu[np.flatnonzero(edges == 1)]
+    t_stop = days_insitu[np.flatnonzero(edges == -1) - 1]
+
+    days = np.asarray(days)
+    if t_start.size == 0:
+        return np.zeros(days.shape, dtype=bool)
+
+    i_run = np.searchsorted(t_start, days, side='right') - 1
+    return (i_run >= 0) & (days <= t_stop[np.maximum(i_run, 0)])
+
+
+
+def _index_insitu_members(names) -> dict:
+    """{'YYYYMMDD': member name} for every insitu file in a zip archive, taking the latest version/revision if a day has several."""
+    members = {}
+    for name in names:
+        match = _insitu_pattern.search(name)
+        if match is None:
+            continue
+        date, version = match.group(1), (int(match.group(2)), int(match.group(3)))
+        if (date not in members) or (version > members[date][0]):
+            members[date] = (version, name)
+    return {date: name for date, (version, name) in members.items()}
+
+
+
+
+
+
+
+
+
+
+############################################################################################################################################
+""" consolidated store """
+
+
+
+def build_store(
+    dirpath_reduced,
+    fpath_store,
+    max_altitude = 200,
+    min_sza      = None,
+    chunk_size   = _store_chunk_size,
+    overwrite    = False,
+    verbose      = True,
+) -> dict:
+    """
+    DESCRIPTION:
+    ------------
+        Consolidate the daily files written by `reduce_altitude` into a single time-sorted, chunked, columnar zarr store, so multi-year analyses don't have to open thousands of small files.
+
+        Each of the 7 columns (see `store_columns`) is its own 1D array, and all of them share the same row chunks. For every chunk we also save the min/max of time, longitude, latitude, and altitude (see `store_stats_columns`), which `query_store` uses to only read the chunks that can contain points in the requested region/time range.
+
+        Files are streamed one at a time and chunks are written as they fill up, so memory use is bounded by the largest daily file plus one chunk, regardless of how many years are consolidated.
+
+
+    PARAMETERS:
+    ------------
+        dirpath_reduced : str or Path
+            Directory with the output of `reduce_altitude` (i.e. '{year}/{month}/mvn_mag_{max_altitude}km_{year}-{month}-{day}.npy', see `reduced_fpath`). Several years can be reduced into the same directory and consolidated together.
+
+        fpath_store : str or Path
+            Path of the zarr store to create, e.g. 'mvn_mag_200km.zarr'.
+
+        max_altitude : float (default 200)
+            Altitude cut of the reduced files to consolidate (only used to find files, see `reduced_fpath`).
+
+        min_sza : float (default None)
+            Solar zenith angle cut of the reduced files to consolidate, if they were reduced with one (only used to find files).
+
+        chunk_size : int (default 262144)
+            Number of rows per chunk. Smaller chunks make the per-chunk statistics more selective (less data read per query), larger chunks mean fewer files and less overhead per read.
+
+        overwrite : bool (default False)
+            If True, replace an existing store at `fpath_store`. Otherwise an existing store raises an error.
+
+        verbose : bool (default True)
+            If True, print progress.
+
+
+    RETURN:
+    ------------
+        dict
+            Summary with keys 'n_files', 'n_points', 'n_chunks', 'seconds'.
+
+    """
+
+    start = time.perf_counter()
+
+    dirpath_reduced = Path(dirpath_reduced)
+    fpath_store = Path(fpath_store)
+
+    if fpath_store.exists() and not overwrite:
+        raise FileExistsError(f'Store "{fpath_store}" already exists, pass `overwrite=True` to replace it.')
+
+    ## file names are dated, so sorting by name sorts by time
+    fpaths = sorted(dirpath_reduced.glob(f'*/*/mvn_mag_{_filters_name(max_altitude, min_sza)}_*.npy'), key=lambda fpath: fpath.name)
+    if not fpaths:
+        raise ValueError(f'No reduced files with filters "{_filters_name(max_altitude, min_sza)}" found in "{dirpath_reduced}".')
+
+
+
+    '''create empty store'''
+    store = zarr.open_group(str(fpath_store), mode='w')
+    store.attrs.update({
+        'columns'      : list(store_columns),
+        'units'        : ['days since ' + t0.isoformat(), 'deg', 'deg', 'km', 'nT', 'nT', 'nT'],
+        't0'           : t0.isoformat(),
+        'R_mars'       : R_mars,
+        'max_altitude' : max_altitude,
+        'min_sza'      : min_sza,
+        'chunk_size'   : chunk_size,
+        'stats_columns': list(store_stats_columns),
+        'n_files'      : len(fpaths),
+    })
+    for name in store_columns:
+        store.zeros(name, shape=(0,), chunks=(chunk_size,), dtype=np.float64, compressor=_store_compressor)
+
+
+
+    '''stream files into whole chunks'''
+    pending = []         # rows not yet written, always less than one chunk
+    n_pending = 0
+    n_points = 0
+    chunk_min, chunk_max = [], []
+    t_last = -np.inf
+
+    def _write(dat):
+        for name, col in zip(store_columns, dat.T):
+            store[name].append(col)
+        for i in range(0, dat.shape[0], chunk_size):
+            stats = _store_stats(dat[i : i+chunk_size])
+            chunk_min.append(stats[0])
+            chunk_max.append(stats[1])
+
+    for i_file, fpath in enumerate(fpaths):
+        dat = np.load(fpath)
+        if (dat.ndim != 2) or (dat.shape[1] != n_columns):
+            raise ValueError(f'Unexpected shape {dat.shape} of reduced file "{fpath}".')
+        if dat.shape[0] == 0:
+            continue
+
+        dat = dat[np.argsort(dat[:,0], kind='stable')]
+        if dat[0,0] < t_last:
+            raise ValueError(f'Reduced file "{fpath}" overlaps in time with the previous file.')
+        t_last = dat[-1,0]
+
+        pending.append(dat)
+        n_pending += dat.shape[0]
+        n_points += dat.shape[0]
+
+        if n_pending >= chunk_size:
+            dat = np.concatenate(pending)
+            n_full = (n_pending // chunk_size) * chunk_size
+            _write(dat[:n_full])
+            pending = [dat[n_full:]]
+            n_pending -= n_full
+
+        if verbose and (((i_file+1) % 100 == 0) or (i_file+1 == len(fpaths))):
+            print(f'[{i_file+1}/{len(fpaths)}] {n_points} points, {time.perf_counter() - start:.0f} s')
+
+    if n_pending:
+        _write(np.concatenate(pending))
+
+    n_chunks = len(chunk_min)
+    store.array('chunk_min', np.array(chunk_min).reshape(n_chunks, len(store_stats_columns)), chunks=False)
+    store.array('chunk_max', np.array(chunk_max).reshape(n_chunks, len(store_stats_columns)), chunks=False)
+    store.attrs['n_points'] = n_points
+    zarr.consolidate_metadata(str(fpath_store))
+
+    summary = {
+        'n_files'  : len(fpaths),
+        'n_points' : n_points,
+        'n_chunks' : n_chunks,
+        'seconds'  : time.perf_counter() - start,
+    }
+    if verbose:
+        print(f'Done in {summary["seconds"]/60:.1f} min: {n_points} points from {len(fpaths)} files in {n_chunks} chunks.')
+    return summary
+
+
+
+def _store_stats(dat):
+    """(min, max) of `store_stats_columns` for rows of reduced data."""
+    cols = np.column_stack([dat[:,0], dat[:,1], dat[:,2], dat[:,3] - R_mars])
+    return cols.min(axis=0), cols.max(axis=0)
+
+
+
+def query_store(
+    fpath_store,
+    time_bounds     = None,
+    lon_bounds      = None,
+    lat_bounds      = None,
+    altitude_bounds = None,
+    columns         = store_columns,
+) -> np.ndarray:
+    """
+    DESCRIPTION:
+    ------------
+        Get every point in a store made by `build_store` within the given bounds (all inclusive). Only chunks whose min/max statistics overlap all of the bounds are read, so e.g. a single year in a region is a small fraction of the whole store.
+
+
+    PARAMETERS:
+    ------------
+        fpath_store : str or Path
+            Path to the zarr store.
+
+        time_bounds : (start, end) (default None)
+            Either decimal days since 2014-10-10 (see module docstring), or anything `np.datetime64` accepts, e.g. `('2016-01-01', '2017-01-01')` or `datetime` objects.
+
+        lon_bounds : (float, float) (default None)
+            Longitude range in degrees, either in [-180, 180] or [0, 360]. If the first bound is larger than the second after converting to [-180, 180], the range crosses the antimeridian (e.g. `(170, -170)`).
+
+        lat_bounds : (float, float) (default None)
+            Latitude range in degrees.
+
+        altitude_bounds : (float, float) (default None)
+            Altitude range above the mean radius (3396.2 km) in km, e.g. `(0, 150)`.
+
+        (Each bound can be None, or either end of a bound can be None, to leave it open.)
+
+        columns : list of str (default `store_columns`)
+            Arrays of the store to return, e.g. `store_columns + residual_columns` after `add_langlais_residuals`.
+
+
+    RETURN:
+    ------------
+        np.ndarray
+            NxK array with the requested columns, sorted by time. By default, this is the same format as a reduced file (see module docstring).
+
+    """
+
+    store = zarr.open_consolidated(str(fpath_store), mode='r')
+    chunk_size = store.attrs['chunk_size']
+    chunk_min = store['chunk_min'][:]
+    chunk_max = store['chunk_max'][:]
+
+
+    '''bounds for each of `store_stats_columns`, open ends are infinite'''
+    def _bounds(bounds):
+        lo, hi = bounds if bounds is not None else (None, None)
+        return (-np.inf if lo is None else lo), (np.inf if hi is None else hi)
+
+    time_bounds = [None if t is None else _to_days(t) for t in (time_bounds or (None, None))]
+
+    ## longitude is one or two (if crossing the antimeridian) ranges in [-180, 180]
+    lon_ranges = [(-np.inf, np.inf)]
+    lon_lo, lon_hi = _bounds(lon_bounds)
+    if lon_hi - lon_lo < 360:
+        lon_lo, lon_hi = [lon if lon <= 180 else lon - 360 for lon in (lon_lo, lon_hi)]
+        lon_ranges = [(lon_lo, lon_hi)] if lon_lo <= lon_hi else [(lon_lo, 180), (-180, lon_hi)]
+
+    other_bounds = {0: _bounds(time_bounds), 2: _bounds(lat_bounds), 3: _bounds(altitude_bounds)}
+
+    def _overlaps(col_min, col_max, k):
+        if k == 1:
+            return np.any([(col_max >= lo) & (col_min <= hi) for lo, hi in lon_ranges], axis=0)
+        lo, hi = other_bounds[k]
+        return (col_max >= lo) & (col_min <= hi)
+
+
+    '''select chunks'''
+    keep = np.ones(chunk_min.shape[0], dtype=bool)
+    for k in range(len(store_stats_columns)):
+        keep &= _overlaps(chunk_min[:,k], chunk_max[:,k], k)
+
+    columns = list(columns)
+    i_chunks = np.flatnonzero(keep)
+    if i_chunks.size == 0:
+        return np.empty((0, len(columns)))
+
+
+    '''read runs of consecutive chunks with one slice each (coordinates are always read for filtering), then filter exactly'''
+    runs = np.split(i_chunks, np.flatnonzero(np.diff(i_chunks) > 1) + 1)
+    dat = {
+        name: np.concatenate([store[name][run[0]*chunk_size : (run[-1]+1)*chunk_size] for run in runs])
+        for name in dict.fromkeys(list(store_columns[:4]) + columns)
+    }
+
+    stats = (dat['time'], dat['lon'], dat['lat'], dat['r'] - R_mars)
+    mask = np.ones(stats[0].shape[0], dtype=bool)
+    for k, col in enumerate(stats):
+        mask &= _overlaps(col, col, k)
+    return np.column_stack([dat[name][mask] for name in columns])
+
+
+
+def _to_days(t) -> float:
+    """Decimal days since `t0` from a number (returned as-is) or anything `np.datetime64` accepts."""
+    if isinstance(t, (int, float, np.integer, np.floating)):
+        return float(t)
+    return (np.datetime64(t, 'us') - np.datetime64(t0, 'us')) / np.timedelta64(1, 'D')
+
+
+
+
+
+
+
+
+
+
+############################################################################################################################################
+""" model residuals """
+
+
+
+def add_langlais_residuals(
+    fpath_store,
+    lmax      = 134,
+    n_workers = None,
+    overwrite = False,
+    verbose   = True,
+) -> dict:
+    """
+    DESCRIPTION:
+    ------------
+        Compare a store made by `build_store` with the Langlais et al. (2019) crustal field model: evaluate the model at every sample's own position (longitude, latitude, and radius, i.e. at spacecraft altitude -- see `redplanet.Mag.get_points_at_radius`) and save data minus model as new arrays in the store (see `residual_columns`), with the same chunks as the data. Afterwards, `query_store(..., columns=store_columns+residual_columns)` returns data and residuals together.
+
+        Chunks of the store are processed in parallel by a pool of worker processes, each of which reads its chunks straight from the store and writes the residuals back. The stage is resumable: finished chunks are recorded in the store ('residual_done'), so calling this again after an interruption only computes the remaining chunks.
+
+
+    PARAMETERS:
+    ------------
+        fpath_store : str or Path
+            Path to the zarr store.
+
+        lmax : int (default 134)
+            Maximum spherical harmonic degree of the model.
+
+        n_workers : int (default None)
+            Number of worker processes. By default, one per CPU core. With `n_workers=1`, everything runs in the current process.
+
+        overwrite : bool (default False)
+            If True, recompute every chunk. Otherwise existing residuals are kept, and an error is raised if they were computed with a different `lmax`.
+
+        verbose : bool (default True)
+            If True, print progress and throughput as chunks finish.
+
+
+    RETURN:
+    ------------
+        dict
+            Summary with keys 'n_chunks', 'n_computed', 'n_skipped', 'n_points' (points computed in this run), 'seconds', 'points_per_second'.
+
+    """
+
+    start = time.perf_counter()
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+
+
+
+    '''create (or resume) residual arrays'''
+    store = zarr.open_group(str(fpath_store), mode='r+')
+    chunk_size = store.attrs['chunk_size']
+    n_points = store['time'].shape[0]
+    n_chunks = store['chunk_min'].shape[0]
+
+    if ('residual_done' in store) and (not overwrite) and (store.attrs.get('residual_lmax') != lmax):
+        raise ValueError(f'Residuals in "{fpath_store}" were computed with lmax={store.attrs.get("residual_lmax")}. Pass `overwrite=True` to recompute them with lmax={lmax}.')
+
+    if ('residual_done' not in store) or overwrite:
+        for name in residual_columns:
+            store.full(name, fill_value=np.nan, shape=(n_points,), chunks=(chunk_size,), dtype=np.float64, compressor=_store_compressor, overwrite=True)
+        store.zeros('residual_done', shape=(n_chunks,), chunks=(max(n_chunks, 1),), dtype=bool, overwrite=True)
+        store.attrs.update({'residual_model': 'Langlais2019', 'residual_lmax': lmax})
+
+    done = store['residual_done'][:]
+    todo = np.flatnonzero(~done)
+
+    if verbose:
+        print(f'Found {n_chunks} chunks in "{fpath_store}": {n_chunks - todo.size} already done, {todo.size} to do with {min(n_workers, max(todo.size, 1))} worker(s).')
+
+
+
+    '''compute'''
+    n_done = 0
+    n_points_done = 0
+
+    def _record(i_chunk, n):
+        nonlocal n_done, n_points_done
+        done[i_chunk] = True
+        store['residual_done'][:] = done    # a single tiny chunk, and residuals are written before they're marked done
+        n_done += 1
+        n_points_done += n
+        if verbose:
+            elapsed = time.perf_counter() - start
+            print(f'[{n_done}/{todo.size}] chunk {i_chunk} ({n_points_done / elapsed:.0f} points/s, ETA {(todo.size - n_done) * elapsed / n_done / 60:.1f} min)')
+
+    ## retrieve and read the model once here and hand it to the workers, rather than have every worker go through `pooch.retrieve`
+    from . import Mag
+    coeffs = Mag.get_shcoeffs(lmax) if todo.size else None
+
+    try:
+        if n_workers == 1 or todo.size <= 1:
+            _init_residual_worker(fpath_store, coeffs)
+            for i_chunk in todo:
+                _record(i_chunk, _residual_worker(i_chunk))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers, initializer=_init_residual_worker, initargs=(fpath_store, coeffs)) as executor:
+                futures = {executor.submit(_residual_worker, i_chunk): i_chunk for i_chunk in todo}
+                for future in concurrent.futures.as_completed(futures):
+                    _record(futures[future], future.result())
+    finally:
+        _residual_worker_state.clear()
+        zarr.consolidate_metadata(str(fpath_store))
+
+
+
+    '''summary'''
+    seconds = time.perf_counter() - start
+    summary = {
+        'n_chunks'          : n_chunks,
+        'n_computed'        : n_done,
+        'n_skipped'         : n_chunks - todo.size,
+        'n_points'          : n_points_done,
+        'seconds'           : seconds,
+        'points_per_second' : n_points_done / seconds,
+    }
+    if verbose:
+        print(f'Done in {seconds/60:.1f} min: {n_done} chunks computed, {summary["n_skipped"]} skipped ({summary["points_per_second"]:.0f} points/s).')
+    return summary
+
+
+
+def _init_residual_worker(fpath_store, coeffs):
+    _residual_worker_state['store'] = zarr.open_group(str(fpath_store), mode='r+')
+    _residual_worker_state['coeffs'] = coeffs
+
+
+
+def _residual_worker(i_chunk):
+    """
+    Residuals for one chunk of the (already open) store, written straight to the store. Returns the number of points.
+    """
+    from . import Mag
+
+    store = _residual_worker_state['store']
+    chunk_size = store.attrs['chunk_size']
+    sl = slice(i_chunk * chunk_size, (i_chunk+1) * chunk_size)
+
+    dat = {name: store[name][sl] for name in store_columns[1:]}
+    model = Mag.get_points_at_radius(dat['lon'], dat['lat'], dat['r'], coeffs=_residual_worker_state['coeffs'])    # (B_r, B_theta, B_phi), where B_theta points south
+
+    store['residual_B_r'][sl]     = dat['B_r']     - model[:,0]
+    store['residual_B_east'][sl]  = dat['B_east']  - model[:,2]
+    store['residual_B_north'][sl] = dat['B_north'] + model[:,1]
+    return dat['lon'].size
@@ -1,12 +1,13 @@
 import sys
 import contextlib
-# import os
+import importlib.util
+import os
+import tempfile
+from pathlib import Path
 
 import pooch
-import gdown
 
 import numpy as np
-import xarray as xr
 # import matplotlib.pyplot as plt
 # import PIL
 
@@ -15,6 +16,49 @@ import xarray as xr
 
 
 
+''' ######################################################################## '''
+'''                               lazy imports                               '''
+''' ######################################################################## '''
+
+
+
+def lazy_import(name):
+    '''
+    Import a module the first time one of its attributes is accessed, rather than right away. Heavy dependencies (`pyshtools`, `xarray`, `pandas`, `gdown`) take ~0.2-2 seconds each to import, so deferring them keeps `import redplanet.<module>` cheap for code that never ends up using them (e.g. a crater lookup, or worker processes).
+
+    Use it in place of a module-level import, e.g. `pysh = utils.lazy_import('pyshtools')`. NOTE: annotations are evaluated at import, so write them as strings (`-> 'xr.DataArray'`) or they'll trigger the import.
+
+    If the module has already been imported, it's returned as is. Raises `ModuleNotFoundError` right away (not on first use) if the module isn't installed. For a submodule (e.g. 'dask.array'), the parent package is imported right away as usual.
+    '''
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    ## bind a submodule on its parent like a regular import does, otherwise a later `import dask.array` finds it in `sys.modules` and `dask.array` raises AttributeError
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+
+gdown = lazy_import('gdown')
+xr    = lazy_import('xarray')
+
+
+
+
+
+
 ''' ######################################################################## '''
 '''                             pooch downloading                            '''
 ''' ######################################################################## '''
@@ -76,6 +120,36 @@ def disable_pooch_logger():
 
 
 
+''' ######################################################################## '''
+'''                                cache files                               '''
+''' ######################################################################## '''
+
+
+
+def save_npy_atomic(fpath, dat):
+    '''
+    Save an array to `fpath` (as with `np.save`) without ever leaving a partially written file under that name. The array is written to a uniquely named temporary file in the same directory and then renamed over `fpath`, so readers see either the old file or the complete new one -- even if the write is interrupted, or several processes/sessions write the same file at once (the last one wins).
+    '''
+    fpath = Path(fpath)
+    fpath.parent.mkdir(parents=True, exist_ok=True)
+    fd, fpath_tmp = tempfile.mkstemp(dir=fpath.parent, prefix=f'{fpath.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, np.ascontiguousarray(dat))
+        os.replace(fpath_tmp, fpath)
+    except BaseException:
+        Path(fpath_tmp).unlink(missing_ok=True)
+        raise
+
+
+
+
+
+
+
+
+
+
 ''' ######################################################################## '''
 '''                     generic/everyday helper functions                    '''
 ''' ######################################################################## '''
@@ -117,7 +191,7 @@ def indexOf(haystack, needle, n=0):
 
 
 
-def fix_pyshtools_coords(da : xr.DataArray) -> xr.DataArray:
+def fix_pyshtools_coords(da : 'xr.DataArray') -> 'xr.DataArray':
     '''
     Helper function that converts and reorders an xarray's longitude coordinate ("lon") from positive (0->360) to signed (-180->180), removing any duplicated longitude bands. 
         - This is intended to be used on an instance of the `pyshtools.SHCoeffs` class, upon which you've called `.expand(grid='DH2', extend=True).to_xarray()`. 
@@ -126,13 +200,70 @@ def fix_pyshtools_coords(da : xr.DataArray) -> xr.DataArray:
         - Whenever we have an instance of the `pyshtools.SHCoeffs` class, calling `.expand(grid='DH2', extend=True)` (specifically with the `expand=True` argument) will add values at longitude 360 (I believe this is a duplicate of longitude 0, but I forgot whether I 100% verified this) and latitude -90 (I think this is unique?). For more info on this, import pyshtools and run `help(pyshtools.SHCoeffs.expand)`. 
             - The latter is obviously desired, but the former being a duplicate creates issues when we convert the longitude values from "positive" (0->360) to "signed" (-180->180) using `redplanet.utils.plon2slon` — specifically, since 360 was initially a duplicate of 0, we end up with duplicate coordinates/data at longitude 180 which creates an error when accessing values. We can't just switch `extend=False` because we would lose the value at latitude -90. 
         => THEREFORE, this function first removes the longitude band at 360 (presumed to be a duplicate), then converts/reorders the coordinates/data from positive longitude to signed longitude. 
+
+    The result also has ascending latitudes and a wraparound column at longitude 180 (a copy of -180) for interpolation. All of this is done in a single copy, see `reorder_pyshtools_grid`.
     '''
-    da = da.sel(lon=slice(0,359.99999))
-    da = da.assign_coords(lon=xr.apply_ufunc(plon2slon, da.lon))
-    da = da.sortby('lon', ascending=True)
-    da = da.sortby('lat', ascending=True)
-    da = xr.concat([da, da.sel(lon=-180).assign_coords(lon=180)], dim='lon')  # wraparound for interpolation
-    return da
+    dat, lats, lons = reorder_pyshtools_grid(da.values, da.lat.values, da.lon.values)
+    return xr.DataArray(dat, coords={'lat': ('lat', lats, da.lat.attrs), 'lon': lons}, dims=('lat', 'lon'), name=da.name, attrs=da.attrs)
+
+
+
+def reorder_pyshtools_grid(dat, lats, lons, lon_pad=1, lat_pad=0):
+    '''
+    Convert a 2D grid from the pyshtools layout (latitudes descending from 90 to -90, positive longitudes 0->360 with 360 duplicating 0) to the layout used throughout redplanet (ascending latitudes, signed longitudes -180->180), padded for interpolation at the edges.
+
+    The output array is allocated once and filled with two slice assignments (equivalent to dropping the 360 column, rolling the longitude axis so -180 comes first, and flipping the latitude axis), rather than making a full copy at every step.
+
+    PARAMETERS:
+    ------------
+        dat : np.ndarray
+            2D grid with shape (lats.size, lons.size).
+        lats, lons : np.ndarray
+            Coordinates of `dat` in the pyshtools layout.
+        lon_pad : int (default 1)
+            Number of wraparound columns appended on the right (copies of the first columns, with longitudes +360).
+        lat_pad : int (default 0)
+            Number of rows appended at the top (copies of the last row, with latitudes continuing at the same spacing).
+
+    RETURN:
+    ------------
+        (dat, lats, lons) : tuple[np.ndarray]
+            Reordered and padded grid and coordinates.
+    '''
+    lats_out, lons_out = reorder_pyshtools_coords(lats, lons, lon_pad, lat_pad)
+
+    n_lat = lats.size
+    n_lon = lons.size - 1                                    # drop the duplicate column at 360
+    i_180 = np.searchsorted(lons[:n_lon], 180, side='left')  # this column becomes -180, i.e. the first one
+
+    out = np.empty((n_lat + lat_pad, n_lon + lon_pad), dtype=dat.dtype)
+    out[:n_lat, :n_lon-i_180] = dat[::-1, i_180:n_lon]
+    out[:n_lat, n_lon-i_180:n_lon] = dat[::-1, :i_180]
+    out[:n_lat, n_lon:] = out[:n_lat, :lon_pad]
+    out[n_lat:, :] = out[n_lat-1, :]
+
+    return out, lats_out, lons_out
+
+
+
+def reorder_pyshtools_coords(lats, lons, lon_pad=1, lat_pad=0):
+    '''
+    Coordinates half of `reorder_pyshtools_grid`, for when the grid itself is never materialized in the pyshtools layout (e.g. it's built lazily in the final layout). Returns `(lats, lons)`.
+    '''
+    if not ((lons[0] == 0) and (lons[-1] == 360) and (lats[0] > lats[-1])):
+        raise ValueError('Grid is not in the pyshtools layout (latitudes descending, longitudes 0->360 inclusive).')
+
+    n_lon = lons.size - 1
+    i_180 = np.searchsorted(lons[:n_lon], 180, side='left')
+
+    lons_out = plon2slon(np.concatenate((lons[i_180:n_lon], lons[:i_180])))
+    if np.isclose(lons_out[0], -180):
+        lons_out[0] = -180.    # at high lmax (e.g. 2600), pyshtools' 180 is off by an ulp and would otherwise become -179.99999999999997
+    lons_out = np.concatenate((lons_out, lons_out[:lon_pad] + 360))
+    lats_out = lats[::-1]
+    lats_out = np.concatenate((lats_out, lats_out[-1] + (lats_out[-1]-lats_out[-2]) * np.arange(1, lat_pad+1)))
+
+    return lats_out, lons_out
 
 
 
@@ -252,6 +383,66 @@ self note, other formulas are:
 
 
 
+''' ———————————————————————————— uniform grids ————————————————————————————— '''
+
+
+
+def describe_uniform_axis(axis) -> dict:
+    """
+    Build a small descriptor for a uniformly spaced, ascending 1D coordinate axis (e.g. the `lats`/`lons` of a GRS or Crust grid), so that lookups can be done with index arithmetic instead of searching the whole axis.
+
+    Returns a dict with keys:
+        - 'start'   : first coordinate value
+        - 'spacing' : distance between consecutive values
+        - 'n'       : number of values
+    """
+    axis = np.asarray(axis, dtype=np.float64)
+    n = axis.shape[0]
+    spacing = (axis[-1] - axis[0]) / (n - 1)
+    if not np.allclose(np.diff(axis), spacing, rtol=0, atol=1e-6*abs(spacing)):
+        raise ValueError('Axis is not uniformly spaced.')
+    return {'start': axis[0], 'spacing': spacing, 'n': n}
+
+
+
+def uniform_axis_index(axis_desc: dict, coords, method='nearest', tie='higher'):
+    """
+    Locate `coords` on an axis described by `describe_uniform_axis` in O(1) per point (fully vectorized).
+
+    PARAMETERS:
+    ------------
+        axis_desc : dict
+            Output of `describe_uniform_axis`.
+        coords : float or np.ndarray
+            Coordinates to locate.
+        method : str (default 'nearest')
+            - 'nearest' --> returns `i`, the index of the nearest axis value (clipped to the axis).
+            - 'linear'  --> returns `(i, w)`, where `i` is the index to the left (clipped so `i+1` is valid) and `w` in [0,1] is the fractional distance from `axis[i]` to `axis[i+1]`.
+        tie : str (default 'higher')
+            For 'nearest' only, which index to choose when `coords` is exactly halfway between two axis values. xarray's `sel(method='nearest')` picks the 'higher' index, while `interp(method='nearest')` (scipy) picks the 'lower'.
+    """
+    frac = (np.asarray(coords, dtype=np.float64) - axis_desc['start']) / axis_desc['spacing']
+    n = axis_desc['n']
+
+    if method == 'nearest':
+        if tie == 'higher':
+            i = np.floor(frac + 0.5).astype(np.intp)
+        else:
+            i = np.ceil(frac - 0.5).astype(np.intp)
+        return np.clip(i, 0, n-1)
+
+    i = np.clip(np.floor(frac).astype(np.intp), 0, n-2)
+    w = np.clip(frac - i, 0, 1)
+    return i, w
+
+
+
+
+
+
+
+
+
 ''' ——————————————————————————————— distances —————————————————————————————— '''
 
 